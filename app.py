@@ -14,7 +14,7 @@ from datetime import datetime
 from typing import Optional, Dict, List, Set
 from selenium.webdriver.common.by import By
 import requests
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify
 from plexapi.server import PlexServer
 from selenium.webdriver.chrome.options import Options
 from selenium import webdriver
@@ -23,6 +23,19 @@ from torrent_client import TorrentClient, HistoryStore
 from flask import Flask, request, jsonify
 from flask import send_from_directory
 from config_store import load_config, save_config, config_exists
+import gzip
+try:
+    import orjson  # opcjonalnie – szybszy encoder JSON
+except ImportError:
+    orjson = None
+try:
+    import brotli  # opcjonalnie – Content-Encoding: br
+except ImportError:
+    brotli = None
+from progress_store import ProgressStore, genres_meta_key
+from search_index import SearchIndex
+import plex_events
+from event_bus import EventBus, sse_message, sse_comment, HEARTBEAT_SECONDS
 
 DEFER_INIT = os.environ.get("PFLIX_DEFER_INIT") == "1"
 
@@ -65,22 +78,21 @@ if not progress_log.handlers:
 progress_log.info("Logger ready. Log file: %s", LOG_FILE)
 
 
-# Plik z postępami w trwałej lokalizacji
+# Postępy w trwałej lokalizacji: SQLite (WAL); stary progress_cache.json to tylko źródło migracji
+PROGRESS_DB_FILE = os.path.join(STATE_DIR, "progress.sqlite3")
 PROGRESS_CACHE_FILE = os.path.join(STATE_DIR, "progress_cache.json")
 
 # (opcjonalna migracja) – jeśli kiedyś był obok exe/źródeł, przenieś go 1x
 _old_base = sys._MEIPASS if getattr(sys, "frozen", False) else os.path.abspath(".")
 _OLD_PROGRESS = os.path.join(_old_base, "progress_cache.json")
-if os.path.exists(_OLD_PROGRESS) and not os.path.exists(PROGRESS_CACHE_FILE):
+if (os.path.exists(_OLD_PROGRESS) and not os.path.exists(PROGRESS_CACHE_FILE)
+        and not os.path.exists(PROGRESS_DB_FILE)):
     try:
         os.replace(_OLD_PROGRESS, PROGRESS_CACHE_FILE)
     except Exception:
         pass
 
-# Utwórz pusty cache, jeśli brak
-if not os.path.exists(PROGRESS_CACHE_FILE):
-    with open(PROGRESS_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump({}, f, ensure_ascii=False)
+progress_store = ProgressStore(PROGRESS_DB_FILE, legacy_json=PROGRESS_CACHE_FILE)
 
 
 if getattr(sys, "frozen", False):
@@ -96,6 +108,23 @@ os.makedirs(POSTER_DIR, exist_ok=True)
 AVAILABLE_CACHE_FILE = os.path.join(base_path, "available_cache.json")
 HISTORY_FILE = os.path.join(base_path, "torrent_history.json")
 GC_MIN_AGE = 24 * 3600  # 24h
+EPISODE_PAGE_SIZE = 500  # rozmiar strony przy hurtowym pobieraniu odcinków z Plexa
+POSTER_WORKERS = 8       # równoległe pobieranie plakatów (prefetch przy rebuildzie)
+POSTER_PER_HOST = 4      # max równoległych żądań na jeden host (TMDb API / obrazki)
+POSTER_SAVE_DELAY = 2.0  # s – odroczony zapis poster_cache.json
+POSTER_SAVE_BATCH = 50   # …albo od razu po tylu zmianach
+POSTER_BUMP_EVERY = 1.0  # s – najczęstszy skok generacji „Dostępne” w trakcie prefetchu plakatów
+COMPRESS_MIN_BYTES = 1024  # mniejszych odpowiedzi nie kompresujemy
+CLEANUP_WORKERS = 4        # równoległe sprawdzanie w Plexie i kasowanie (dysk sieciowy + Plex)
+EVENT_TOPICS = ("torrents", "available", "delete_timer", "cast")
+CAST_EVENTS_EVERY = 1.5  # s – odpytywanie sesji Plexa, tylko gdy ktoś subskrybuje "cast"
+# /status?since= – progi, poniżej których zmiana pola nie jest zmianą (szum co 1 s)
+STATUS_PROGRESS_STEP = 0.1          # punkt procentowy
+STATUS_RATE_STEP = 16 * 1024        # B/s …
+STATUS_RATE_REL = 0.05              # …albo 5% poprzedniej wartości (większe wygrywa)
+STATUS_ETA_STEP = 5                 # s …
+STATUS_ETA_REL = 0.05               # …albo 5%
+STATUS_TOMBSTONES = 1000            # ile usuniętych id pamiętamy dla klientów z ?since
 
 os.makedirs(POSTER_DIR, exist_ok=True)
 if not os.path.exists(POSTER_CACHE_FILE):
@@ -109,6 +138,9 @@ app = Flask(
 )
 
 
+# ── Kanał push (SSE) – patrz /events ────────────────────────────────────────
+event_bus = EventBus()
+
 # --- PROGRESS CACHE: helpers -------------------------------------------------
 PROGRESS_LOCK = threading.Lock()
 # ── Koordynacja zamykania ───────────────────────────────────────────────────
@@ -121,6 +153,8 @@ _BG_THREAD_NAMES = {
     "cleanup-loop",
     "poster-sweeper",
     "post-finish-preload",  # prefiks – patrz helper ze startem
+    "plex-events",          # prefiks – nasłuch websocket + wątek aplikujący zdarzenia
+    "cast-events",          # odpytywanie sesji Plexa dla subskrybentów SSE
 }
 
 # pojedynczość graceful
@@ -133,6 +167,7 @@ def _start_all_backgrounds():
     start_progress_cache_watchdog(10)
     run_cleanup_loop(10)
     start_poster_sweeper(every_minutes=120, rebuild_before=False, force=False)  # ⬅️ TU
+    start_plex_events()
 
 def start_flask_blocking(host=None, port=None):
     h = host or os.environ.get("PFLIX_BIND", "0.0.0.0")
@@ -165,23 +200,6 @@ def _do_available_bootstrap():
             print("⚠️ Available watchdog init error:", e)
 
 
-def _progress_load() -> dict:
-    try:
-        with open(PROGRESS_CACHE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
-
-def _progress_save(data: dict):
-    try:
-        tmp = PROGRESS_CACHE_FILE + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        os.replace(tmp, PROGRESS_CACHE_FILE)
-    except Exception:
-        pass
-
 # ─────────────────────────────────────────────────────────────────────────────
 # Konfiguracja zewnętrzna
 # ─────────────────────────────────────────────────────────────────────────────
@@ -199,11 +217,25 @@ SERIES_DIR = CONFIG["paths"]["series"]
 # ─────────────────────────────────────────────────────────────────────────────
 # Historia + klient torrentów + watchdog ukończeń
 # ─────────────────────────────────────────────────────────────────────────────
-history_store = HistoryStore(HISTORY_FILE)
+# kategorie najpierw – historia kategoryzuje nimi stare wpisy przy wczytywaniu
+tclient.set_category_paths({"movies": MOVIES_DIR, "series": SERIES_DIR})
+history_store = HistoryStore(HISTORY_FILE, category_of=tclient.category_of)
+# post-finish (update sekcji Plexa + plakaty) – raz na torrent, osobno od deduplikacji historii:
+# alert klienta zwykle zapisuje "finished" zanim watchdog zobaczy 100%
+_postfinish_lock = threading.Lock()
+_postfinish_done: Set[str] = history_store.finished_ids()
 tclient.set_history_store(history_store)
+tclient.add_snapshot_listener(lambda version, changed, removed: _publish_torrent_changes(version, changed, removed))
+try:
+    tclient.apply_profile(CONFIG["torrent"]["profile"], CONFIG["torrent"]["settings"])
+except ValueError as e:
+    # np. nadpisanie z innej wersji libtorrent – zostaje sam profil
+    print(f"⚠️ Ustawienia torrentów z konfiguracji odrzucone: {e}")
+    try:
+        tclient.apply_profile(CONFIG["torrent"]["profile"])
+    except ValueError:
+        pass
 
-_completed_ids_lock = threading.Lock()
-_completed_finished_ids = set(e["id"] for e in history_store.get() if e.get("event") == "finished")
 
 
 @app.route('/static/posters/<path:filename>')
@@ -231,14 +263,18 @@ def get_plex_or_none():
 
 
 def _mark_finished_once(tid: str, name: str, path: str) -> bool:
-    with _completed_ids_lock:
-        if tid in _completed_finished_ids:
+    """True = pierwsze ukończenie w tym procesie – wołający odpala post-finish."""
+    with _postfinish_lock:
+        if tid in _postfinish_done:
             return False
-        history_store.add(
-            {"ts": int(time.time()), "id": tid, "name": name, "path": path, "event": "finished"}
+        _postfinish_done.add(tid)
+    # wspólny indeks z TorrentClient._maybe_log_finished – jeden wpis historii na torrent
+    if not history_store.has_finished(tid):
+        history_store.add_finished_once(
+            {"ts": int(time.time()), "id": tid, "name": name, "path": path, "event": "finished",
+             **tclient.finish_details(tid, path)}
         )
-        _completed_finished_ids.add(tid)
-        return True
+    return True
 
 
 def start_completion_watchdog(interval_seconds: int = 3):
@@ -299,6 +335,68 @@ def map_network_drive():
 
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Serializacja i kompresja odpowiedzi
+# ─────────────────────────────────────────────────────────────────────────────
+def _json_bytes(obj) -> bytes:
+    """Kompaktowy JSON jako bytes (UTF-8); orjson jeśli jest zainstalowany."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except Exception:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=9)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _pick_encoding(accept_encoding: str, size: int) -> str:
+    """Wybór Content-Encoding: br > gzip > identity (wg Accept-Encoding klienta)."""
+    if size < COMPRESS_MIN_BYTES:
+        return "identity"
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip())
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def _encoded_response(body: bytes, etag: Optional[str] = None, get_variant=None):
+    """
+    Odpowiedź JSON z negocjacją Content-Encoding.
+    get_variant(encoding) -> bytes pozwala podać gotowy (zkeszowany) skompresowany blob.
+    """
+    enc = _pick_encoding(request.headers.get("Accept-Encoding", ""), len(body))
+    payload = body
+    if enc != "identity":
+        payload = get_variant(enc) if get_variant else _compress(body, enc)
+    headers = {"Vary": "Accept-Encoding"}
+    if enc != "identity":
+        headers["Content-Encoding"] = enc
+    if etag:
+        headers["ETag"] = etag
+    return Response(payload, mimetype="application/json", headers=headers)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Plakaty – spójny system (PosterManager)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -310,10 +408,10 @@ def _sha_name(type_: str, title: str) -> str:
     return hashlib.sha1(f"{type_.lower()}::{_normalize(title)}".encode("utf-8")).hexdigest() + ".jpg"
 
 
-def _tmdb_find_poster_url(title: str, type_: str) -> Optional[str]:
+def _tmdb_find_poster_url(title: str, type_: str, http=None) -> Optional[str]:
     try:
         endpoint = "movie" if type_ == "movie" else "tv"
-        r = requests.get(
+        r = (http or requests).get(
             f"https://api.themoviedb.org/3/search/{endpoint}",
             params={"api_key": TMDB_API_KEY, "query": title, "language": "pl-PL"},
             timeout=6,
@@ -328,6 +426,32 @@ def _tmdb_find_poster_url(title: str, type_: str) -> Optional[str]:
     return None
 
 
+class _HostLimitedSession:
+    """
+    Wspólna sesja HTTP (keep-alive, pula połączeń) z limitem równoległych
+    żądań per host – TMDb API i serwer obrazków mają osobne limity.
+    """
+    def __init__(self, pool_size: int, per_host: int):
+        from requests.adapters import HTTPAdapter
+        self._s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+        self._s.mount("https://", adapter)
+        self._s.mount("http://", adapter)
+        self._per_host = max(1, per_host)
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+        self._sems_lock = threading.Lock()
+
+    def get(self, url: str, **kw):
+        from urllib.parse import urlparse
+        host = urlparse(url).netloc
+        with self._sems_lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self._per_host)
+        with sem:
+            return self._s.get(url, **kw)
+
+
 class PosterManager:
     def __init__(self, poster_dir: str, cache_file: str):
         self.dir = poster_dir
@@ -335,6 +459,12 @@ class PosterManager:
         self._lock = threading.Lock()
         os.makedirs(self.dir, exist_ok=True)
         self.cache: Dict[str, str] = self._load()
+        self._http = _HostLimitedSession(POSTER_WORKERS, POSTER_PER_HOST)
+        self._inflight: Set[str] = set()  # klucze aktualnie pobierane przez prefetch
+        self._dirty = 0            # liczba niezapisanych zmian w cache
+        self._flush_timer: Optional[threading.Timer] = None
+        self._writes = 0           # faktyczne zapisy poster_cache.json
+        self._writes_saved = 0     # zapisy zaoszczędzone przez łączenie zmian
 
     def _load(self) -> Dict[str, str]:
         try:
@@ -353,10 +483,51 @@ class PosterManager:
             with open(tmp, "w", encoding="utf-8") as f:
                 json.dump(self.cache, f, indent=2, ensure_ascii=False)
             os.replace(tmp, self.cache_file)
+            self._writes += 1
         except Exception:
             pass
 
-    def ensure_local(self, title: str, type_: str) -> str:
+    # ── write-behind: zmiany oznaczamy jako „brudne”, zapis zbiorczo ──────────
+    def _mark_dirty(self):
+        """
+        Wołać pod self._lock zamiast _save(). Zapis nastąpi po POSTER_SAVE_DELAY s
+        albo od razu po POSTER_SAVE_BATCH zmianach; flush() wymusza go natychmiast.
+        """
+        self._dirty += 1
+        if self._dirty >= POSTER_SAVE_BATCH:
+            self._flush_locked()
+            return
+        if self._flush_timer is None:
+            t = threading.Timer(POSTER_SAVE_DELAY, self.flush)
+            t.daemon = True
+            t.name = "poster-cache-flush"
+            self._flush_timer = t
+            t.start()
+
+    def _flush_locked(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._dirty:
+            self._writes_saved += self._dirty - 1  # N zmian -> 1 zapis
+            self._dirty = 0
+            self._save()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self.cache),
+                "writes": self._writes,
+                "writes_saved": self._writes_saved,
+                "pending_changes": self._dirty,
+            }
+
+    def cached(self, title: str, type_: str) -> str:
+        """Plakat z lokalnego cache (bez sieci); "" gdy brak albo plik zniknął."""
         if not title:
             return ""
         key = f"{type_.lower()}:{_normalize(title)}"
@@ -368,22 +539,31 @@ class PosterManager:
                     return cached
                 else:
                     self.cache.pop(key, None)
+        return ""
 
-        url = _tmdb_find_poster_url(title, type_)
+    def ensure_local(self, title: str, type_: str) -> str:
+        if not title:
+            return ""
+        cached = self.cached(title, type_)
+        if cached:
+            return cached
+
+        url = _tmdb_find_poster_url(title, type_, http=self._http)
         if not url:
             return ""
 
+        key = f"{type_.lower()}:{_normalize(title)}"
         fname = _sha_name(type_, title)
         fpath = os.path.join(POSTER_DIR, fname)
         try:
-            r = requests.get(url, timeout=8)
+            r = self._http.get(url, timeout=8)
             if r.status_code == 200:
                 with open(fpath, "wb") as f:
                     f.write(r.content)
                 rel = f"/static/posters/{fname}"
                 with self._lock:
                     self.cache[key] = rel
-                    self._save()
+                    self._mark_dirty()
                 return rel
         except Exception:
             pass
@@ -391,6 +571,56 @@ class PosterManager:
 
 
 
+    def prefetch(self, items: List[tuple], on_ready=None, on_done=None):
+        """
+        Pobiera brakujące plakaty w tle: pula POSTER_WORKERS wątków, wspólna sesja
+        keep-alive i limit POSTER_PER_HOST żądań na host.
+        items: [(title, type_)], on_ready(title, type_, rel) po każdym pobranym plakacie,
+        on_done() na końcu. Nie blokuje wołającego.
+        """
+        todo = []
+        with self._lock:
+            for title, type_ in items:
+                key = f"{type_.lower()}:{_normalize(title)}"
+                if title and key not in self._inflight:
+                    self._inflight.add(key)
+                    todo.append((key, title, type_))
+        if not todo:
+            if on_done:
+                on_done()
+            return
+
+        def _one(key, title, type_):
+            try:
+                if SHUTDOWN_EVENT.is_set():
+                    return
+                rel = self.ensure_local(title, type_)
+                if rel and on_ready:
+                    on_ready(title, type_, rel)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+
+        def _run():
+            from concurrent.futures import ThreadPoolExecutor
+            t0 = time.time()
+            with ThreadPoolExecutor(max_workers=POSTER_WORKERS, thread_name_prefix="poster-prefetch") as ex:
+                for key, title, type_ in todo:
+                    ex.submit(_one, key, title, type_)
+            try:
+                progress_log.info("Poster prefetch: %d tytułów w %.1fs", len(todo), time.time() - t0)
+            except Exception:
+                pass
+            if on_done:
+                try:
+                    on_done()
+                except Exception:
+                    pass
+
+        threading.Thread(target=_run, daemon=True, name="poster-prefetch").start()
+
     def cleanup_unused(self, used_rel_paths: Set[str]):
         try:
             if not used_rel_paths:
@@ -416,7 +646,7 @@ class PosterManager:
                 for k, v in list(self.cache.items()):
                     if v not in used_rel_paths and v in candidates:
                         self.cache.pop(k, None)
-                self._save()
+                        self._mark_dirty()
         except Exception:
             pass
 
@@ -432,7 +662,8 @@ class PosterManager:
         key = f"{type_.lower()}:{_normalize(title)}"
         with self._lock:
             rel = self.cache.pop(key, None)
-            self._save()
+            if rel:
+                self._mark_dirty()
         if not rel:
             return False
 
@@ -464,6 +695,14 @@ def _collect_used_poster_rel_paths() -> Set[str]:
     return used
 
 
+def _in_section(item, section_name: str) -> bool:
+    """Czy pozycja z fetchItem pochodzi z danej sekcji (bez tytułu sekcji = nie ryzykujemy)."""
+    try:
+        return str(getattr(item, "librarySectionTitle", "") or "") == section_name
+    except Exception:
+        return False
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Cache „Dostępne” – preload przy starcie + watchdog
 # ─────────────────────────────────────────────────────────────────────────────
@@ -471,6 +710,17 @@ class AvailableCache:
     def __init__(self, poster_mgr: PosterManager):
         self.poster_mgr = poster_mgr
         self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()  # pełny i przyrostowy rebuild nie mogą się nakładać
+        # ratingKey -> znacznik zmian z Plexa (updatedAt/addedAt/lastViewedAt/...) z ostatniego buildu
+        self._marks: Dict[str, tuple] = {}
+        self._poster_misses: List[tuple] = []  # (title, type_) bez lokalnego plakatu w bieżącym buildzie
+        # generacja danych (rośnie przy każdej zmianie) + gotowe bajty JSON per generacja
+        self._generation = 0
+        self._thumbs_dirty = False   # plakaty podmienione w miejscu, generacja jeszcze nie podbita
+        self._thumbs_bumped = 0.0
+        self._blobs: Dict[str, tuple] = {}  # kind -> (generation, body, etag)
+        self._positions: Dict[str, tuple] = {}  # kind -> (generation, {id: pozycja na liście})
+        self._search: tuple = (-1, None)  # (generation, SearchIndex)
         self.data = {"films": [], "series": []}
         try:
             if os.path.exists(AVAILABLE_CACHE_FILE):
@@ -490,37 +740,106 @@ class AvailableCache:
         except Exception:
             pass
 
+    @staticmethod
+    def _item_mark(item) -> tuple:
+        """
+        Znacznik zmian pozycji Plexa (film lub serial) – czytany z surowych atrybutów XML,
+        żeby plexapi nie robiło reload() dla pól, których brak (np. lastViewedAt).
+        Zmiana któregokolwiek pola => pozycję trzeba przeliczyć.
+        """
+        names = ("updatedAt", "addedAt", "lastViewedAt", "viewOffset", "viewCount",
+                 "viewedLeafCount", "leafCount")
+        data = getattr(item, "_data", None)
+        if data is not None and hasattr(data, "attrib"):
+            return tuple(data.attrib.get(n) for n in names)
+        out = []
+        for n in names:
+            v = getattr(item, n, None)
+            out.append(str(int(v.timestamp())) if hasattr(v, "timestamp") else (None if v is None else str(v)))
+        return tuple(out)
+
+    def _poster_or_queue(self, title: str, type_: str) -> str:
+        """Lokalny plakat z cache; brak => kolejka prefetchu, a na razie placeholder z Plexa."""
+        rel = self.poster_mgr.cached(title, type_)
+        if not rel and title:
+            self._poster_misses.append((title, type_))
+        return rel
+
+    def _start_poster_prefetch(self):
+        misses, self._poster_misses = self._poster_misses, []
+        if misses:
+            self.poster_mgr.prefetch(misses, on_ready=self._patch_thumb, on_done=self._on_prefetch_done)
+
+    def _patch_thumb(self, title: str, type_: str, rel: str):
+        """
+        Podmienia placeholder na lokalny plakat w miejscu. Generację (ETag, bloby, indeks
+        wyszukiwania, SSE) podbijamy najwyżej raz na POSTER_BUMP_EVERY i raz na końcu prefetchu –
+        zimny start z setkami plakatów nie unieważnia wszystkiego setki razy.
+        """
+        kind = "films" if type_ == "movie" else "series"
+        norm = _normalize(title)
+        bump = False
+        with self._lock:
+            for it in self.data.get(kind, []):
+                if _normalize(it.get("title") or "") == norm:
+                    it["thumb"] = rel
+                    self._thumbs_dirty = True
+            now = time.monotonic()
+            if self._thumbs_dirty and now - self._thumbs_bumped >= POSTER_BUMP_EVERY:
+                bump = True
+                self._thumbs_dirty = False
+                self._thumbs_bumped = now
+                self._generation += 1
+        if bump:
+            self._notify_generation()
+
+    def _on_prefetch_done(self):
+        with self._lock:
+            bump, self._thumbs_dirty = self._thumbs_dirty, False
+            if bump:
+                self._thumbs_bumped = time.monotonic()
+                self._generation += 1
+            self._save()
+        if bump:
+            self._notify_generation()
+
+    def _notify_generation(self):
+        """Zdarzenie SSE "available" – klienci przeładowują listę zamiast odpytywać."""
+        event_bus.publish("available", "generation", {"generation": self._generation})
+
+    def _film_entry(self, plex, video) -> dict:
+        key = str(video.ratingKey)
+        title = video.title
+        local_thumb = self._poster_or_queue(title, "movie")
+        progress = (
+            100
+            if getattr(video, "isWatched", False)
+            else (round(((video.viewOffset or 0) / (video.duration or 1)) * 100, 1) if video.viewOffset else 0)
+        )
+        watched_at = int(video.lastViewedAt.timestamp() * 1000) if video.lastViewedAt else None
+        try:
+            path = video.media[0].parts[0].file
+        except Exception:
+            path = ""
+        delete_at = watched_at + 7 * 86400000 if progress >= 100 and watched_at else None
+
+        return {
+            "id": key,
+            "title": title,
+            "thumb": local_thumb or (plex.url(video.thumb) if video.thumb else ""),
+            "progress": progress,
+            "watchedAt": watched_at,
+            "deleteAt": delete_at,
+            "path": path,
+            "type": "film",
+        }
+
     def _build_films(self, plex) -> List[dict]:
         out: List[dict] = []
         for video in plex.library.section("Filmy").all():
             try:
-                key = str(video.ratingKey)
-                title = video.title
-                local_thumb = self.poster_mgr.ensure_local(title, "movie")
-                progress = (
-                    100
-                    if getattr(video, "isWatched", False)
-                    else (round(((video.viewOffset or 0) / (video.duration or 1)) * 100, 1) if video.viewOffset else 0)
-                )
-                watched_at = int(video.lastViewedAt.timestamp() * 1000) if video.lastViewedAt else None
-                try:
-                    path = video.media[0].parts[0].file
-                except Exception:
-                    path = ""
-                delete_at = watched_at + 7 * 86400000 if progress >= 100 and watched_at else None
-
-                out.append(
-                    {
-                        "id": key,
-                        "title": title,
-                        "thumb": local_thumb or (plex.url(video.thumb) if video.thumb else ""),
-                        "progress": progress,
-                        "watchedAt": watched_at,
-                        "deleteAt": delete_at,
-                        "path": path,
-                        "type": "film",
-                    }
-                )
+                out.append(self._film_entry(plex, video))
+                self._marks[str(video.ratingKey)] = self._item_mark(video)
             except Exception:
                 continue
         return out
@@ -574,84 +893,116 @@ class AvailableCache:
         percents = [cls._episode_progress_percent(ep) for ep in (episodes or [])]
         return round(sum(percents) / len(percents)) if percents else 0
 
+    @staticmethod
+    def _episodes_by_show(section) -> Optional[Dict[str, list]]:
+        """
+        Wszystkie odcinki sekcji jednym stronicowanym zapytaniem (libtype=episode),
+        pogrupowane po grandparentRatingKey i posortowane jak show.episodes().
+        None => zapytanie hurtowe się nie udało (wołający robi fallback per serial).
+        """
+        try:
+            eps = section.search(libtype="episode", container_size=EPISODE_PAGE_SIZE)
+        except Exception as e:
+            try:
+                progress_log.warning("AvailableCache: hurtowe pobranie odcinków nieudane: %s", e)
+            except Exception:
+                pass
+            return None
+
+        grouped: Dict[str, list] = {}
+        for ep in eps:
+            try:
+                grouped.setdefault(str(ep.grandparentRatingKey), []).append(ep)
+            except Exception:
+                continue
+        for lst in grouped.values():
+            lst.sort(key=lambda e: (_to_int(getattr(e, "parentIndex", 0)), _to_int(getattr(e, "index", 0))))
+        return grouped
+
     def _build_series(self, plex) -> List[dict]:
         out: List[dict] = []
-        for show in plex.library.section("Seriale").all():
+        section = plex.library.section("Seriale")
+        eps_by_show = self._episodes_by_show(section)
+        for show in section.all():
             try:
                 key = str(show.ratingKey)
-                title = show.title
-                local_thumb = self.poster_mgr.ensure_local(title, "tv")
-
-                plex_eps = show.episodes()
-
-                # —— katalogi sezonów (każdy odcinek → dirname pliku)
-                season_dirs: Set[str] = set()
-                for ep in plex_eps:
-                    try:
-                        p = ep.media[0].parts[0].file
-                        if p:
-                            season_dirs.add(os.path.dirname(p))
-                    except Exception:
-                        pass
-                season_dirs_list = sorted(season_dirs)
-
-                # —— progres ważony i kompletność
-                series_progress = self._series_progress_weighted(plex_eps)
-                ep_list: List[dict] = []
-                all_finished = True
-                last_viewed_ms = 0
-
-                for ep in plex_eps:
-                    dur = int(getattr(ep, "duration", 0) or 0)
-                    off = int(getattr(ep, "viewOffset", 0) or 0)
-                    prog = self._episode_progress_percent(ep)
-                    ep_watched_ms = int(ep.lastViewedAt.timestamp() * 1000) if getattr(ep, "lastViewedAt",
-                                                                                       None) else None
-                    ep_delete_ms = (ep_watched_ms + 7 * 86400000) if (prog >= 100 and ep_watched_ms) else None
-
-                    if ep_watched_ms:
-                        last_viewed_ms = max(last_viewed_ms, ep_watched_ms)
-                    if prog < 100:
-                        all_finished = False
-
-                    ep_list.append({
-                        "season": ep.seasonNumber,
-                        "episode": ep.index,
-                        "title": ep.title,
-                        "progress": prog,
-                        "durationMs": dur,
-                        "viewOffsetMs": off,
-                        "watchedAt": ep_watched_ms,
-                        "deleteAt": ep_delete_ms,
-                        "id": str(ep.ratingKey),
-                        "parentId": key,
-                    })
-
-                # uwaga: timer serialu uruchamiamy TYLKO jeśli wszystkie odcinki = 100%
-                series_delete_at = (last_viewed_ms + 7 * 86400000) if (all_finished and last_viewed_ms) else None
-
-                # path (legacy) bywa pusty – prawdziwa lista jest w "paths"
-                try:
-                    path = show.media[0].parts[0].file
-                except Exception:
-                    path = ""
-
-                out.append({
-                    "id": key,
-                    "title": title,
-                    "thumb": local_thumb or (plex.url(show.thumb) if show.thumb else ""),
-                    "progress": series_progress,
-                    "watchedAt": last_viewed_ms,
-                    "deleteAt": series_delete_at,
-                    "episodes": ep_list,
-                    "path": path,
-                    "paths": season_dirs_list,  # ⬅️ TU: katalogi sezonów
-                    "type": "series",
-                })
+                eps = eps_by_show.get(key, []) if eps_by_show is not None else show.episodes()
+                out.append(self._series_entry(plex, show, eps))
+                self._marks[key] = self._item_mark(show)
             except Exception:
                 continue
         return out
 
+    def _series_entry(self, plex, show, plex_eps) -> dict:
+        key = str(show.ratingKey)
+        title = show.title
+        local_thumb = self._poster_or_queue(title, "tv")
+
+        # —— katalogi sezonów (każdy odcinek → dirname pliku)
+        season_dirs: Set[str] = set()
+        for ep in plex_eps:
+            try:
+                p = ep.media[0].parts[0].file
+                if p:
+                    season_dirs.add(os.path.dirname(p))
+            except Exception:
+                pass
+        season_dirs_list = sorted(season_dirs)
+
+        # —— progres ważony i kompletność
+        series_progress = self._series_progress_weighted(plex_eps)
+        ep_list: List[dict] = []
+        all_finished = True
+        last_viewed_ms = 0
+
+        for ep in plex_eps:
+            dur = int(getattr(ep, "duration", 0) or 0)
+            off = int(getattr(ep, "viewOffset", 0) or 0)
+            prog = self._episode_progress_percent(ep)
+            ep_watched_ms = int(ep.lastViewedAt.timestamp() * 1000) if getattr(ep, "lastViewedAt",
+                                                                               None) else None
+            ep_delete_ms = (ep_watched_ms + 7 * 86400000) if (prog >= 100 and ep_watched_ms) else None
+
+            if ep_watched_ms:
+                last_viewed_ms = max(last_viewed_ms, ep_watched_ms)
+            if prog < 100:
+                all_finished = False
+
+            ep_list.append({
+                "season": ep.seasonNumber,
+                "episode": ep.index,
+                "title": ep.title,
+                "progress": prog,
+                "durationMs": dur,
+                "viewOffsetMs": off,
+                "watchedAt": ep_watched_ms,
+                "deleteAt": ep_delete_ms,
+                "id": str(ep.ratingKey),
+                "parentId": key,
+            })
+
+        # uwaga: timer serialu uruchamiamy TYLKO jeśli wszystkie odcinki = 100%
+        series_delete_at = (last_viewed_ms + 7 * 86400000) if (all_finished and last_viewed_ms) else None
+
+        # path (legacy) bywa pusty – prawdziwa lista jest w "paths"
+        try:
+            path = show.media[0].parts[0].file
+        except Exception:
+            path = ""
+
+        return {
+            "id": key,
+            "title": title,
+            "thumb": local_thumb or (plex.url(show.thumb) if show.thumb else ""),
+            "progress": series_progress,
+            "watchedAt": last_viewed_ms,
+            "deleteAt": series_delete_at,
+            "episodes": ep_list,
+            "path": path,
+            "paths": season_dirs_list,  # ⬅️ TU: katalogi sezonów
+            "type": "series",
+        }
+
     def rebuild_now(self):
         plex = get_plex_or_none()
         if plex is None:
@@ -662,22 +1013,13 @@ class AvailableCache:
             return
 
         try:
-            films = self._build_films(plex)
-            series = self._build_series(plex)
-
-            used = {
-                i["thumb"]
-                for i in (films + series)
-                if isinstance(i.get("thumb"), str) and i["thumb"].startswith("/static/posters/")
-            }
-            self.poster_mgr.cleanup_unused(used)
-
-            payload = {"films": films, "series": series}
-            payload = self._apply_overrides(payload)
-
-            with self._lock:
-                self.data = payload
-                self._save()
+            with self._rebuild_lock:
+                self._marks = {}
+                self._poster_misses = []
+                films = self._build_films(plex)
+                series = self._build_series(plex)
+                self._publish(films, series)
+                self._start_poster_prefetch()
 
             try:
                 progress_log.info("AvailableCache: przebudowano cache (%d filmów, %d seriali)",
@@ -685,29 +1027,210 @@ class AvailableCache:
             except Exception:
                 pass
         except Exception as e:
+            self._marks = {}  # częściowe znaczniki są niewiarygodne – następny delta zrobi pełny rebuild
             try:
                 progress_log.warning("AvailableCache.rebuild_now błąd: %s", e)
             except Exception:
                 print(f"⚠️ AvailableCache.rebuild_now: {e}")
 
-    def _load_progress_overrides(self) -> Dict[str, int]:
+    def _publish(self, films: List[dict], series: List[dict]):
+        """Sprzątanie plakatów + override'y z magazynu postępów + podmiana danych i zapis."""
+        used = {
+            i["thumb"]
+            for i in (films + series)
+            if isinstance(i.get("thumb"), str) and i["thumb"].startswith("/static/posters/")
+        }
+        self.poster_mgr.cleanup_unused(used)
+
+        payload = {"films": films, "series": series}
+        payload = self._apply_overrides(payload)
+
+        with self._lock:
+            self.data = payload
+            self._generation += 1
+            self._save()
+        self._notify_generation()
+
+        # indeks wyszukiwania budujemy od razu, żeby pierwsze zapytanie nie płaciło za build
+        self._search_index()
+
+    def _delta_section(self, plex, section_name: str, old: Dict[str, dict], build_one) -> tuple:
+        """
+        Jedno listowanie sekcji; przeliczamy tylko pozycje, których znacznik się zmienił
+        (albo których jeszcze nie znamy). Resztę bierzemy z bieżącego cache bez zmian.
+        Zwraca (lista, ile_przeliczono).
+        """
+        out: List[dict] = []
+        rebuilt = 0
+        for item in plex.library.section(section_name).all():
+            key = ""
+            try:
+                key = str(item.ratingKey)
+                mark = self._item_mark(item)
+                prev = old.get(key)
+                if prev is not None and self._marks.get(key) == mark:
+                    out.append(prev)
+                    continue
+                out.append(build_one(item))
+                self._marks[key] = mark
+                rebuilt += 1
+            except Exception:
+                # nie udało się przeliczyć – zostaw starą wersję, spróbujemy przy następnym delta
+                if key and key in old:
+                    out.append(old[key])
+                continue
+        return out, rebuilt
+
+    def rebuild_delta(self) -> bool:
+        """
+        Przyrostowy rebuild: listuje sekcje „Filmy” i „Seriale” (po jednym zapytaniu),
+        porównuje znaczniki updatedAt/addedAt/lastViewedAt z poprzednim buildem i
+        pobiera odcinki tylko dla seriali, które się zmieniły. Usunięte pozycje wypadają.
+        Bez punktu odniesienia (świeży start) robi pełny rebuild_now().
+        Zwraca True, jeśli cache się zmienił.
+        """
+        if not self._marks:
+            self.rebuild_now()
+            return True
+
+        plex = get_plex_or_none()
+        if plex is None:
+            try:
+                progress_log.info("AvailableCache: Plex offline – pomijam rebuild_delta")
+            except Exception:
+                print("ℹ️ AvailableCache: Plex offline – pomijam rebuild_delta")
+            return False
+
         try:
-            with open(PROGRESS_CACHE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f) or {}
-            out = {}
-            for k, v in data.items():
+            with self._rebuild_lock:
+                self._poster_misses = []
+                with self._lock:
+                    old_films = {str(i.get("id")): i for i in self.data.get("films", [])}
+                    old_series = {str(i.get("id")): i for i in self.data.get("series", [])}
+
+                films, f_rebuilt = self._delta_section(
+                    plex, "Filmy", old_films, lambda v: self._film_entry(plex, v))
+                series, s_rebuilt = self._delta_section(
+                    plex, "Seriale", old_series, lambda sh: self._series_entry(plex, sh, sh.episodes()))
+
+                alive = {i["id"] for i in films} | {i["id"] for i in series}
+                gone = (set(old_films) | set(old_series)) - alive
+                for k in gone:
+                    self._marks.pop(k, None)
+
+                if not (f_rebuilt or s_rebuilt or gone):
+                    try:
+                        progress_log.debug("AvailableCache: delta – brak zmian")
+                    except Exception:
+                        pass
+                    return False
+
+                self._publish(films, series)
+                self._start_poster_prefetch()
+
+            try:
+                progress_log.info("AvailableCache: delta (%d filmów, %d seriali przeliczonych, %d usuniętych)",
+                                  f_rebuilt, s_rebuilt, len(gone))
+            except Exception:
+                pass
+            return True
+        except Exception as e:
+            try:
+                progress_log.warning("AvailableCache.rebuild_delta błąd: %s", e)
+            except Exception:
+                print(f"⚠️ AvailableCache.rebuild_delta: {e}")
+            return False
+
+    def refresh_items(self, keys: Set[str], removed: Set[str] = frozenset()) -> Set[str]:
+        """
+        Punktowe odświeżenie pozycji po zdarzeniach z Plexa (bez listowania sekcji).
+        keys    – ratingKey filmu / serialu / sezonu / odcinka do pobrania na nowo,
+        removed – ratingKey usuniętych pozycji (odcinek => przeliczamy jego serial).
+        Zwraca id filmów/seriali, które faktycznie się zmieniły.
+
+        Odświeżamy tylko pozycje, które cache już zna, i tylko z sekcji „Filmy” / „Seriale” –
+        nowe pozycje wchodzą przez rebuild_delta (aktywność library.* z Plexa), a nic z innych
+        bibliotek nie może trafić do „Dostępne” (i dalej pod timer usuwania).
+        """
+        plex = get_plex_or_none()
+        if plex is None or not (keys or removed):
+            return set()
+
+        changed: Set[str] = set()
+        with self._rebuild_lock:
+            self._poster_misses = []
+            with self._lock:
+                films = list(self.data.get("films", []))
+                series = list(self.data.get("series", []))
+            f_pos = {str(i.get("id")): n for n, i in enumerate(films)}
+            s_pos = {str(i.get("id")): n for n, i in enumerate(series)}
+            ep_parent = {str(ep.get("id")): str(sh.get("id")) for sh in series for ep in (sh.get("episodes") or [])}
+
+            shows: Set[str] = set()
+            gone: Set[str] = set()
+            for k in removed:
+                k = str(k)
+                if k in f_pos or k in s_pos:
+                    gone.add(k)
+                elif k in ep_parent:
+                    shows.add(ep_parent[k])
+
+            for k in keys:
+                k = str(k)
+                if k in gone:
+                    continue
                 try:
-                    da = v.get("delete_at")
-                    if isinstance(da, int):
-                        out[str(k)] = da
+                    it = plex.fetchItem(int(k))
                 except Exception:
-                    pass
-            return out
+                    continue  # zniknęło – delta/pełny rebuild to wyłapie
+                t = getattr(it, "type", "")
+                if not _in_section(it, "Filmy" if t == "movie" else "Seriale"):
+                    continue
+                if t == "movie":
+                    if k not in f_pos:
+                        continue
+                    films[f_pos[k]] = self._film_entry(plex, it)
+                    self._marks[k] = self._item_mark(it)
+                    changed.add(k)
+                elif t == "show":
+                    shows.add(k)
+                elif t in ("season", "episode"):
+                    sk = getattr(it, "grandparentRatingKey" if t == "episode" else "parentRatingKey", None)
+                    if sk:
+                        shows.add(str(sk))
+
+            for k in (shows - gone) & set(s_pos):
+                try:
+                    show = plex.fetchItem(int(k))
+                    if not _in_section(show, "Seriale"):
+                        continue
+                    entry = self._series_entry(plex, show, show.episodes())
+                except Exception:
+                    continue
+                series[s_pos[k]] = entry
+                self._marks[k] = self._item_mark(show)
+                changed.add(k)
+
+            if gone:
+                films = [i for i in films if str(i.get("id")) not in gone]
+                series = [i for i in series if str(i.get("id")) not in gone]
+                for k in gone:
+                    self._marks.pop(k, None)
+                changed |= gone
+
+            if changed:
+                self._publish(films, series)
+                self._start_poster_prefetch()
+        return changed
+
+    def _load_progress_overrides(self) -> Dict[str, int]:
+        try:
+            return progress_store.delete_at_overrides()
         except Exception:
             return {}
 
     def _apply_overrides(self, payload: dict) -> dict:
-        """Podmień deleteAt w films/series oraz ODCINKACH jeśli override w progress_cache jest większy."""
+        """Podmień deleteAt w films/series oraz ODCINKACH jeśli override w magazynie postępów jest większy."""
         overrides = self._load_progress_overrides()
 
         def _pick(cur, ov):
@@ -755,16 +1278,23 @@ class AvailableCache:
         patched = self._apply_overrides(current)
         with self._lock:
             self.data = patched
+            self._generation += 1
             self._save()
+        self._notify_generation()
 
-    def refresh_in_background(self, every_minutes: int = 30):
+    def refresh_in_background(self, every_minutes: int = 30, full_every: int = 12):
+        """Co every_minutes przyrostowy rebuild; co full_every-ty tick pełny (naprawczy)."""
         def _loop():
+            tick = 0
             while not SHUTDOWN_EVENT.is_set():
                 try:
-                    SHUTDOWN_EVENT.wait(max(1, every_minutes) * 60)
-                    if SHUTDOWN_EVENT.is_set():
+                    if _poll_wait(every_minutes):
                         break
-                    self.rebuild_now()
+                    tick += 1
+                    if full_every and tick % max(1, full_every) == 0:
+                        self.rebuild_now()
+                    else:
+                        self.rebuild_delta()
                 except Exception:
                     try:
                         progress_log.warning("Available watchdog error", exc_info=True)
@@ -781,6 +1311,146 @@ class AvailableCache:
         with self._lock:
             return list(self.data.get("series", []))
 
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def serialized(self, kind: str) -> tuple:
+        """
+        (body, etag) dla "films"/"series": JSON serializowany raz na generację danych,
+        ETag = hash treści (ten sam content => ten sam ETag, nawet po nowej generacji).
+        Słaby ETag (W/), bo ta sama treść idzie też w wariantach gzip/br.
+        """
+        with self._lock:
+            gen = self._generation
+            hit = self._blobs.get(kind)
+            if hit and hit[0] == gen:
+                return hit[1]["identity"], hit[2]
+            items = list(self.data.get(kind, []))
+
+        body = _json_bytes(items)
+        etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if self._generation == gen:
+                self._blobs[kind] = (gen, {"identity": body}, etag)
+        return body, etag
+
+    def _index_locked(self, kind: str) -> Dict[str, int]:
+        """id -> pozycja na liście (pod self._lock; przeliczane raz na generację)."""
+        hit = self._positions.get(kind)
+        if hit and hit[0] == self._generation:
+            return hit[1]
+        idx = {str(it.get("id")): i for i, it in enumerate(self.data.get(kind, []))}
+        self._positions[kind] = (self._generation, idx)
+        return idx
+
+    def find(self, kind: str, item_id: str) -> Optional[dict]:
+        with self._lock:
+            pos = self._index_locked(kind).get(str(item_id))
+            return self.data.get(kind, [])[pos] if pos is not None else None
+
+    @staticmethod
+    def _genres_by_title() -> Dict[tuple, List[str]]:
+        """(type_, norm_title) -> gatunki z cache TMDb w magazynie postępów."""
+        out: Dict[tuple, List[str]] = {}
+        try:
+            for key, v in progress_store.meta_with_prefix("genres:").items():
+                _p, type_, norm = key.split(":", 2)
+                if isinstance(v, dict) and v.get("genres"):
+                    out[(type_, norm)] = list(v["genres"])
+        except Exception:
+            pass
+        return out
+
+    def _search_index(self) -> tuple:
+        """(generation, SearchIndex) dla bieżących danych – build poza lockiem, raz na generację."""
+        with self._lock:
+            if self._search[1] is not None and self._search[0] == self._generation:
+                return self._search
+            gen = self._generation
+            films = self.data.get("films", [])
+            series = self.data.get("series", [])
+
+        idx = SearchIndex(films, series, self._genres_by_title())
+        with self._lock:
+            if self._generation == gen:
+                self._search = (gen, idx)
+        return gen, idx
+
+    def search(self, query: str, limit: int = 0) -> dict:
+        """{"films": [...], "series": [...]} wg trafności – pozycje z indeksu, dicty wprost z cache."""
+        for _ in range(3):
+            gen, idx = self._search_index()
+            f_pos, s_pos = idx.search(query, limit=limit)
+            with self._lock:
+                if gen != self._generation:
+                    continue  # dane podmienione w trakcie – pozycje mogą już nie pasować
+                films = self.data.get("films", [])
+                series = self.data.get("series", [])
+                return {"films": [films[i] for i in f_pos], "series": [series[i] for i in s_pos]}
+        # dane zmieniają się szybciej niż budujemy indeks – zwykłe przeszukanie
+        q = query.strip().lower()
+        with self._lock:
+            return {
+                "films": [i for i in self.data.get("films", []) if q in (i.get("title") or "").lower()],
+                "series": [i for i in self.data.get("series", []) if q in (i.get("title") or "").lower()],
+            }
+
+    def page(self, kind: str, fields: Optional[List[str]] = None, limit: Optional[int] = None,
+             cursor: Optional[str] = None, include_episodes: bool = False) -> dict:
+        """
+        Stronicowany widok listy z projekcją pól.
+        cursor = "<generacja>:<id ostatniej pozycji poprzedniej strony>"; kursor z innej
+        generacji albo nieznany id => ValueError (lista zmieniła się między stronami –
+        klient zaczyna od nowa).
+        """
+        with self._lock:
+            items = self.data.get(kind, [])
+            start = 0
+            if cursor:
+                cgen, _, cid = str(cursor).partition(":")
+                if not cid or cgen != str(self._generation):
+                    raise ValueError("stale_cursor")
+                pos = self._index_locked(kind).get(cid)
+                if pos is None:
+                    raise ValueError("stale_cursor")
+                start = pos + 1
+            end = len(items) if not limit else min(len(items), start + max(1, int(limit)))
+            chunk = items[start:end]
+            total = len(items)
+            gen = self._generation
+
+        out = []
+        for it in chunk:
+            d = {k: it[k] for k in fields if k in it} if fields else dict(it)
+            if include_episodes:
+                d["episodes"] = it.get("episodes") or []
+            else:
+                d.pop("episodes", None)
+            out.append(d)
+
+        return {
+            "items": out,
+            "total": total,
+            "next_cursor": f"{gen}:{chunk[-1].get('id')}" if (chunk and end < total) else None,
+            "generation": gen,
+        }
+
+    def serialized_variant(self, kind: str, encoding: str) -> bytes:
+        """Skompresowany blob (gzip/br) – liczony raz na generację i trzymany obok JSON-a."""
+        body, _etag = self.serialized(kind)
+        with self._lock:
+            hit = self._blobs.get(kind)
+            if hit and hit[1].get("identity") is body and encoding in hit[1]:
+                return hit[1][encoding]
+        blob = _compress(body, encoding)
+        with self._lock:
+            hit = self._blobs.get(kind)
+            if hit and hit[1].get("identity") is body:
+                hit[1][encoding] = blob
+        return blob
+
 
 poster_mgr = PosterManager(POSTER_DIR, POSTER_CACHE_FILE)
 available_cache = AvailableCache(poster_mgr)
@@ -817,10 +1487,10 @@ def trigger_postfinish_preload(title: str, path: str):
                 time.sleep(1)
             try:
                 if not SHUTDOWN_EVENT.is_set():
-                    available_cache.rebuild_now()
+                    available_cache.rebuild_delta()
                     print("✅ [PostFinish] Cache przebudowany, plakaty gotowe.")
             except Exception as e:
-                print(f"⚠️ [PostFinish] rebuild_now error: {e}")
+                print(f"⚠️ [PostFinish] rebuild_delta error: {e}")
         except Exception as e:
             print(f"⚠️ [PostFinish] preload error: {e}")
     threading.Thread(
@@ -842,6 +1512,8 @@ def stop_backgrounds(join_timeout: float = 5.0):
                 th.join(timeout=remaining)
             except Exception:
                 pass
+    # otwarte strumienie SSE kończą się od razu
+    event_bus.close_all()
 
 _SHUTDOWN_ONCE = False
 def graceful_shutdown(reason: str = "unknown", hard: bool = False):
@@ -900,9 +1572,13 @@ def graceful_shutdown(reason: str = "unknown", hard: bool = False):
 
 
 
-def sync_progress_cache_from_available():
+def sync_progress_cache_from_available(only_ids: Optional[Set[str]] = None):
+    """only_ids – synchronizuj tylko te filmy/seriale (np. po zdarzeniu z Plexa)."""
     films = available_cache.get_films()
     series = available_cache.get_series()
+    if only_ids is not None:
+        films = [f for f in films if str(f.get("id") or "") in only_ids]
+        series = [x for x in series if str(x.get("id") or "") in only_ids]
 
     def pick_delete_series(prev_delete, new_delete):
         # jeśli nowy stan nie ma timera (nie 100%), to go kasujemy
@@ -912,8 +1588,15 @@ def sync_progress_cache_from_available():
         od = prev_delete if isinstance(prev_delete, int) else None
         return nd if od is None else max(od, nd)
 
+    # wczytujemy tylko wiersze, których dotyczy synchronizacja (po PK), nie cały magazyn
+    ids = [str(f.get("id") or "") for f in films]
+    for s in series:
+        ids.append(str(s.get("id") or ""))
+        ids.extend(str(ep.get("id") or "") for ep in (s.get("episodes") or []))
+
     with PROGRESS_LOCK:
-        store = _progress_load()
+        store = progress_store.get_many(i for i in ids if i)
+        before = dict(store)
 
         # — filmy (bez zmian)
         for f in films:
@@ -986,7 +1669,9 @@ def sync_progress_cache_from_available():
                     "delete_at": keep_ep,
                 }
 
-        _progress_save(store)
+        # zapisujemy tylko wiersze, które faktycznie się zmieniły (jedna transakcja)
+        changed = {k: v for k, v in store.items() if before.get(k) != v}
+        progress_store.put_many(changed)
 
     try:
         available_cache.apply_overrides_from_progress()
@@ -1034,7 +1719,8 @@ def start_progress_cache_watchdog(every_minutes: int = 10):
                 except Exception:
                     print("⚠️ progress-cache sync:", sys.exc_info()[1])
 
-            SHUTDOWN_EVENT.wait(max(1, every_minutes) * 60)
+            if _poll_wait(every_minutes):
+                break
 
     try:
         if not SHUTDOWN_EVENT.is_set():
@@ -1060,13 +1746,175 @@ def start_progress_cache_watchdog(every_minutes: int = 10):
 
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Zdarzenia z Plexa (websocket) – odświeżanie na bieżąco zamiast częstego pollingu
+# ─────────────────────────────────────────────────────────────────────────────
+PLEX_EVENTS_ENABLED = os.environ.get("PFLIX_PLEX_EVENTS", "1") != "0"
+PLEX_EVENTS_DEBOUNCE = 3.0        # s – zbieramy serię zdarzeń w jedno odświeżenie
+PLEX_EVENTS_PLAYING_EVERY = 60.0  # s – w trakcie odtwarzania odświeżamy pozycję najwyżej tak często
+PLEX_EVENTS_POLL_MINUTES = 360    # interwał pętli pollingowych, gdy websocket działa
+
+# timeline: type 1=film, 2=serial, 3=sezon, 4=odcinek; state 5=przetworzono, 9=usunięto
+_TIMELINE_TYPES = {1, 2, 3, 4}
+_TIMELINE_DONE, _TIMELINE_DELETED = 5, 9
+
+
+class PlexEventBridge:
+    """Zbiera zdarzenia z PlexEventListener i hurtem aplikuje je do AvailableCache + magazynu postępów."""
+
+    def __init__(self, cache: "AvailableCache"):
+        self.cache = cache
+        self._cond = threading.Condition()
+        self._keys: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._delta = False
+        self._last_playing: Dict[str, float] = {}
+        self.listener: Optional[plex_events.PlexEventListener] = None
+        self.stats = {"applied": 0, "items": 0, "deltas": 0}
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.listener and self.listener.connected)
+
+    def start(self, url: str) -> bool:
+        self.listener = plex_events.PlexEventListener(
+            url, self.on_event, stop_event=SHUTDOWN_EVENT, on_state=self._on_state)
+        if not self.listener.start():
+            self.listener = None
+            return False
+        threading.Thread(target=self._apply_loop, daemon=True, name="plex-events-apply").start()
+        return True
+
+    def _on_state(self, connected: bool):
+        try:
+            progress_log.info("Plex websocket: %s", "połączono" if connected else "rozłączono")
+        except Exception:
+            pass
+        if connected:
+            # mogliśmy coś przegapić, gdy nie było połączenia
+            with self._cond:
+                self._delta = True
+                self._cond.notify()
+
+    def on_event(self, kind: str, entry: dict):
+        key = str(entry.get("itemID") or entry.get("ratingKey") or "")
+        with self._cond:
+            if kind == "timeline":
+                if entry.get("identifier") != "com.plexapp.plugins.library" or not key:
+                    return
+                if _to_int(entry.get("type")) not in _TIMELINE_TYPES:
+                    return
+                state = _to_int(entry.get("state"))
+                if state == _TIMELINE_DELETED:
+                    self._removed.add(key)
+                elif state == _TIMELINE_DONE:
+                    self._keys.add(key)
+                else:
+                    return
+            elif kind == "playing":
+                if not key:
+                    return
+                now = time.time()
+                if entry.get("state") == "playing" and now - self._last_playing.get(key, 0) < PLEX_EVENTS_PLAYING_EVERY:
+                    return
+                self._last_playing[key] = now
+                if len(self._last_playing) > 64:
+                    # wpisy starsze niż okno nic już nie blokują – mapa nie rośnie z każdym tytułem
+                    self._last_playing = {k: t for k, t in self._last_playing.items()
+                                          if now - t < PLEX_EVENTS_PLAYING_EVERY}
+                self._keys.add(key)
+            elif kind == "activity":
+                act = entry.get("Activity") or {}
+                if entry.get("event") != "ended" or not str(act.get("type") or "").startswith("library."):
+                    return
+                self._delta = True
+            else:
+                return
+            self._cond.notify()
+
+    def _apply_loop(self):
+        while not SHUTDOWN_EVENT.is_set():
+            with self._cond:
+                while not (self._keys or self._removed or self._delta) and not SHUTDOWN_EVENT.is_set():
+                    self._cond.wait(1.0)
+            if SHUTDOWN_EVENT.wait(PLEX_EVENTS_DEBOUNCE):
+                break
+            with self._cond:
+                keys, self._keys = self._keys, set()
+                removed, self._removed = self._removed, set()
+                delta, self._delta = self._delta, False
+            try:
+                if delta:
+                    self.cache.rebuild_delta()
+                    self.stats["deltas"] += 1
+                    sync_progress_cache_from_available()
+                else:
+                    changed = self.cache.refresh_items(keys, removed)
+                    if changed:
+                        sync_progress_cache_from_available(only_ids=changed)
+                    self.stats["items"] += len(changed)
+                self.stats["applied"] += 1
+            except Exception:
+                try:
+                    progress_log.warning("Plex events: błąd aplikowania", exc_info=True)
+                except Exception:
+                    print("⚠️ Plex events:", sys.exc_info()[1])
+
+
+plex_bridge = PlexEventBridge(available_cache)
+
+
+def start_plex_events() -> bool:
+    """Opcjonalny nasłuch websocket (wymaga websocket-client; PFLIX_PLEX_EVENTS=0 wyłącza)."""
+    if not PLEX_EVENTS_ENABLED or not PLEX_URL or not TOKEN:
+        return False
+    if not plex_events.available():
+        try:
+            progress_log.info("Plex events: brak websocket-client – zostaje sam polling")
+        except Exception:
+            pass
+        return False
+    return plex_bridge.start(plex_events.notifications_url(PLEX_URL, TOKEN))
+
+
+def _poll_wait(every_minutes: int) -> bool:
+    """
+    Czeka na kolejny tick pętli pollingowej. Gdy websocket Plexa działa, interwał
+    rośnie do PLEX_EVENTS_POLL_MINUTES; po rozłączeniu wraca do every_minutes
+    (sprawdzane co minutę). Zwraca True, gdy trwa zamykanie.
+    """
+    start = time.time()
+    while not SHUTDOWN_EVENT.is_set():
+        minutes = max(every_minutes, PLEX_EVENTS_POLL_MINUTES) if plex_bridge.connected else every_minutes
+        left = max(1, minutes) * 60 - (time.time() - start)
+        if left <= 0:
+            return False
+        SHUTDOWN_EVENT.wait(min(60.0, left))
+    return True
+
+
+@app.route("/debug/plex-events")
+def debug_plex_events():
+    lst = plex_bridge.listener
+    return jsonify({
+        "enabled": PLEX_EVENTS_ENABLED,
+        "available": plex_events.available(),
+        "connected": plex_bridge.connected,
+        "listener": dict(lst.stats) if lst else None,
+        "bridge": dict(plex_bridge.stats),
+    })
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Automatyczny cleanup wg PROGRESS_CACHE_FILE
 # ─────────────────────────────────────────────────────────────────────────────
 @app.after_request
 def add_no_store(resp):
     try:
-        if request.path.startswith("/plex/") or request.path in ("/search-local", "/status"):
+        if request.path.startswith("/plex/") and resp.headers.get("ETag"):
+            # zasób z ETagiem: przeglądarka może trzymać kopię, ale zawsze rewaliduje (304)
+            resp.headers["Cache-Control"] = "no-cache"
+        elif request.path.startswith("/plex/") or request.path in ("/search-local", "/status"):
             resp.headers["Cache-Control"] = "no-store"
             resp.headers["Pragma"] = "no-cache"
             resp.headers["Expires"] = "0"
@@ -1074,274 +1922,303 @@ def add_no_store(resp):
         pass
     return resp
 
+@app.route("/debug/posters")
+def debug_posters():
+    return jsonify(poster_mgr.stats())
+
+
 @app.route("/debug/progress/<item_id>")
 def debug_progress(item_id):
-    with PROGRESS_LOCK:
-        store = _progress_load()
-        return jsonify(store.get(item_id) or {"error": "not found"})
+    return jsonify(progress_store.get(item_id) or {"error": "not found"})
+
+
+_CLEANUP_LOG_LOCK = threading.Lock()
+_CLEANUP_LOCK = threading.Lock()  # pętla i ręczne wywołanie nie sprzątają naraz
 
 
 def log_cleanup_entry(title, media_type, path):
     log_line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✅ Usunięto: {title} ({media_type}) – {path}\n"
-    with open("cleanup.log", "a", encoding="utf-8") as log_file:
-        log_file.write(log_line)
+    with _CLEANUP_LOG_LOCK:
+        with open("cleanup.log", "a", encoding="utf-8") as log_file:
+            log_file.write(log_line)
 
 
-def cleanup_old_media():
+def _is_series_fully_watched(show, finished_threshold: float = 0.98) -> bool:
+    """Ostateczna weryfikacja po stronie Plex: wszystkie odcinki serialu obejrzane."""
     try:
-        now = int(time.time() * 1000)
-        removed = []
-
-        # Mapuj dysk sieciowy (Windows) – bez paniki jeśli już jest
-        try:
-            map_network_drive()
-        except Exception:
-            pass
-
-        # Plex może być offline – wtedy grzecznie pomijamy cleanup
-        plex = get_plex_or_none()
-        if plex is None:
-            try:
-                progress_log.info("cleanup: Plex offline – pomijam sprzątanie")
-            except Exception:
-                pass
-            return jsonify({"removed": [], "skipped": True, "reason": "plex_unavailable"})
+        episodes = show.episodes()
+    except Exception:
+        return False
 
-        # helper: czy serial w 100% obejrzany (ostateczna weryfikacja po stronie Plex)
-        def _is_series_fully_watched(series_id: str, finished_threshold: float = 0.98) -> bool:
+    try:
+        for ep in episodes:
+            pct = AvailableCache._episode_progress_percent(ep, finished_threshold)
+            if pct < 100:
+                return False
+        return True
+    except Exception:
+        for ep in episodes:
             try:
-                show = plex.fetchItem(int(series_id))
-                episodes = show.episodes()
+                dur = int(getattr(ep, "duration", 0) or 0)
+                if int(getattr(ep, "viewCount", 0) or 0) > 0:
+                    continue
+                off = int(getattr(ep, "viewOffset", 0) or 0)
+                if dur <= 0 or (off / max(1, dur)) < finished_threshold:
+                    return False
             except Exception:
                 return False
+        return True
 
-            try:
-                for ep in episodes:
-                    pct = AvailableCache._episode_progress_percent(ep, finished_threshold)
-                    if pct < 100:
-                        return False
-                return True
-            except Exception:
-                for ep in episodes:
-                    try:
-                        dur = int(getattr(ep, "duration", 0) or 0)
-                        if int(getattr(ep, "viewCount", 0) or 0) > 0:
-                            continue
-                        off = int(getattr(ep, "viewOffset", 0) or 0)
-                        if dur <= 0 or (off / max(1, dur)) < finished_threshold:
-                            return False
-                    except Exception:
-                        return False
-                return True
 
-        # snapshot kluczy
-        with PROGRESS_LOCK:
-            store = _progress_load()
-            keys = list(store.keys())
+def _plan_cleanup_item(plex, item_id: str, entry: dict) -> dict:
+    """
+    Plan dla jednego przeterminowanego filmu/serialu – najwyżej jedno fetchItem,
+    ten sam obiekt służy do sprawdzenia serialu, ścieżek i późniejszego usunięcia.
+    """
+    media_type = (entry.get("type") or "").lower()
+    title = entry.get("title") or ""
+    plan = {"id": item_id, "title": title, "type": media_type,
+            "delete_at": entry.get("delete_at"), "action": "delete", "paths": []}
 
-        for key in keys:
-            try:
-                # świeży odczyt wpisu
-                with PROGRESS_LOCK:
-                    entry = _progress_load().get(key)
-                if not entry:
-                    continue
+    try:
+        plex_item = plex.fetchItem(int(item_id))
+    except Exception:
+        plex_item = None
 
-                item_id = str(entry.get("id") or key)
-                media_type = (entry.get("type") or "").lower()
-                title = entry.get("title") or ""
-                delete_at = entry.get("delete_at")
-
-                # 1) Odcinków NIE kasujemy automatycznie – jedynie czyścimy przeterminowany timer
-                if media_type == "episode":
-                    if isinstance(delete_at, int) and delete_at < now:
-                        with PROGRESS_LOCK:
-                            s2 = _progress_load()
-                            if item_id in s2 and isinstance(s2[item_id], dict):
-                                s2[item_id]["delete_at"] = None
-                                _progress_save(s2)
-                    continue
+    # Seriale tylko jeśli CAŁOŚĆ = 100% – inaczej tylko zerujemy timer
+    if media_type == "series" and (plex_item is None or not _is_series_fully_watched(plex_item)):
+        plan.update(action="clear_timer", reason="series_not_fully_watched")
+        return plan
 
-                # 2) Timer nieaktywny → nic do roboty
-                if not (isinstance(delete_at, int) and delete_at < now):
-                    continue
+    paths: List[str] = []
+    entry_paths = entry.get("paths") if isinstance(entry.get("paths"), list) else []
+    if entry_paths:
+        paths.extend(entry_paths)
+    elif entry.get("path"):
+        paths.append(entry.get("path"))
 
-                # 3) Filmy kasujemy normalnie; Seriale tylko jeśli CAŁOŚĆ = 100%
-                if media_type == "series":
-                    if not _is_series_fully_watched(item_id):
-                        with PROGRESS_LOCK:
-                            s2 = _progress_load()
-                            if item_id in s2 and isinstance(s2[item_id], dict):
-                                s2[item_id]["delete_at"] = None
-                                _progress_save(s2)
-                        try:
-                            progress_log.info("cleanup: skipped series (not 100%%) id=%s title=%s", item_id, title)
-                        except Exception:
-                            pass
-                        continue
-                elif media_type not in ("film", "movie", "series"):
-                    continue
+    # ścieżki z Plexa (serial: katalogi sezonów, film: plik)
+    if plex_item is not None:
+        try:
+            if media_type == "series":
+                season_dirs = set()
+                for ep in plex_item.episodes():
+                    try:
+                        fp = ep.media[0].parts[0].file
+                        if fp:
+                            season_dirs.add(os.path.dirname(fp))
+                    except Exception:
+                        pass
+                paths.extend(sorted(season_dirs))
+            else:
+                fp = plex_item.media[0].parts[0].file
+                if fp:
+                    paths.append(fp)
+        except Exception as e:
+            try:
+                progress_log.warning("cleanup: ścieżki z Plexa (%s): %s", item_id, e)
+            except Exception:
+                pass
+
+    # deduplikacja + normalizacja ścieżek (Windows/net share fix)
+    seen = set()
+    for p in paths:
+        p2 = fix_windows_path(p or "")
+        if p2 and p2 not in seen:
+            plan["paths"].append(p2)
+            seen.add(p2)
+    plan["_plex_item"] = plex_item
+    return plan
 
-                # 4) Zbierz ścieżki do usunięcia
-                paths_to_remove: List[str] = []
-                entry_paths = entry.get("paths") if isinstance(entry.get("paths"), list) else []
-                if entry_paths:
-                    paths_to_remove.extend(entry_paths)
-                elif entry.get("path"):
-                    paths_to_remove.append(entry.get("path"))
 
-                # Fallback: jeśli brak ścieżek w cache → spróbuj z Plex
-                plex_item = None
+def plan_cleanup(plex, now_ms: Optional[int] = None) -> List[dict]:
+    """
+    Faza 1: jeden przebieg po indeksie delete_at (tylko przeterminowane). Odcinki => zerowanie
+    timera; filmy/seriale sprawdzane w Plexie równolegle (CLEANUP_WORKERS). Nic nie usuwa.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    now = now_ms or int(time.time() * 1000)
+    plan: List[dict] = []
+    candidates = []
+    for key, entry in progress_store.expired(now).items():
+        item_id = str(entry.get("id") or key)
+        media_type = (entry.get("type") or "").lower()
+        if media_type == "episode":
+            # odcinków NIE kasujemy automatycznie – jedynie czyścimy przeterminowany timer
+            plan.append({"id": item_id, "title": entry.get("title") or "", "type": media_type,
+                         "delete_at": entry.get("delete_at"), "action": "clear_timer", "reason": "episode"})
+        elif media_type in ("film", "movie", "series"):
+            candidates.append((item_id, entry))
+
+    if candidates:
+        with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS, thread_name_prefix="cleanup-plan") as ex:
+            for res in ex.map(lambda c: _plan_cleanup_item(plex, *c), candidates):
+                plan.append(res)
+    return plan
+
+
+def _remove_paths(title: str, media_type: str, paths: List[str]) -> List[dict]:
+    import shutil
+    fs_status = []
+    for p in paths:
+        try:
+            if os.path.isfile(p):
+                os.remove(p)
+                fs_status.append({"path": p, "status": "file_removed"})
+                log_cleanup_entry(title, media_type, p)
+            elif os.path.isdir(p):
                 try:
-                    try:
-                        plex_item = plex.fetchItem(int(item_id))
-                    except Exception:
-                        plex_item = None
-
-                    if plex_item is not None:
-                        if media_type == "series":
-                            season_dirs = set()
-                            for ep in plex_item.episodes():
-                                try:
-                                    fp = ep.media[0].parts[0].file
-                                    if fp:
-                                        season_dirs.add(os.path.dirname(fp))
-                                except Exception:
-                                    pass
-                            paths_to_remove.extend(list(season_dirs))
-                        else:  # film
-                            try:
-                                fp = plex_item.media[0].parts[0].file
-                                if fp:
-                                    paths_to_remove.append(fp)
-                            except Exception:
-                                pass
+                    shutil.rmtree(p)
+                    fs_status.append({"path": p, "status": "dir_removed_recursive"})
+                    log_cleanup_entry(title, media_type, p)
                 except Exception as e:
-                    try:
-                        progress_log.warning("cleanup: fetchItem fallback failed (%s): %s", item_id, e)
-                    except Exception:
-                        pass
+                    fs_status.append({"path": p, "status": f"dir_remove_error: {e}"})
+            else:
+                fs_status.append({"path": p, "status": "path_not_found"})
+        except Exception as e:
+            fs_status.append({"path": p, "status": f"remove_error: {e}"})
+
+    # spróbuj usunąć puste katalogi nadrzędne
+    for parent in {os.path.dirname(p) for p in paths}:
+        try:
+            if parent and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+                try:
+                    progress_log.info("FS removed empty parent dir: %s", parent)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+    return fs_status
+
+
+def _execute_cleanup_item(plex, item: dict) -> dict:
+    """Dysk + Plex + plakat dla jednej pozycji planu (wątek puli)."""
+    item_id, title, media_type = item["id"], item["title"], item["type"]
+    fs_status = _remove_paths(title, media_type, item["paths"])
+
+    # usuń z Plex (preferuj obiekt z planu, potem tytuł w sekcji)
+    plex_removed = False
+    try:
+        plex_item = item.get("_plex_item")
+        if plex_item is not None:
+            plex_item.delete()
+            plex_removed = True
+        else:
+            try:
+                if media_type in ("film", "movie"):
+                    plex.library.section("Filmy").get(title).delete()
+                    plex_removed = True
+                elif media_type == "series":
+                    plex.library.section("Seriale").get(title).delete()
+                    plex_removed = True
+            except Exception:
+                pass
+    except Exception as e:
+        try:
+            progress_log.warning(
+                "cleanup: plex remove failed id=%s title=%s type=%s err=%s",
+                item_id, title, media_type, e
+            )
+        except Exception:
+            pass
+
+    # plakat od razu (filmy/seriale – odcinków nie tykamy)
+    try:
+        poster_mgr.remove_for_title("movie" if media_type in ("film", "movie") else "tv", title, force=True)
+    except Exception:
+        pass
 
-                # deduplikacja + normalizacja ścieżek (Windows/net share fix)
-                norm_paths = []
-                seen = set()
-                for p in paths_to_remove:
-                    p2 = fix_windows_path(p or "")
-                    if p2 and p2 not in seen:
-                        norm_paths.append(p2)
-                        seen.add(p2)
+    return {"id": item_id, "title": title, "type": media_type, "fs": fs_status, "plexRemoved": plex_removed}
 
-                fs_status = []
 
-                # 5) Fizyczne usuwanie z dysku (rekurencyjnie dla katalogów)
-                import shutil
-                for p in norm_paths:
-                    try:
-                        if os.path.isfile(p):
-                            os.remove(p)
-                            fs_status.append({"path": p, "status": "file_removed"})
-                            log_cleanup_entry(title, media_type, p)
-                        elif os.path.isdir(p):
-                            try:
-                                shutil.rmtree(p)
-                                fs_status.append({"path": p, "status": "dir_removed_recursive"})
-                                log_cleanup_entry(title, media_type, p)
-                            except Exception as e:
-                                fs_status.append({"path": p, "status": f"dir_remove_error: {e}"})
-                        else:
-                            fs_status.append({"path": p, "status": "path_not_found"})
-                    except Exception as e:
-                        fs_status.append({"path": p, "status": f"remove_error: {e}"})
+def execute_cleanup(plex, plan: List[dict]) -> dict:
+    """
+    Faza 2: kasowanie w ograniczonej puli, potem JEDNA transakcja w magazynie postępów
+    i JEDNO punktowe unieważnienie cache „Dostępne” (tylko usunięte pozycje).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    to_delete = [i for i in plan if i["action"] == "delete"]
+    to_clear = [i for i in plan if i["action"] == "clear_timer"]
 
-                # spróbuj usunąć puste katalogi nadrzędne
-                try:
-                    parents = {os.path.dirname(p) for p in norm_paths}
-                    for parent in parents:
-                        try:
-                            if parent and os.path.isdir(parent) and not os.listdir(parent):
-                                os.rmdir(parent)
-                                try:
-                                    progress_log.info("FS removed empty parent dir: %s", parent)
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
+    def _run(it: dict) -> Optional[dict]:
+        # plan mógł się zestarzeć (sprawdzanie seriali trwa) – timer anulowany/przesunięty => pomijamy
+        if not progress_store.is_expired(it["id"], int(time.time() * 1000)):
+            try:
+                progress_log.info("cleanup: timer changed since planning, skipping id=%s title=%s",
+                                  it["id"], it["title"])
+            except Exception:
+                pass
+            return None
+        return _execute_cleanup_item(plex, it)
 
-                # 6) Usuń z Plex (preferuj ID)
-                plex_removed = False
-                try:
-                    if 'plex_item' not in locals() or plex_item is None:
-                        try:
-                            plex_item = plex.fetchItem(int(item_id))
-                        except Exception:
-                            plex_item = None
-                    if plex_item is not None:
-                        plex_item.delete()
-                        plex_removed = True
-                    else:
-                        try:
-                            if media_type in ("film", "movie"):
-                                plex.library.section("Filmy").get(title).delete()
-                                plex_removed = True
-                            elif media_type == "series":
-                                plex.library.section("Seriale").get(title).delete()
-                                plex_removed = True
-                        except Exception:
-                            pass
-                except Exception as e:
-                    try:
-                        progress_log.warning(
-                            "cleanup: plex remove failed id=%s title=%s type=%s err=%s",
-                            item_id, title, media_type, e
-                        )
-                    except Exception:
-                        pass
+    removed: List[dict] = []
+    if to_delete:
+        with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS, thread_name_prefix="cleanup-exec") as ex:
+            for res in ex.map(_run, to_delete):
+                if res is not None:
+                    removed.append(res)
+    done = {r["id"] for r in removed}
 
-                # 7) Usuń wpis(y) z progress_cache.json
-                with PROGRESS_LOCK:
-                    store2 = _progress_load()
-                    if item_id in store2:
-                        store2.pop(item_id, None)
-                    if media_type == "series":
-                        to_del = [k for k, v in store2.items()
-                                  if isinstance(v, dict) and v.get("parent_id") == item_id]
-                        for k in to_del:
-                            store2.pop(k, None)
-                    _progress_save(store2)
-
-                # 7.5) Usuń plakat NATYCHMIAST (filmy/seriale – odcinków nie tykamy)
-                try:
-                    if media_type in ("film", "movie"):
-                        poster_mgr.remove_for_title("movie", title, force=True)
-                    elif media_type == "series":
-                        poster_mgr.remove_for_title("tv", title, force=True)
-                except Exception:
-                    pass
+    with PROGRESS_LOCK:
+        counts = progress_store.apply_batch(
+            int(time.time() * 1000),
+            clear_delete_at=[i["id"] for i in to_clear],
+            delete=[i["id"] for i in to_delete if i["type"] != "series" and i["id"] in done],
+            delete_with_children=[i["id"] for i in to_delete if i["type"] == "series" and i["id"] in done],
+        )
+    cleared = set(counts.pop("cleared_ids", []))
+    for i in to_clear:
+        if i["id"] not in cleared:
+            continue  # w międzyczasie nowy timer – zostaje, brak zdarzenia
+        _publish_delete_timer(i["id"], None)
+        if i.get("reason") == "series_not_fully_watched":
+            try:
+                progress_log.info("cleanup: skipped series (not 100%%) id=%s title=%s", i["id"], i["title"])
+            except Exception:
+                pass
 
-                removed.append({
-                    "id": item_id,
-                    "title": title,
-                    "type": media_type,
-                    "fs": fs_status,
-                    "plexRemoved": plex_removed
-                })
+    if removed:
+        try:
+            available_cache.refresh_items(set(), {r["id"] for r in removed})
+        except Exception:
+            pass
+    return {"removed": removed, "cleared": [i["id"] for i in to_clear if i["id"] in cleared], "store": counts}
 
-            except Exception:
-                try:
-                    progress_log.exception("cleanup loop error for key=%s", key)
-                except Exception:
-                    pass
-                continue
 
-        # (opcjonalnie) szybkie odświeżenie dostępnych po większym sprzątaniu
+def _plan_public(plan: List[dict]) -> List[dict]:
+    return [{k: v for k, v in i.items() if not k.startswith("_")} for i in plan]
+
+
+def run_cleanup(dry_run: bool = False) -> dict:
+    # Mapuj dysk sieciowy (Windows) – bez paniki jeśli już jest
+    try:
+        map_network_drive()
+    except Exception:
+        pass
+
+    # Plex może być offline – wtedy grzecznie pomijamy cleanup
+    plex = get_plex_or_none()
+    if plex is None:
         try:
-            available_cache.rebuild_now()
+            progress_log.info("cleanup: Plex offline – pomijam sprzątanie")
         except Exception:
             pass
+        return {"removed": [], "skipped": True, "reason": "plex_unavailable"}
+
+    with _CLEANUP_LOCK:
+        t0 = time.time()
+        plan = plan_cleanup(plex)
+        if dry_run:
+            return {"dry_run": True, "plan": _plan_public(plan), "took_ms": int((time.time() - t0) * 1000)}
+        out = execute_cleanup(plex, plan)
+        out.update(skipped=False, took_ms=int((time.time() - t0) * 1000))
+        return out
 
-        return jsonify({"removed": removed, "skipped": False})
+
+def cleanup_old_media():
+    try:
+        return jsonify(run_cleanup())
     except Exception as e:
         try:
             progress_log.exception("cleanup_old_media fatal: %s", e)
@@ -1349,6 +2226,23 @@ def cleanup_old_media():
             pass
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/maintenance/cleanup", methods=["GET", "POST"])
+def maintenance_cleanup():
+    """
+    Sprzątanie przeterminowanych pozycji. dry_run=1 – tylko plan (co zostałoby usunięte,
+    jakie ścieżki, którym timerom zostanie wyzerowany czas), nic nie jest zmieniane.
+    GET bez dry_run zwraca plan; wykonanie wymaga POST.
+    """
+    dry = str(request.args.get("dry_run", "")).lower() in {"1", "true", "yes", "y", "on"}
+    if request.method == "POST" and not dry:
+        return cleanup_old_media()
+    try:
+        return jsonify(run_cleanup(dry_run=True))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 def run_cleanup_loop(interval_minutes=10):
     def loop():
         while not SHUTDOWN_EVENT.is_set():
@@ -1364,6 +2258,26 @@ def run_cleanup_loop(interval_minutes=10):
 
 
 
+@app.route("/maintenance/rebuild-available", methods=["POST", "GET"])
+def rebuild_available():
+    """
+    Ręczne odświeżenie cache „Dostępne”.
+      - full=true -> pełny rebuild (naprawczy), domyślnie przyrostowy (delta po updatedAt)
+    """
+    try:
+        full = str(request.args.get("full", "false")).lower() in {"1", "true", "yes", "y", "on"}
+        t0 = time.time()
+        if full:
+            available_cache.rebuild_now()
+            changed = True
+        else:
+            changed = available_cache.rebuild_delta()
+        return jsonify({"ok": True, "full": full, "changed": changed,
+                        "took_ms": int((time.time() - t0) * 1000)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/maintenance/sweep-posters", methods=["POST", "GET"])
 def sweep_posters():
     """
@@ -1447,7 +2361,7 @@ def sweep_posters():
                     if not dry_run:
                         poster_mgr.cache.pop(k, None)
                 if not dry_run:
-                    poster_mgr._save()
+                    poster_mgr._mark_dirty()
                 removed_cache_keys.extend(broken_cache_keys)
 
         # DODATKOWO: usuń z cache wpisy dla kluczy, których rel nie jest już w 'used'
@@ -1460,7 +2374,7 @@ def sweep_posters():
                         poster_mgr.cache.pop(k, None)
                         removed_cache_keys.append(k)
             if force and not dry_run:
-                poster_mgr._save()
+                poster_mgr._mark_dirty()
 
         # raport
         try:
@@ -1527,7 +2441,7 @@ def start_poster_sweeper(every_minutes: int = 60, rebuild_before: bool = False,
                                 poster_mgr.cache.pop(k, None)
                                 changed = True
                         if changed:
-                            poster_mgr._save()
+                            poster_mgr._mark_dirty()
                     try:
                         progress_log.info("Poster sweeper tick: removed=%d, force=%s", len(removed_files), force)
                     except Exception:
@@ -1557,8 +2471,11 @@ def index():
                 else:
                     download_path = MOVIES_DIR
                 os.makedirs(download_path, exist_ok=True)
-                torrent_id = tclient.add_magnet(magnet, download_path)
-                if torrent_id:
+                res = tclient.add_magnet_ex(magnet, download_path)
+                torrent_id = res.get("id")
+                if res.get("duplicate"):
+                    print(f"ℹ️ Torrent już jest w sesji (ID: {torrent_id}) – pomijam")
+                elif torrent_id:
                     print(f"✅ Dodano torrent (ID: {torrent_id}) → {download_path}")
                 else:
                     print("⚠️ Dodano torrent, ale info_hash jeszcze nie dostępny.")
@@ -1568,26 +2485,260 @@ def index():
     return render_template("index.html")
 
 
+@app.route("/add-batch", methods=["POST"])
+def add_batch():
+    """
+    Wiele magnetów / plików .torrent w jednym wywołaniu.
+    JSON: {"magnets": [...], "source": "series"|"default"}
+    albo multipart: pole "magnets" (po jednym w linii), pliki "torrents", pole "source".
+    Zwraca wynik per pozycja: {input, id, duplicate[, error]}.
+    """
+    try:
+        items = []
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            source = data.get("source", "default")
+            magnets = data.get("magnets") or []
+        else:
+            source = request.form.get("source", "default")
+            magnets = (request.form.get("magnets") or "").splitlines()
+            for f in request.files.getlist("torrents"):
+                items.append({"torrent": f.read(), "name": f.filename or ""})
+        items = [{"magnet": m.strip()} for m in magnets if isinstance(m, str) and m.strip()] + items
+        if not items:
+            return jsonify({"error": "Brak magnetów i plików .torrent"}), 400
+
+        download_path = SERIES_DIR if source == "series" else MOVIES_DIR
+        os.makedirs(download_path, exist_ok=True)
+        results = tclient.add_many(items, download_path)
+        return jsonify({
+            "results": results,
+            "added": sum(1 for r in results if r.get("id") and not r.get("duplicate")),
+            "duplicates": sum(1 for r in results if r.get("duplicate")),
+            "errors": sum(1 for r in results if r.get("error")),
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _torrent_payload(t) -> dict:
+    """Wpis torrenta w /status i w zdarzeniach SSE "torrent"."""
+    return {
+        "name": t.name,
+        "progress": float(t.progress),
+        "state": t.state,
+        "download_payload_rate": int(t.download_payload_rate),
+        "eta": int(t.eta),
+        "download_location": t.download_location,
+        "queue_position": int(t.queue_position),
+        "pinned": bool(t.pinned),
+        "stream": t.stream,  # None albo gotowość trybu strumieniowego
+    }
+
+
+def _significant(old: dict, new: dict) -> bool:
+    """Czy zmiana wpisu przekracza progi (progress/rate/eta); pozostałe pola – każda zmiana."""
+    for k, v in new.items():
+        ov = old.get(k)
+        if k == "progress":
+            if abs(v - ov) >= STATUS_PROGRESS_STEP or (v >= 100.0) != (ov >= 100.0):
+                return True
+        elif k == "download_payload_rate":
+            if abs(v - ov) >= max(STATUS_RATE_STEP, STATUS_RATE_REL * ov) or (v == 0) != (ov == 0):
+                return True
+        elif k == "eta":
+            if abs(v - ov) >= max(STATUS_ETA_STEP, STATUS_ETA_REL * ov) or (v <= 0) != (ov <= 0):
+                return True
+        elif v != ov:
+            return True
+    return False
+
+
+class StatusDeltaTracker:
+    """
+    Wersjonowany widok /status dla klientów z ?since=<wersja>.
+    Dla każdego torrenta pamięta ostatnio „opublikowany” wpis i wersję migawki, w której
+    zmienił się ponad progi; drobne wahania (szybkość, eta) nie zmieniają wersji wpisu.
+    Usunięte id trzymamy jako nagrobki (ograniczone) – starszy since => pełna odpowiedź.
+    Wersja na zewnątrz to "<boot>:<n>" – numeracja migawek startuje od zera po każdym
+    restarcie, więc since z poprzedniego procesu (inny boot) zawsze dostaje pełny stan.
+    """
+
+    def __init__(self):
+        self.boot = f"{int(time.time() * 1000):x}"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._changed_at: Dict[str, int] = {}
+        self._removed_at: Dict[str, int] = {}
+        self._order_at = 0
+        self._floor = 0      # since poniżej tej wersji nie da się obsłużyć deltą
+        self.version = 0
+
+    def seed(self, version: int, torrents: dict):
+        with self._lock:
+            for ih, t in torrents.items():
+                self._entries[ih] = _torrent_payload(t)
+                self._changed_at[ih] = version
+            self.version = max(self.version, version)
+            self._floor = self._order_at = self.version
+
+    def on_snapshot(self, version: int, changed: dict, removed: list) -> tuple:
+        """Zwraca (istotnie zmienione {id: wpis}, usunięte [id], właśnie ukończone [id]) – te same idą do SSE."""
+        out, gone, finished = {}, [], []
+        with self._lock:
+            self.version = max(self.version, version)
+            for ih, t in changed.items():
+                new = _torrent_payload(t)
+                old = self._entries.get(ih)
+                if old is not None and not _significant(old, new):
+                    continue
+                if old is None or old["queue_position"] != new["queue_position"] or old["pinned"] != new["pinned"]:
+                    self._order_at = self.version
+                if old is not None and old["progress"] < 100.0 <= new["progress"]:
+                    finished.append(ih)
+                self._entries[ih] = new
+                self._changed_at[ih] = self.version
+                self._removed_at.pop(ih, None)
+                out[ih] = new
+            for ih in removed:
+                if self._entries.pop(ih, None) is None:
+                    continue
+                self._changed_at.pop(ih, None)
+                self._removed_at[ih] = self.version
+                self._order_at = self.version
+                gone.append(ih)
+            if len(self._removed_at) > STATUS_TOMBSTONES:
+                # najstarsze nagrobki wypadają – klienci sprzed nich dostaną pełny stan
+                for ih, v in sorted(self._removed_at.items(), key=lambda kv: kv[1])[:len(self._removed_at) - STATUS_TOMBSTONES]:
+                    self._removed_at.pop(ih, None)
+                    self._floor = max(self._floor, v)
+        return out, gone, finished
+
+    def token(self, version: Optional[int] = None) -> str:
+        return f"{self.boot}:{self.version if version is None else version}"
+
+    def delta(self, since: str) -> Optional[dict]:
+        """None => since nieobsługiwalny (inny boot / za stary / z przyszłości) – daj pełny stan."""
+        boot, _, n = str(since).partition(":")
+        if boot != self.boot:
+            return None
+        try:
+            since = int(n)
+        except ValueError:
+            return None
+        with self._lock:
+            if since < self._floor or since > self.version:
+                return None
+            return {
+                "version": self.token(),
+                "full": False,
+                "torrents": {ih: dict(self._entries[ih]) for ih, v in self._changed_at.items() if v > since},
+                "removed": [ih for ih, v in self._removed_at.items() if v > since],
+                "order_changed": self._order_at > since,
+            }
+
+
+status_tracker = StatusDeltaTracker()
+status_tracker.seed(*tclient.status_snapshot())
+
+
+def _publish_torrent_changes(version: int, changed: dict, removed: list):
+    """Listener migawki TorrentClient (wątek alertów) – progi + szyna SSE, bez I/O."""
+    out, gone, finished = status_tracker.on_snapshot(version, changed, removed)
+    for ih, entry in out.items():
+        event_bus.publish("torrents", ih, {"id": ih, "version": status_tracker.token(version), **entry}, event="torrent")
+    for ih in finished:
+        event_bus.publish("torrents", None, {"id": ih, "name": out[ih]["name"]}, event="torrent_finished")
+    for ih in gone:
+        event_bus.publish("torrents", ih, {"id": ih, "version": status_tracker.token(version)}, event="torrent_removed")
+
+
+def _publish_delete_timer(item_id: str, delete_at: Optional[int]):
+    event_bus.publish("delete_timer", str(item_id), {"id": str(item_id), "delete_at": delete_at})
+
+
 @app.route("/status")
 def status():
+    """
+    Bez parametrów: {id: wpis} w kolejności kolejki, wersja w nagłówku X-Status-Version.
+    ?since=<wersja>: {"version", "full": false, "torrents": {zmienione ponad progi},
+    "removed": [id], "order": [id] gdy zmieniła się kolejność}; wersja "<boot>:<n>" –
+    za stara albo z poprzedniego uruchomienia => "full": true i wszystkie torrenty.
+    """
     try:
-        torrents = tclient.get_torrents()
-        payload = {
-            tid: {
-                "name": t.name,
-                "progress": float(t.progress),
-                "state": t.state,
-                "download_payload_rate": int(t.download_payload_rate),
-                "eta": int(t.eta),
-                "download_location": t.download_location,
-            }
-            for tid, t in torrents.items()
-        }
-        return jsonify(payload)
+        since = request.args.get("since")
+        if since is not None:
+            out = status_tracker.delta(since)
+            if out is None:
+                queued = tclient.get_torrents_queued()
+                out = {"version": status_tracker.token(), "full": True,
+                       "torrents": {t.id: _torrent_payload(t) for t in queued},
+                       "removed": [], "order": [t.id for t in queued]}
+            elif out.pop("order_changed"):
+                out["order"] = [t.id for t in tclient.get_torrents_queued()]
+            return _encoded_response(_json_bytes(out))
+
+        # kolejność kluczy = kolejność kolejki (przypięte, potem queue_position); bez sortowania kluczy
+        version = status_tracker.token()
+        payload = {t.id: _torrent_payload(t) for t in tclient.get_torrents_queued()}
+        resp = _encoded_response(_json_bytes(payload))
+        resp.headers["X-Status-Version"] = version
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/events")
+def events_stream():
+    """
+    Server-Sent Events: ?topics=torrents,available,delete_timer,cast (domyślnie bez cast),
+    &client_id= zawęża "cast" do jednego odtwarzacza. Zdarzenia: torrent, torrent_removed,
+    torrent_finished, available, delete_timer, cast; "resync" = zaległości przepadły,
+    pobierz pełny stan. Na start "hello" z wersją migawki i generacją cache.
+    """
+    raw = request.args.get("topics") or "torrents,available,delete_timer"
+    topics = {t.strip() for t in raw.split(",") if t.strip() in EVENT_TOPICS}
+    if not topics:
+        return jsonify({"error": f"topics: {', '.join(EVENT_TOPICS)}"}), 400
+    client_id = request.args.get("client_id", "").strip()
+    sub = event_bus.subscribe(topics, accept=lambda topic, key: topic != "cast" or not client_id or key == client_id)
+    if sub is None:
+        return jsonify({"error": "too_many_subscribers"}), 503
+    if "cast" in topics:
+        _ensure_cast_watcher()
+
+    hello = {
+        "topics": sorted(topics),
+        "status_version": status_tracker.token(),
+        "available_generation": available_cache._generation,
+    }
+
+    def _gen():
+        try:
+            yield sse_message("hello", hello)
+            while not SHUTDOWN_EVENT.is_set() and not sub.closed:
+                events, resync = sub.drain(HEARTBEAT_SECONDS)
+                if resync:
+                    yield sse_message("resync", {})
+                for ev in events:
+                    yield sse_message(ev["event"], ev["data"])
+                if not events and not resync:
+                    yield sse_comment("ping")
+        finally:
+            # klient się rozłączył (błąd zapisu) albo zamykamy aplikację
+            event_bus.unsubscribe(sub)
+
+    return Response(_gen(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # bez buforowania w reverse proxy
+    })
+
+
+@app.route("/debug/events")
+def debug_events():
+    return jsonify(event_bus.stats())
+
+
 @app.route("/toggle/<torrent_id>", methods=["POST"])
 def toggle_torrent(torrent_id):
     try:
@@ -1606,6 +2757,52 @@ def toggle_torrent(torrent_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/queue", methods=["GET", "POST"])
+def queue_settings():
+    """GET – limity aktywnych, przypięte i kolejność; POST {"active_downloads": n, "active_limit": n, ...}."""
+    try:
+        if request.method == "POST":
+            return jsonify(tclient.set_queue_limits(request.get_json(force=True) or {}))
+        return jsonify(tclient.queue_status())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/queue/<torrent_id>/<action>", methods=["POST"])
+def queue_action(torrent_id, action):
+    """action: top / up / down / bottom / pin / unpin."""
+    try:
+        if action in ("pin", "unpin"):
+            ok = tclient.pin(torrent_id, action == "pin")
+        elif action in ("top", "up", "down", "bottom"):
+            ok = tclient.queue_move(torrent_id, action)
+        else:
+            return jsonify({"error": f"Nieznana akcja: {action}"}), 400
+        if not ok:
+            return jsonify({"error": "Torrent not found"}), 404
+        return jsonify({"status": "ok", **tclient.queue_status()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/stream/<torrent_id>", methods=["GET", "POST"])
+def stream_mode(torrent_id):
+    """
+    POST {"enabled": true|false} – tryb strumieniowy (sekwencyjnie + priorytet początku/końca pliku).
+    GET – gotowość: ready_bytes (ciągłe od początku pliku), tail_ready, playable.
+    """
+    try:
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            if not tclient.set_stream_mode(torrent_id, bool(data.get("enabled", True))):
+                return jsonify({"error": "Torrent not found"}), 404
+        return jsonify({"id": torrent_id, "stream": tclient.stream_status(torrent_id)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/remove/<torrent_id>", methods=["POST"])
 def remove_torrent(torrent_id):
     remove_data = request.args.get("data") == "true"
@@ -1625,6 +2822,76 @@ def debug_torrents():
     return jsonify(response)
 
 
+@app.route("/bandwidth", methods=["GET", "POST"])
+def bandwidth():
+    """
+    GET  – konfiguracja, limity obowiązujące teraz (z harmonogramem) i ustawione na torrentach.
+    POST – częściowa zmiana: {"global": {...}, "categories": {...}, "torrents": {...}, "schedule": [...]}
+           (KiB/s, 0 = bez limitu; "torrents": {id: null} usuwa limit).
+    """
+    try:
+        if request.method == "POST":
+            tclient.update_bandwidth(request.get_json(force=True) or {})
+        return jsonify(tclient.bandwidth_status())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/bandwidth/torrent/<torrent_id>", methods=["POST"])
+def bandwidth_torrent(torrent_id):
+    """{"download": KiB/s, "upload": KiB/s} dla jednego torrenta (0/brak = bez limitu)."""
+    try:
+        if tclient.get_torrent(torrent_id) is None:
+            return jsonify({"error": "Torrent not found"}), 404
+        data = request.get_json(force=True) or {}
+        tclient.set_torrent_limit(torrent_id, data.get("download"), data.get("upload"))
+        return jsonify(tclient.bandwidth_status()["effective"]["torrents"].get(torrent_id) or {"download": 0, "upload": 0})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/torrent-settings", methods=["GET", "POST"])
+def torrent_settings():
+    """
+    GET  – profil wydajności, nadpisania i wartości faktycznie obowiązujące w sesji.
+    POST – {"profile": "low-memory-nas" | "balanced" | "high-throughput"} i/lub
+           {"settings": {nazwa: wartość | null}} (nadpisania na profilu, walidowane).
+           Zmiana jest stosowana od razu i zapisywana w konfiguracji.
+    """
+    try:
+        if request.method == "POST":
+            data = request.get_json(force=True) or {}
+            if data.get("profile"):
+                # nowy profil startuje bez starych nadpisań
+                settings = {k: v for k, v in (data.get("settings") or {}).items() if v is not None}
+                status = tclient.apply_profile(data["profile"], settings)
+            else:
+                status = tclient.update_settings(data.get("settings") or {})
+            CONFIG["torrent"] = {"profile": status["profile"], "settings": status["overrides"]}
+            save_config(CONFIG)
+            return jsonify(status)
+        return jsonify(tclient.performance_status())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/debug/resume")
+def debug_resume():
+    return jsonify(tclient.resume_stats())
+
+
+@app.route("/status/restore")
+def status_restore():
+    """Postęp przywracania torrentów z resume po starcie."""
+    return jsonify(tclient.restore_status())
+
+
 @app.route("/set-global-limit", methods=["POST"])
 def set_global_limit():
     try:
@@ -1651,12 +2918,59 @@ def set_global_limit():
 
 
 
+def _history_time(v: Optional[str], end_of_day: bool = False) -> Optional[int]:
+    """Unix ts (s) albo data YYYY-MM-DD (until = koniec dnia)."""
+    if not v:
+        return None
+    try:
+        return int(v)
+    except ValueError:
+        pass
+    try:
+        ts = int(datetime.strptime(v, "%Y-%m-%d").timestamp())
+    except ValueError:
+        raise ValueError(f"Nieprawidłowa data: {v!r} (unix ts albo YYYY-MM-DD)")
+    return ts + 86399 if end_of_day else ts
+
+
 @app.route("/history", methods=["GET"])
 def history():
+    """
+    ?event=finished|error|tracker_error &since= &until= (ts albo YYYY-MM-DD) &q= (nazwa)
+    &limit= (max 500) &cursor= (z next_cursor). Od najnowszych; bez limit – całość jak dawniej.
+    """
     try:
-        items = history_store.get()
-        items = sorted(items, key=lambda x: x.get("ts", 0), reverse=True)
-        return jsonify({"history": items})
+        a = request.args
+        limit = a.get("limit")
+        limit = max(1, min(500, int(limit))) if limit else None
+        out = history_store.query(
+            event=a.get("event") or None,
+            since=_history_time(a.get("since")),
+            until=_history_time(a.get("until"), end_of_day=True),
+            q=a.get("q") or None,
+            limit=limit,
+            cursor=a.get("cursor") or None,
+        )
+        return _encoded_response(_json_bytes({"history": out["items"], "next_cursor": out["next_cursor"]}))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/history/stats", methods=["GET"])
+def history_stats():
+    """Agregaty liczone przyrostowo: bajty per dzień (?days=N – ostatnie N dni kalendarzowych), średni czas ukończenia, błędy."""
+    try:
+        days = request.args.get("days")
+        if days:
+            try:
+                days = int(days)
+            except ValueError:
+                return jsonify({"error": "days: oczekiwano liczby"}), 400
+            if days < 1:
+                return jsonify({"error": "days: oczekiwano liczby >= 1"}), 400
+        return jsonify(history_store.aggregates(days or None))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1664,10 +2978,58 @@ def history():
 # ─────────────────────────────────────────────────────────────────────────────
 # Plex + cache „Dostępne”
 # ─────────────────────────────────────────────────────────────────────────────
+def _etag_matches(etag: str) -> bool:
+    """Słabe porównanie (RFC 7232) – W/ nie ma znaczenia przy If-None-Match."""
+    inm = request.headers.get("If-None-Match", "")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    bare = lambda t: t.strip()[2:] if t.strip().startswith("W/") else t.strip()
+    return bare(etag) in {bare(t) for t in inm.split(",")}
+
+
+def _library_response(kind: str):
+    """Gotowe bajty z AvailableCache + ETag; 304 gdy klient ma aktualną wersję."""
+    body, etag = available_cache.serialized(kind)
+    if _etag_matches(etag):
+        return Response(status=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    return _encoded_response(body, etag, lambda enc: available_cache.serialized_variant(kind, enc))
+
+
+_PAGED_ARGS = ("fields", "limit", "cursor", "include")
+
+
+def _paged_library_response(kind: str):
+    """
+    ?fields=id,title,...  – projekcja pól
+    ?limit=N&cursor=<id>  – stronicowanie (cursor = next_cursor z poprzedniej strony)
+    ?include=episodes     – seriale z pełną listą odcinków (domyślnie bez)
+    """
+    args = request.args
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()] or None
+    lim = args.get("limit")
+    limit = int(lim) if (lim and lim.isdigit()) else None
+    include = {x.strip().lower() for x in (args.get("include") or "").split(",")}
+    try:
+        result = available_cache.page(kind, fields=fields, limit=limit, cursor=args.get("cursor") or None,
+                                      include_episodes="episodes" in include)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body = _json_bytes(result)
+    etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()
+    if _etag_matches(etag):
+        return Response(status=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    return _encoded_response(body, etag)
+
+
 @app.route("/plex/films")
 def plex_films():
     try:
-        return jsonify(available_cache.get_films())
+        if any(k in request.args for k in _PAGED_ARGS):
+            return _paged_library_response("films")
+        return _library_response("films")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1675,7 +3037,21 @@ def plex_films():
 @app.route("/plex/series")
 def plex_series():
     try:
-        return jsonify(available_cache.get_series())
+        if any(k in request.args for k in _PAGED_ARGS):
+            return _paged_library_response("series")
+        return _library_response("series")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/plex/series/<series_id>/episodes")
+def plex_series_episodes(series_id):
+    """Odcinki jednego serialu – do leniwego rozwijania listy w kliencie."""
+    try:
+        show = available_cache.find("series", series_id)
+        if show is None:
+            return jsonify({"error": "Nie znaleziono serialu"}), 404
+        return _encoded_response(_json_bytes({"id": str(series_id), "episodes": show.get("episodes") or []}))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1683,12 +3059,11 @@ def plex_series():
 # Wyszukiwanie lokalne w Plex (szybkie, legalne)
 @app.route("/search-local", methods=["GET"])
 def search_local():
-    q = (request.args.get("q") or "").strip().lower()
+    q = (request.args.get("q") or "").strip()
     if not q:
         return jsonify({"films": [], "series": []})
-    films = [i for i in available_cache.get_films() if q in i["title"].lower()]
-    series = [i for i in available_cache.get_series() if q in i["title"].lower()]
-    return jsonify({"films": films, "series": series})
+    lim = request.args.get("limit") or ""
+    return _encoded_response(_json_bytes(available_cache.search(q, limit=int(lim) if lim.isdigit() else 0)))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # PLEX CAST – RESUME + STABLE PROGRESS TIMING
@@ -2122,39 +3497,8 @@ def plex_cast_status():
     if plex is None:
         return jsonify({"sessions": [], "error": "plex_unavailable"}), 503
 
-    sessions_out = []
-    server_now_ms = int(time.time() * 1000)
-
     try:
-        for s in (plex.sessions() or []):
-            players = getattr(s, "players", []) or []
-            for p in players:
-                pid = getattr(p, "machineIdentifier", "") or getattr(p, "clientIdentifier", "")
-                if client_id and pid != client_id:
-                    continue
-                title = getattr(s, "title", "") or getattr(s, "grandparentTitle", "")
-                thumb = ""
-                try:
-                    if getattr(s, "thumb", None):
-                        thumb = plex.url(s.thumb)
-                    elif getattr(s, "grandparentThumb", None):
-                        thumb = plex.url(s.grandparentThumb)
-                except Exception:
-                    pass
-                sessions_out.append({
-                    "client_id": pid,
-                    "client_name": getattr(p, "title", "") or getattr(p, "product", "") or "",
-                    "item_id": str(getattr(s, "ratingKey", "")),
-                    "title": title,
-                    "thumb": thumb,
-                    "duration_ms": _to_int(getattr(s, "duration", 0)),
-                    "view_offset_ms": _to_int(getattr(s, "viewOffset", 0)),
-                    "state": (getattr(p, "state", "") or "").lower() or "unknown",
-                    "type": getattr(s, "TYPE", ""),
-                    # 🆕 znaczniki czasu do stabilnej prognozy po stronie frontu
-                    "server_now_ms": server_now_ms,
-                    "position_at_ms": server_now_ms,  # w tym modelu offset = „teraz” na serwerze
-                })
+        sessions_out = _cast_sessions(plex, client_id)
     except Exception as e:
         try:
             progress_log.warning("plex_cast_status error: %s", e)
@@ -2164,6 +3508,89 @@ def plex_cast_status():
 
     return jsonify({"sessions": sessions_out})
 
+
+def _cast_sessions(plex, client_id: str = "") -> List[dict]:
+    """Bieżące sesje odtwarzania (po jednej na odtwarzacz); client_id zawęża do jednego."""
+    sessions_out = []
+    server_now_ms = int(time.time() * 1000)
+    for s in (plex.sessions() or []):
+        players = getattr(s, "players", []) or []
+        for p in players:
+            pid = getattr(p, "machineIdentifier", "") or getattr(p, "clientIdentifier", "")
+            if client_id and pid != client_id:
+                continue
+            title = getattr(s, "title", "") or getattr(s, "grandparentTitle", "")
+            thumb = ""
+            try:
+                if getattr(s, "thumb", None):
+                    thumb = plex.url(s.thumb)
+                elif getattr(s, "grandparentThumb", None):
+                    thumb = plex.url(s.grandparentThumb)
+            except Exception:
+                pass
+            sessions_out.append({
+                "client_id": pid,
+                "client_name": getattr(p, "title", "") or getattr(p, "product", "") or "",
+                "item_id": str(getattr(s, "ratingKey", "")),
+                "title": title,
+                "thumb": thumb,
+                "duration_ms": _to_int(getattr(s, "duration", 0)),
+                "view_offset_ms": _to_int(getattr(s, "viewOffset", 0)),
+                "state": (getattr(p, "state", "") or "").lower() or "unknown",
+                "type": getattr(s, "TYPE", ""),
+                # 🆕 znaczniki czasu do stabilnej prognozy po stronie frontu
+                "server_now_ms": server_now_ms,
+                "position_at_ms": server_now_ms,  # w tym modelu offset = „teraz” na serwerze
+            })
+    return sessions_out
+
+
+_cast_watch_lock = threading.Lock()
+_cast_watch_running = False
+
+
+def _ensure_cast_watcher():
+    """Wątek publikujący sesje cast – żyje tylko, dopóki ktoś subskrybuje temat "cast"."""
+    global _cast_watch_running
+    with _cast_watch_lock:
+        if _cast_watch_running:
+            return
+        _cast_watch_running = True
+    threading.Thread(target=_cast_watch_loop, daemon=True, name="cast-events").start()
+
+
+def _cast_watch_loop():
+    global _cast_watch_running
+    last: Dict[str, dict] = {}
+    try:
+        while not SHUTDOWN_EVENT.is_set():
+            with _cast_watch_lock:
+                if not event_bus.has_subscribers("cast"):
+                    _cast_watch_running = False
+                    return
+            plex = get_plex_or_none()
+            if plex is not None:
+                try:
+                    now = {s["client_id"]: s for s in _cast_sessions(plex)}
+                    for cid, sess in now.items():
+                        # server_now_ms zmienia się zawsze – porównujemy bez niego
+                        cmp = {k: v for k, v in sess.items() if k not in ("server_now_ms", "position_at_ms")}
+                        if last.get(cid) != cmp:
+                            last[cid] = cmp
+                            event_bus.publish("cast", cid, {"client_id": cid, "sessions": [sess]})
+                    for cid in [c for c in last if c not in now]:
+                        last.pop(cid, None)
+                        event_bus.publish("cast", cid, {"client_id": cid, "sessions": []})
+                except Exception as e:
+                    try:
+                        progress_log.warning("cast-events error: %s", e)
+                    except Exception:
+                        pass
+            SHUTDOWN_EVENT.wait(CAST_EVENTS_EVERY)
+    finally:
+        with _cast_watch_lock:
+            _cast_watch_running = False
+
 # ── twarde fallbacki na /player/playback/* dla krnąbrnych klientów
 def _playback_send(client, path):
     """
@@ -2244,7 +3671,7 @@ def plex_cast_cmd():
         return jsonify({"error": str(e)}), 500
 
 # ─────────────────────────────────────────────────────────────────────────────
-# TMDb: rozpoznawanie gatunków po tytule + zapis do progress_cache
+# TMDb: rozpoznawanie gatunków po tytule + zapis do magazynu postępów
 # ─────────────────────────────────────────────────────────────────────────────
 def detect_and_cache_genres_by_title(
     title: str,
@@ -2255,9 +3682,9 @@ def detect_and_cache_genres_by_title(
 ) -> list[str]:
     """
     Zwraca listę nazw gatunków dla podanego tytułu (film/serial) z TMDb.
-    - Wynik jest keszowany w progress_cache.json pod kluczem:
-        _genres_by_title[type_][normalized_title] = { genres, tmdb_id, ts }
-    - Jeżeli w progress_cache istnieją wpisy z tym tytułem, dopisze im pole "genres".
+    - Wynik jest keszowany w magazynie postępów (tabela meta) pod kluczem:
+        genres:<type_>:<normalized_title> = { genres, tmdb_id, ts }
+    - Jeżeli w magazynie istnieją wpisy z tym tytułem, dopisze im pole "genres".
     - Użyj type_ = "movie" lub "tv".
 
     Parametry:
@@ -2282,12 +3709,8 @@ def detect_and_cache_genres_by_title(
     now_ms = int(time.time() * 1000)
     ttl_ms = max(1, int(cache_ttl_days)) * 24 * 3600 * 1000
 
-    # 1) Sprawdź cache w progress_cache.json
-    with PROGRESS_LOCK:
-        store = _progress_load()
-        gcache = store.get("_genres_by_title") or {}
-        gcache_type = gcache.get(type_) or {}
-        cached = gcache_type.get(norm_title)
+    # 1) Sprawdź cache gatunków (jeden wiersz meta na tytuł)
+    cached = progress_store.get_meta(genres_meta_key(type_, norm_title))
 
     if cached and not force_refresh:
         try:
@@ -2363,21 +3786,16 @@ def detect_and_cache_genres_by_title(
     # 3) Zapisz/odśwież cache oraz dopnij "genres" do wpisów z tym tytułem
     try:
         with PROGRESS_LOCK:
-            store = _progress_load()
-            gcache = store.get("_genres_by_title") or {}
-            gcache_type = gcache.get(type_) or {}
-
-            gcache_type[norm_title] = {
+            progress_store.set_meta(genres_meta_key(type_, norm_title), {
                 "genres": list(genres),
                 "tmdb_id": tmdb_id,
                 "ts": now_ms,
                 "title": title,
-            }
-            gcache[type_] = gcache_type
-            store["_genres_by_title"] = gcache
+            })
 
-            # dopnij "genres" do wpisów o tym samym tytule (case-insensitive)
-            updated_any = False
+            # dopnij "genres" do wpisów o tym samym tytule (indeks po znormalizowanym tytule)
+            store = progress_store.by_title(norm_title)
+            updated = {}
             for k, v in list(store.items()):
                 if not isinstance(v, dict):
                     continue
@@ -2396,10 +3814,9 @@ def detect_and_cache_genres_by_title(
                     if same_type:
                         if genres:
                             v["genres"] = list(genres)
-                            store[k] = v
-                            updated_any = True
+                            updated[k] = v
 
-            _progress_save(store)
+            progress_store.put_many(updated)
 
         try:
             progress_log.info(
@@ -2436,14 +3853,14 @@ def _infer_tmdb_type_from_entry(entry: dict) -> str:
 def _collect_titles_for_backfill(include_available: bool = True) -> list[tuple[str, str]]:
     """
     Zwraca listę (title, tmdb_type) do uzupełnienia.
-    Zbiera z progress_cache.json + (opcjonalnie) AvailableCache.
+    Zbiera z magazynu postępów + (opcjonalnie) AvailableCache.
     """
     seen = set()
     pairs: list[tuple[str, str]] = []
 
-    # 1) progress_cache.json
+    # 1) magazyn postępów
     with PROGRESS_LOCK:
-        store = _progress_load()
+        store = progress_store.all()
         for k, v in store.items():
             if not isinstance(v, dict):
                 continue
@@ -2479,7 +3896,7 @@ def _collect_titles_for_backfill(include_available: bool = True) -> list[tuple[s
 
 def backfill_all_genres(force_refresh: bool = False, include_available: bool = True, limit: int | None = None) -> dict:
     """
-    Uzupełnia gatunki dla wielu tytułów, zapisując do progress_cache.json.
+    Uzupełnia gatunki dla wielu tytułów, zapisując do magazynu postępów.
     Korzysta z detect_and_cache_genres_by_title(...).
     Zwraca podsumowanie.
     """
@@ -2538,19 +3955,16 @@ def genres_for_id(item_id):
     GET /genres/for-id/522
     """
     # 1) znajdź wpis po ID
-    with PROGRESS_LOCK:
-        store = _progress_load()
-        entry = store.get(str(item_id))
+    entry = progress_store.get(str(item_id))
     if not isinstance(entry, dict):
-        return jsonify({"ok": False, "error": "ID not found in progress_cache"}), 404
+        return jsonify({"ok": False, "error": "ID not found in progress store"}), 404
 
     title = entry.get("title") or ""
     tmdb_type = _infer_tmdb_type_from_entry(entry)
     # 2) pobierz + zapisz gatunki
     genres = detect_and_cache_genres_by_title(title, type_=tmdb_type)
     # 3) pokaż wynik + aktualny snapshot wpisu
-    with PROGRESS_LOCK:
-        snapshot = _progress_load().get(str(item_id))
+    snapshot = progress_store.get(str(item_id))
     return jsonify({
         "ok": True,
         "id": item_id,
@@ -2573,19 +3987,14 @@ def reset_delete_timer():
         if not item_id:
             return jsonify({"error": "Brak ID"}), 400
 
+        new_time = int(time.time() * 1000) + 7 * 86400000  # +7 dni
         with PROGRESS_LOCK:
-            store = _progress_load()
-            entry = store.get(item_id)
-            if not entry:
-                return jsonify({"error": "Nie znaleziono ID"}), 404
-
-            old_time = entry.get("delete_at")
-            new_time = int(time.time() * 1000) + 7 * 86400000  # +7 dni
-            entry["delete_at"] = new_time
-            store[item_id] = entry
-
-            # NATYCHMIASTOWY, ATOMOWY ZAPIS DO PLIKU
-            _progress_save(store)
+            # jeden UPDATE jednego wiersza (transakcja SQLite)
+            entry = progress_store.set_delete_at(item_id, new_time)
+        if not entry:
+            return jsonify({"error": "Nie znaleziono ID"}), 404
+        old_time = entry.get("delete_at")
+        _publish_delete_timer(item_id, new_time)
 
         # log (jeśli dodałeś logger z poprzedniej wiadomości)
         try:
@@ -2686,19 +4095,12 @@ def delete_plex_item():
                 except Exception:
                     progress_log.warning("Plex remove failed for id=%s (%s): %s", item_id, media_type, e)
 
-        # 3) progress_cache.json
+        # 3) magazyn postępów (serial razem z odcinkami)
         with PROGRESS_LOCK:
-            store = _progress_load()
-            if item_id in store:
-                store.pop(item_id, None)
-            if media_type == "series":
-                to_del = [k for k, v in store.items() if isinstance(v, dict) and v.get("parent_id") == item_id]
-                for k in to_del:
-                    store.pop(k, None)
-            _progress_save(store)
+            progress_store.delete(item_id, with_children=(media_type == "series"))
 
         # 4) Odśwież dostępne
-        threading.Thread(target=lambda: available_cache.rebuild_now(), daemon=True).start()
+        threading.Thread(target=lambda: available_cache.rebuild_delta(), daemon=True).start()
 
         # 4.5) USUŃ plakat TERAZ (to było po return – przeniesione!)
         try:
@@ -2744,12 +4146,10 @@ def _take_force_from_request(req) -> bool:
 
 def _fetch_entry_from_anywhere(item_id: str) -> dict | None:
     """
-    Najpierw progress_cache.json, potem z AvailableCache (films/series/episodes).
+    Najpierw magazyn postępów, potem z AvailableCache (films/series/episodes).
     Zwraca ujednolicony dict: {id, title, type, path?, paths?}
     """
-    with PROGRESS_LOCK:
-        store = _progress_load()
-        e = store.get(item_id)
+    e = progress_store.get(item_id)
     if isinstance(e, dict):
         return e
 
@@ -3213,7 +4613,7 @@ def graceful_shutdown(reason: str = "unknown", hard: bool = True):
 
     # 2) Ostatnia synchronizacja i zapisy JSON
     try:
-        sync_progress_cache_from_available()          # -> progress_cache.json
+        sync_progress_cache_from_available()          # -> progress.sqlite3
     except Exception as e:
         try: progress_log.warning("final sync_progress failed: %s", e)
         except: pass
@@ -3224,10 +4624,9 @@ def graceful_shutdown(reason: str = "unknown", hard: bool = True):
         try: progress_log.warning("apply_overrides failed: %s", e)
         except: pass
 
-    # (opcjonalnie) dobij zapisu poster_cache.json — zwykle zbędne, ale nie szkodzi
+    # dobij zaległe (odroczone) zapisy poster_cache.json
     try:
-        with poster_mgr._lock:
-            poster_mgr._save()
+        poster_mgr.flush()
     except Exception:
         pass
 
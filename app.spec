@@ -5,7 +5,7 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('templates', 'templates'), ('static', 'static'), ('poster_cache.json', '.'), ('progress_cache.json', '.')],
+    datas=[('templates', 'templates'), ('static', 'static'), ('poster_cache.json', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,193 @@
+# bandwidth.py
+"""
+Harmonogram przepustowości dla klienta torrentów (bez zależności od libtorrent).
+
+Konfiguracja (KiB/s, 0 = bez limitu), trzymana w bandwidth.json:
+{
+  "global":     {"download": 0, "upload": 0},
+  "categories": {"movies": {"download": 0, "upload": 0}, "series": {...}},
+  "torrents":   {"<info-hash>": {"download": 0, "upload": 0}},
+  "schedule": [
+    {"name": "wieczór", "from": "18:00", "to": "23:30", "days": [0,1,2,3,4],
+     "global": {"download": 2048}, "categories": {"series": {"download": 1024}}}
+  ]
+}
+
+Reguła harmonogramu nadpisuje tylko podane pola; pierwsza pasująca wygrywa.
+Przedział z "to" < "from" przechodzi przez północ. "days": 0 = poniedziałek.
+"""
+import os, json, threading
+from datetime import datetime
+from typing import Dict, Optional
+
+CATEGORIES = ("movies", "series")
+_DIRECTIONS = ("download", "upload")
+
+
+def _empty_limits() -> dict:
+    return {"download": 0, "upload": 0}
+
+
+def _kib(v) -> int:
+    try:
+        v = int(v or 0)
+    except Exception:
+        raise ValueError(f"Nieprawidłowy limit: {v!r}")
+    return max(0, v)
+
+
+def _clean_limits(d, partial: bool = False) -> dict:
+    if not isinstance(d, dict):
+        raise ValueError("Limit musi być obiektem {download, upload}")
+    out = {} if partial else _empty_limits()
+    for k in _DIRECTIONS:
+        if k in d:
+            out[k] = _kib(d[k])
+    return out
+
+
+def _hhmm(s: str, end: bool = False) -> int:
+    """Minuty od północy; "24:00" tylko jako koniec przedziału (end=True)."""
+    try:
+        h, m = str(s).split(":")
+        h, m = int(h), int(m)
+        if not (0 <= h <= 23 and 0 <= m < 60) and not (end and h == 24 and m == 0):
+            raise ValueError
+        return h * 60 + m
+    except Exception:
+        raise ValueError(f"Nieprawidłowa godzina: {s!r} (HH:MM)")
+
+
+def _clean_rule(r: dict) -> dict:
+    if not isinstance(r, dict):
+        raise ValueError("Reguła harmonogramu musi być obiektem")
+    _hhmm(r.get("from")), _hhmm(r.get("to"), end=True)
+    rule = {"name": str(r.get("name") or ""), "from": r["from"], "to": r["to"]}
+    if r.get("days") is not None:
+        days = [int(d) for d in r["days"]]
+        if any(d < 0 or d > 6 for d in days):
+            raise ValueError("days: 0 (pon) … 6 (nd)")
+        rule["days"] = days
+    if "global" in r:
+        rule["global"] = _clean_limits(r["global"], partial=True)
+    if "categories" in r:
+        rule["categories"] = {c: _clean_limits(v, partial=True) for c, v in (r["categories"] or {}).items()
+                              if c in CATEGORIES}
+    return rule
+
+
+def rule_matches(rule: dict, now: datetime) -> bool:
+    days = rule.get("days")
+    start, end = _hhmm(rule["from"]), _hhmm(rule["to"], end=True)
+    minute = now.hour * 60 + now.minute
+    if start <= end:
+        return (days is None or now.weekday() in days) and start <= minute < end
+    # przez północ – część „po północy” należy do dnia, w którym reguła się zaczęła
+    if minute >= start:
+        return days is None or now.weekday() in days
+    if minute < end:
+        return days is None or (now.weekday() - 1) % 7 in days
+    return False
+
+
+class BandwidthConfig:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {
+            "global": _empty_limits(),
+            "categories": {c: _empty_limits() for c in CATEGORIES},
+            "torrents": {},
+            "schedule": [],
+        }
+        try:
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self.update(json.load(f), save=False)
+        except Exception:
+            pass
+
+    def _save(self):
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.data))
+
+    def update(self, patch: dict, save: bool = True):
+        """Walidacja + scalenie (global/categories/torrents/schedule). Błąd => ValueError, nic nie zmienia."""
+        if not isinstance(patch, dict):
+            raise ValueError("Oczekiwano obiektu JSON")
+        with self._lock:
+            new = json.loads(json.dumps(self.data))
+            if "global" in patch:
+                new["global"].update(_clean_limits(patch["global"], partial=True))
+            for c, v in (patch.get("categories") or {}).items():
+                if c not in CATEGORIES:
+                    raise ValueError(f"Nieznana kategoria: {c}")
+                new["categories"][c].update(_clean_limits(v, partial=True))
+            for ih, v in (patch.get("torrents") or {}).items():
+                if v is None:
+                    new["torrents"].pop(str(ih), None)
+                else:
+                    new["torrents"][str(ih)] = _clean_limits(v)
+            if "schedule" in patch:
+                new["schedule"] = [_clean_rule(r) for r in (patch["schedule"] or [])]
+            self.data = new
+            if save:
+                self._save()
+
+    def set_torrent(self, ih: str, download: Optional[int], upload: Optional[int]):
+        lim = {"download": _kib(download), "upload": _kib(upload)}
+        self.update({"torrents": {ih: None if not any(lim.values()) else lim}})
+
+    def forget_torrent(self, ih: str):
+        with self._lock:
+            if self.data["torrents"].pop(str(ih), None) is not None:
+                self._save()
+
+    def effective(self, now: Optional[datetime] = None) -> dict:
+        """Limity w tej chwili: baza + pierwsza pasująca reguła harmonogramu."""
+        now = now or datetime.now()
+        with self._lock:
+            d = json.loads(json.dumps(self.data))
+        active = None
+        for rule in d["schedule"]:
+            try:
+                if rule_matches(rule, now):
+                    active = rule
+                    break
+            except Exception:
+                continue
+        if active:
+            d["global"].update(active.get("global") or {})
+            for c, v in (active.get("categories") or {}).items():
+                d["categories"].setdefault(c, _empty_limits()).update(v)
+        return {
+            "profile": (active.get("name") or f'{active["from"]}-{active["to"]}') if active else None,
+            "global": d["global"],
+            "categories": d["categories"],
+            "torrents": d["torrents"],
+        }
+
+
+def split_category_limit(limit_kib: int, n_active: int) -> int:
+    """Limit kategorii dzielony po równo między jej aktywne torrenty (KiB/s, 0 = bez limitu)."""
+    if limit_kib <= 0 or n_active <= 0:
+        return 0
+    return max(1, limit_kib // n_active)
+
+
+def combine(a: int, b: int) -> int:
+    """Ostrzejszy z dwóch limitów (0 = bez limitu)."""
+    if a <= 0:
+        return b
+    if b <= 0:
+        return a
+    return min(a, b)
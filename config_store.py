@@ -25,6 +25,10 @@ DEFAULTS = {
     "plex": {
         "base_url": "",  # np. http://192.168.1.224:32400
         "token": ""      # pobrany z OAuth PIN
+    },
+    "torrent": {
+        "profile": "balanced",  # profil wydajności libtorrent (patrz torrent_client.PERFORMANCE_PROFILES)
+        "settings": {}          # ręczne nadpisania ustawień sesji na profilu
     }
 }
 
@@ -37,12 +41,17 @@ def load_config() -> dict:
             out = DEFAULTS.copy()
             out["paths"] = {**DEFAULTS["paths"], **(data.get("paths") or {})}
             out["plex"]  = {**DEFAULTS["plex"],  **(data.get("plex")  or {})}
+            out["torrent"] = {**DEFAULTS["torrent"], **(data.get("torrent") or {})}
             return out
     except Exception:
         pass
     return DEFAULTS.copy()
 
 def save_config(cfg: dict):
+    # onboarding zapisuje tylko ścieżki i Plexa – sekcji torrent wtedy nie gubimy
+    torrent = cfg.get("torrent")
+    if torrent is None:
+        torrent = load_config().get("torrent") or {}
     data = {
         "paths": {
             "movies": (cfg.get("paths") or {}).get("movies", ""),
@@ -52,6 +61,10 @@ def save_config(cfg: dict):
             "base_url": (cfg.get("plex") or {}).get("base_url", ""),
             "token": (cfg.get("plex") or {}).get("token", ""),
         },
+        "torrent": {
+            "profile": torrent.get("profile") or DEFAULTS["torrent"]["profile"],
+            "settings": dict(torrent.get("settings") or {}),
+        },
     }
     tmp = CONFIG_PATH + ".tmp"
     with _LOCK:
@@ -0,0 +1,150 @@
+# event_bus.py
+"""
+Kanał push (Server-Sent Events) dla UI – bez zależności od Flaska.
+
+Producent woła publish(topic, key, data). Każdy subskrybent ma własną,
+ograniczoną mapę zaległych zdarzeń kluczowaną (topic, key): nowsza wartość
+dla tego samego klucza NADPISUJE starszą (coalescing), więc wolny klient
+(telefon na słabym Wi-Fi) dostaje tylko najświeższy stan, a pamięć nie rośnie.
+Po przekroczeniu limitu zaległości kasujemy je i wysyłamy jedno "resync" –
+klient pobiera wtedy pełny stan zwykłym GET-em.
+
+Temat (topic) wybiera klient przy subskrypcji; nazwa zdarzenia SSE (event) domyślnie
+jest równa tematowi – np. temat "torrents" niesie "torrent" i "torrent_removed"
+pod tym samym kluczem (usunięcie nadpisuje zaległą aktualizację).
+Klucz None = zdarzenie bez scalania (np. "torrent_finished") – też liczy się do limitu.
+"""
+import json
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+MAX_PENDING = 256        # zaległych zdarzeń na subskrybenta, potem "resync"
+MAX_SUBSCRIBERS = 32
+HEARTBEAT_SECONDS = 15.0  # komentarz SSE, żeby proxy/przeglądarka nie zamknęły połączenia
+
+
+class Subscriber:
+    def __init__(self, topics: Iterable[str], accept: Optional[Callable[[str, Optional[str]], bool]] = None,
+                 max_pending: int = MAX_PENDING):
+        self.topics = set(topics)
+        self.accept = accept
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._seq = itertools.count()
+        self._resync = False
+        self.closed = False
+        self.dropped = 0      # ile razy przepełnienie skończyło się resync
+        self.coalesced = 0    # ile zdarzeń nadpisała nowsza wartość
+
+    def offer(self, topic: str, key: Optional[str], data, event: Optional[str] = None) -> None:
+        if topic not in self.topics or (self.accept and not self.accept(topic, key)):
+            return
+        with self._cond:
+            if self.closed:
+                return
+            k = (topic, key) if key is not None else (topic, None, next(self._seq))
+            if k in self._pending:
+                # najnowszy stan zamiast kolejki historycznych wartości; pozycja na końcu
+                self._pending.pop(k)
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.clear()
+                self._resync = True
+                self.dropped += 1
+                self._cond.notify()
+                return
+            self._pending[k] = {"event": event or topic, "key": key, "data": data}
+            self._cond.notify()
+
+    def drain(self, timeout: float) -> Tuple[List[dict], bool]:
+        """Czeka do timeout s; zwraca (zdarzenia, resync). Puste = czas na heartbeat."""
+        with self._cond:
+            if not self._pending and not self._resync and not self.closed:
+                self._cond.wait(timeout)
+            events = list(self._pending.values())
+            self._pending.clear()
+            resync, self._resync = self._resync, False
+        return events, resync
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+
+class EventBus:
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subs: List[Subscriber] = []
+        self._published = 0
+
+    def subscribe(self, topics: Iterable[str], accept=None) -> Optional[Subscriber]:
+        """None, gdy osiągnięto limit subskrybentów."""
+        sub = Subscriber(topics, accept)
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                return None
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        sub.close()
+        with self._lock:
+            try:
+                self._subs.remove(sub)
+            except ValueError:
+                pass
+
+    def has_subscribers(self, topic: str) -> bool:
+        with self._lock:
+            return any(topic in s.topics for s in self._subs)
+
+    def publish(self, topic: str, key: Optional[str], data, event: Optional[str] = None) -> None:
+        with self._lock:
+            subs = list(self._subs)
+            self._published += 1
+        for s in subs:
+            try:
+                s.offer(topic, key, data, event)
+            except Exception:
+                pass
+
+    def close_all(self):
+        with self._lock:
+            subs, self._subs = self._subs, []
+        for s in subs:
+            s.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = list(self._subs)
+            published = self._published
+        return {
+            "published": published,
+            "subscribers": [
+                {"topics": sorted(s.topics), "pending": len(s._pending),
+                 "coalesced": s.coalesced, "resyncs": s.dropped}
+                for s in subs
+            ],
+        }
+
+
+def sse_message(event: str, data, event_id: Optional[str] = None) -> bytes:
+    """Jedna ramka SSE; data serializowane do JSON w jednej linii."""
+    body = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    out = []
+    if event_id is not None:
+        out.append(f"id: {event_id}")
+    out.append(f"event: {event}")
+    for line in body.split("\n"):
+        out.append(f"data: {line}")
+    return ("\n".join(out) + "\n\n").encode("utf-8")
+
+
+def sse_comment(text: str = "") -> bytes:
+    return f": {text}\n\n".encode("utf-8")
@@ -37,6 +37,7 @@ BIND_PORT = int(os.environ.get("PFLIX_PORT", "5000"))
 
 BACKEND_URL = f"http://127.0.0.1:{BIND_PORT}/"
 STATUS_URL  = f"http://127.0.0.1:{BIND_PORT}/status"
+EVENTS_URL  = f"http://127.0.0.1:{BIND_PORT}/events?topics=torrents"
 
 BASE_DIR = os.path.abspath(".")
 APP_ICON_PATH = os.path.join(BASE_DIR, "static", "icon.png")
@@ -434,6 +435,40 @@ def _abs_img(img_url: str | None) -> str | None:
     return u
 
 
+class _StatusEventsWorker(QtCore.QObject):
+    """Nasłuch SSE /events w wątku tła: sygnał changed przy zmianie torrentów, connected przy (roz)łączeniu."""
+    changed   = QtCore.Signal()
+    connected = QtCore.Signal(bool)
+
+    def __init__(self, url: str, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="gui-status-events").start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # read timeout > heartbeat serwera (15 s) – cisza dłuższa = zerwane połączenie
+                with requests.get(self.url, stream=True, timeout=(5, 40)) as r:
+                    r.raise_for_status()
+                    self.connected.emit(True)
+                    for line in r.iter_lines(decode_unicode=True):
+                        if self._stop.is_set():
+                            return
+                        if line and line.startswith("event:") and line[6:].strip() != "hello":
+                            self.changed.emit()
+            except Exception:
+                pass
+            self.connected.emit(False)
+            self._stop.wait(3.0)
+
+
 class ShutdownWorker(QtCore.QObject):
     progress = QtCore.Signal(str)
     finished = QtCore.Signal()
@@ -579,10 +614,16 @@ class TorrentsPage(QtWidgets.QWidget):
         self.sort.currentTextChanged.connect(self.refresh_now)
         self.limit.currentIndexChanged.connect(self._apply_limit)
 
-        # ── timer odświeżania
+        # ── timer odświeżania (fallback – przy działającym SSE odświeżamy tylko po zdarzeniu)
         self.timer = QtCore.QTimer(self); self.timer.setInterval(2000)
         self.timer.timeout.connect(self.refresh_now); self.timer.start()
 
+        self._refresh_pending = False
+        self._events = _StatusEventsWorker(EVENTS_URL, self)
+        self._events.changed.connect(self._schedule_refresh)
+        self._events.connected.connect(self._on_events_connected)
+        self._events.start()
+
         # ── przywrócenie limitu
         QtCore.QTimer.singleShot(300, self._restore_limit)
 
@@ -622,6 +663,24 @@ class TorrentsPage(QtWidgets.QWidget):
         except Exception as e:
             self.feedback.setText(f"❌ Błąd ustawiania limitu: {e}")
 
+    def _on_events_connected(self, ok: bool):
+        if ok:
+            self.timer.stop()
+            self.refresh_now()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    def _schedule_refresh(self):
+        # seria zdarzeń (np. kilka torrentów w jednym state_update) => jedno odświeżenie
+        if self._refresh_pending:
+            return
+        self._refresh_pending = True
+
+        def _go():
+            self._refresh_pending = False
+            self.refresh_now()
+        QtCore.QTimer.singleShot(300, _go)
+
     def _active_view(self) -> str:
         # 0 = aktywne, 1 = historia
         return "active" if self.tabGroup.checkedId() == 0 else "history"
@@ -1174,6 +1233,26 @@ class BrowsePage(QtWidgets.QWidget):
 
 # ──────────────────────────────── Strona: Dostępne ──────────────────────────
 # ====== Background fetcher (Qt worker) ======
+# url -> (ETag, dane) – żeby przy braku zmian backend odpowiadał 304 zamiast pełnego JSON-a
+_AVAIL_ETAG_CACHE: dict = {}
+SERIES_LIST_FIELDS = "id,title,thumb,progress,deleteAt,watchedAt,type"
+
+def _get_json_conditional(url: str, timeout: float):
+    headers = {}
+    cached = _AVAIL_ETAG_CACHE.get(url)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = requests.get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and cached:
+        return cached[1]
+    r.raise_for_status()
+    data = r.json() or []
+    etag = r.headers.get("ETag")
+    if etag:
+        _AVAIL_ETAG_CACHE[url] = (etag, data)
+    return data
+
+
 class _AvailDataWorker(QtCore.QObject):
     films_ready  = QtCore.Signal(list)
     series_ready = QtCore.Signal(list)
@@ -1182,22 +1261,43 @@ class _AvailDataWorker(QtCore.QObject):
     @QtCore.Slot()
     def load_films(self):
         try:
-            r = requests.get(f"{BACKEND_URL}plex/films", timeout=15)
-            r.raise_for_status()
-            self.films_ready.emit(r.json() or [])
+            self.films_ready.emit(_get_json_conditional(f"{BACKEND_URL}plex/films", 15))
         except Exception as e:
             self.error.emit(f"Błąd filmów: {e}")
 
     @QtCore.Slot()
     def load_series(self):
+        # lista bez odcinków – drzewo sezonów dociągamy dopiero przy rozwinięciu serialu
         try:
-            r = requests.get(f"{BACKEND_URL}plex/series", timeout=20)
-            r.raise_for_status()
-            self.series_ready.emit(r.json() or [])
+            data = _get_json_conditional(f"{BACKEND_URL}plex/series?fields={SERIES_LIST_FIELDS}", 20)
+            self.series_ready.emit((data or {}).get("items") or [])
         except Exception as e:
             self.error.emit(f"Błąd seriali: {e}")
 
 
+def _fetch_series_episodes(series_id: str) -> list:
+    r = requests.get(f"{BACKEND_URL}plex/series/{series_id}/episodes", timeout=10)
+    r.raise_for_status()
+    return (r.json() or {}).get("episodes") or []
+
+
+class _EpisodesWorker(QtCore.QObject):
+    """Odcinki jednego serialu poza wątkiem UI (pierwsze rozwinięcie karty)."""
+    ready = QtCore.Signal(str, list)
+    error = QtCore.Signal(str, str)
+
+    def __init__(self, series_id: str):
+        super().__init__()
+        self.series_id = series_id
+
+    @QtCore.Slot()
+    def load(self):
+        try:
+            self.ready.emit(self.series_id, _fetch_series_episodes(self.series_id))
+        except Exception as e:
+            self.error.emit(self.series_id, str(e))
+
+
 # ====== Incremental list rendering to avoid UI stalls ======
 def _render_incremental(
     list_widget: QtWidgets.QListWidget,
@@ -1252,6 +1352,9 @@ class AvailablePage(QtWidgets.QWidget):
         self.tabs.addTab(self.films, "🎬 Filmy")
         self.tabs.addTab(self.series, "📺 Seriale")
         tLay.addWidget(self.tabs)
+
+        # series_id -> (wątek, worker, on_ready, on_error) – ładowanie odcinków w tle
+        self._ep_loads = {}
         v.addWidget(tabsCard, 1)
 
         infoCard = _card_container()
@@ -1401,6 +1504,41 @@ class AvailablePage(QtWidgets.QWidget):
 
         self._wk_thread.start()
 
+    def _load_episodes(self, series_id: str, on_ready, on_error):
+        th = QtCore.QThread(self)
+        wk = _EpisodesWorker(series_id)
+        wk.moveToThread(th)
+        # sloty strony => wywołanie wraca do wątku UI (queued connection)
+        wk.ready.connect(self._on_episodes_ready)
+        wk.error.connect(self._on_episodes_error)
+        th.started.connect(wk.load)
+        th.finished.connect(wk.deleteLater)
+        th.finished.connect(th.deleteLater)
+        self._ep_loads[series_id] = (th, wk, on_ready, on_error)
+        th.start()
+
+    @QtCore.Slot(str, list)
+    def _on_episodes_ready(self, series_id: str, eps: list):
+        job = self._ep_loads.pop(series_id, None)
+        if not job:
+            return
+        job[0].quit()
+        try:
+            job[2](eps)
+        except RuntimeError:
+            pass  # karta zniknęła (odświeżenie listy) zanim odcinki doszły
+
+    @QtCore.Slot(str, str)
+    def _on_episodes_error(self, series_id: str, msg: str):
+        job = self._ep_loads.pop(series_id, None)
+        if not job:
+            return
+        job[0].quit()
+        try:
+            job[3](msg)
+        except RuntimeError:
+            pass
+
     def _finish_refresh(self):
         self._busy = False
         try:
@@ -1516,10 +1654,6 @@ class AvailablePage(QtWidgets.QWidget):
             progress = int(s.get("progress", 0) or 0)
             del_ts = s.get("deleteAt")
 
-            seasons_map: dict[int, list] = {}
-            for ep in (s.get("episodes") or []):
-                seasons_map.setdefault(int(ep.get("season") or 0), []).append(ep)
-
             item = QtWidgets.QListWidgetItem()
             card = _card_container()
             root = QtWidgets.QVBoxLayout(card);
@@ -1567,39 +1701,44 @@ class AvailablePage(QtWidgets.QWidget):
             bl.setContentsMargins(4, 4, 4, 4);
             bl.setSpacing(6)
 
-            for snum in sorted(seasons_map.keys()):
-                eps = sorted(seasons_map[snum], key=lambda e: int(e.get("episode") or 0))
-                done = sum(1 for e in eps if int(e.get("progress") or 0) >= 100)
-                total = len(eps)
-
-                seasonBox = QtWidgets.QGroupBox(f"📁 Sezon {snum} — {done}/{total}")
-                seasonBox.setFlat(True)
-                vb = QtWidgets.QVBoxLayout(seasonBox);
-                vb.setContentsMargins(8, 6, 8, 6);
-                vb.setSpacing(4)
-
-                for e in eps:
-                    row = QtWidgets.QWidget()
-                    rl = QtWidgets.QHBoxLayout(row);
-                    rl.setContentsMargins(0, 0, 0, 0);
-                    rl.setSpacing(6)
-                    ep_num = int(e.get("episode") or 0)
-                    ep_title = e.get("title") or ""
-                    ep_prog = int(e.get("progress") or 0)
-                    lbl = QtWidgets.QLabel(f"{ep_num}. {ep_title} — <b>{ep_prog}%</b>")
-                    btnDel = QtWidgets.QPushButton("🗑️");
-                    btnDel.setFixedHeight(26);
-                    style_danger(btnDel)
-                    rl.addWidget(lbl);
-                    rl.addStretch(1);
-                    rl.addWidget(btnDel)
-                    vb.addWidget(row)
-
-                    ep_id = str(e.get("id") or "")
-                    btnDel.clicked.connect(
-                        lambda _, x=ep_id, t="episode", ttitle=ep_title: self._delete_item(x, t, ttitle))
-
-                bl.addWidget(seasonBox)
+            def _fill_body(episodes: list):
+                seasons_map: dict[int, list] = {}
+                for ep in episodes:
+                    seasons_map.setdefault(int(ep.get("season") or 0), []).append(ep)
+
+                for snum in sorted(seasons_map.keys()):
+                    eps = sorted(seasons_map[snum], key=lambda e: int(e.get("episode") or 0))
+                    done = sum(1 for e in eps if int(e.get("progress") or 0) >= 100)
+                    total = len(eps)
+
+                    seasonBox = QtWidgets.QGroupBox(f"📁 Sezon {snum} — {done}/{total}")
+                    seasonBox.setFlat(True)
+                    vb = QtWidgets.QVBoxLayout(seasonBox);
+                    vb.setContentsMargins(8, 6, 8, 6);
+                    vb.setSpacing(4)
+
+                    for e in eps:
+                        row = QtWidgets.QWidget()
+                        rl = QtWidgets.QHBoxLayout(row);
+                        rl.setContentsMargins(0, 0, 0, 0);
+                        rl.setSpacing(6)
+                        ep_num = int(e.get("episode") or 0)
+                        ep_title = e.get("title") or ""
+                        ep_prog = int(e.get("progress") or 0)
+                        lbl = QtWidgets.QLabel(f"{ep_num}. {ep_title} — <b>{ep_prog}%</b>")
+                        btnDel = QtWidgets.QPushButton("🗑️");
+                        btnDel.setFixedHeight(26);
+                        style_danger(btnDel)
+                        rl.addWidget(lbl);
+                        rl.addStretch(1);
+                        rl.addWidget(btnDel)
+                        vb.addWidget(row)
+
+                        ep_id = str(e.get("id") or "")
+                        btnDel.clicked.connect(
+                            lambda _, x=ep_id, t="episode", ttitle=ep_title: self._delete_item(x, t, ttitle))
+
+                    bl.addWidget(seasonBox)
 
             caretRow = QtWidgets.QHBoxLayout();
             caretRow.setContentsMargins(0, 0, 0, 0)
@@ -1610,7 +1749,26 @@ class AvailablePage(QtWidgets.QWidget):
             btnToggle.setChecked(False);
             btnToggle.setFixedSize(28, 28)
 
+            loaded = {"done": False}
+            if "episodes" in s:
+                _fill_body(s.get("episodes") or [])
+                loaded["done"] = True
+
             def _on_toggle(ch: bool):
+                # odcinki dociągamy przy pierwszym rozwinięciu – w tle, UI nie czeka na backend
+                if ch and not loaded["done"] and series_id not in self._ep_loads:
+                    wait = QtWidgets.QLabel("⏳ Ładowanie odcinków…")
+                    bl.addWidget(wait)
+
+                    def _ready(eps):
+                        wait.deleteLater()
+                        _fill_body(eps)
+                        loaded["done"] = True
+
+                    def _failed(msg):
+                        wait.setText(f"❌ Błąd odcinków: {msg}")
+
+                    self._load_episodes(series_id, _ready, _failed)
                 body.setVisible(ch)
                 btnToggle.setText("‹" if ch else "›")
                 btnToggle.setToolTip("Ukryj sezony" if ch else "Pokaż sezony")
@@ -0,0 +1,200 @@
+# history_index.py
+"""
+Indeks i agregaty historii torrentów (w pamięci, bez zależności od libtorrent).
+
+- wpisy posortowane po (ts, seq) – zakres since/until to bisect, nie skan całej listy,
+- osobne listy kluczy per zdarzenie (finished / error / tracker_error …),
+- stronicowanie kursorem "ts:seq" (od najnowszych; kolejna strona = starsze niż kursor);
+  seq to trwały numer wpisu nadawany przez HistoryStore i zapisany w linii JSONL, więc
+  kursor przeżywa restart i kompaktowanie,
+- agregaty liczone przyrostowo przy każdym wpisie: bajty pobrane per dzień, średni czas
+  ukończenia, błędy per tracker i per kategoria.
+
+Agregaty = baza (wpisy już zarchiwizowane przy kompaktowaniu, trzymana w pliku .agg.json)
++ wpisy z aktywnego pliku – każdy wpis liczy się dokładnie raz, także po restarcie.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from search_index import fold
+
+ERROR_EVENTS = ("error", "tracker_error")
+
+
+def _day(ts: int) -> str:
+    try:
+        return datetime.fromtimestamp(int(ts)).strftime("%Y-%m-%d")
+    except Exception:
+        return "?"
+
+
+def tracker_host(url: str) -> str:
+    try:
+        return urlparse(url).hostname or url
+    except Exception:
+        return url or "?"
+
+
+class HistoryAggregates:
+    def __init__(self, data: Optional[dict] = None):
+        d = data or {}
+        self.bytes_per_day: Dict[str, int] = dict(d.get("bytes_per_day") or {})
+        self.completed: int = int(d.get("completed") or 0)
+        self.completion_seconds: int = int(d.get("completion_seconds") or 0)
+        self.errors_by_tracker: Dict[str, int] = dict(d.get("errors_by_tracker") or {})
+        self.errors_by_category: Dict[str, int] = dict(d.get("errors_by_category") or {})
+        self.events: Dict[str, int] = dict(d.get("events") or {})
+
+    def copy(self) -> "HistoryAggregates":
+        return HistoryAggregates(self.to_dict())
+
+    def add(self, e: dict, category_of: Optional[Callable[[str], Optional[str]]] = None):
+        ev = str(e.get("event") or "?")
+        self.events[ev] = self.events.get(ev, 0) + 1
+        ts = int(e.get("ts") or 0)
+        if ev == "finished":
+            size = int(e.get("size") or 0)
+            if size > 0:
+                day = _day(ts)
+                self.bytes_per_day[day] = self.bytes_per_day.get(day, 0) + size
+            added = int(e.get("added_ts") or 0)
+            if 0 < added <= ts:
+                self.completed += 1
+                self.completion_seconds += ts - added
+        elif ev in ERROR_EVENTS:
+            if e.get("tracker"):
+                host = tracker_host(e["tracker"])
+                self.errors_by_tracker[host] = self.errors_by_tracker.get(host, 0) + 1
+            cat = e.get("category")
+            if cat is None and category_of is not None:
+                try:
+                    cat = category_of(e.get("path") or "")
+                except Exception:
+                    cat = None
+            cat = cat or "other"
+            self.errors_by_category[cat] = self.errors_by_category.get(cat, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "bytes_per_day": dict(self.bytes_per_day),
+            "completed": self.completed,
+            "completion_seconds": self.completion_seconds,
+            "errors_by_tracker": dict(self.errors_by_tracker),
+            "errors_by_category": dict(self.errors_by_category),
+            "events": dict(self.events),
+        }
+
+    def summary(self, days: Optional[int] = None) -> dict:
+        """days = ostatnie N dni kalendarzowych łącznie z dzisiejszym (nie N dni z danymi)."""
+        per_day = dict(sorted(self.bytes_per_day.items()))
+        if days is not None:
+            if days < 1:
+                raise ValueError("days: oczekiwano liczby >= 1")
+            cutoff = (date.today() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+            per_day = {d: b for d, b in per_day.items() if d != "?" and d >= cutoff}
+        return {
+            "bytes_per_day": per_day,
+            "completed_with_time": self.completed,
+            "avg_completion_seconds": (self.completion_seconds / self.completed) if self.completed else None,
+            "errors_by_tracker": dict(sorted(self.errors_by_tracker.items(), key=lambda kv: -kv[1])),
+            "errors_by_category": self.errors_by_category,
+            "events": self.events,
+        }
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        ts, seq = cursor.split(":")
+        return int(ts), int(seq)
+    except Exception:
+        raise ValueError("Nieprawidłowy kursor")
+
+
+class HistoryIndex:
+    def __init__(self, category_of: Optional[Callable[[str], Optional[str]]] = None,
+                 base: Optional[dict] = None):
+        self.category_of = category_of
+        self.base = HistoryAggregates(base)     # zarchiwizowane (trwałe w .agg.json)
+        self.live = self.base.copy()            # baza + wpisy w indeksie
+        self._rows: Dict[int, dict] = {}
+        self._keys: List[Tuple[int, int]] = []
+        self._by_event: Dict[str, List[Tuple[int, int]]] = {}
+
+    @staticmethod
+    def _key(e: dict) -> Tuple[int, int]:
+        return int(e.get("ts") or 0), int(e.get("seq") or 0)
+
+    def _index(self, e: dict):
+        k = self._key(e)
+        self._rows[k[1]] = e
+        # wpisy przychodzą prawie zawsze w kolejności ts – insort trafia w koniec listy
+        insort(self._keys, k)
+        insort(self._by_event.setdefault(str(e.get("event") or "?"), []), k)
+
+    def add(self, e: dict):
+        self._index(e)
+        self.live.add(e, self.category_of)
+
+    def drop(self, e: dict):
+        """Ring w HistoryStore wypchnął ten wpis – indeks też (agregaty zostają)."""
+        k = self._key(e)
+        if self._rows.get(k[1]) is not e:
+            return
+        del self._rows[k[1]]
+        for lst in (self._keys, self._by_event.get(str(e.get("event") or "?"))):
+            if lst:
+                i = bisect_left(lst, k)
+                if i < len(lst) and lst[i] == k:
+                    lst.pop(i)
+
+    def archive(self, entries: List[dict]):
+        """Wpisy wyniesione z aktywnego pliku – od teraz liczą się w bazie."""
+        for e in entries:
+            self.base.add(e, self.category_of)
+
+    def reset_items(self, entries: List[dict]):
+        """Nowa zawartość indeksu (po kompaktowaniu) – agregaty bez zmian."""
+        self._rows.clear()
+        self._keys.clear()
+        self._by_event.clear()
+        for e in entries:
+            self._index(e)
+
+    def clear(self):
+        self.reset_items([])
+        self.base = HistoryAggregates()
+        self.live = HistoryAggregates()
+
+    def query(self, event: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+              q: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+        """Od najnowszych; {"items", "next_cursor"} – next_cursor None = koniec."""
+        keys = self._by_event.get(event, []) if event else self._keys
+        hi = len(keys)
+        if until is not None:
+            hi = bisect_right(keys, (int(until), float("inf")))
+        cur = parse_cursor(cursor)
+        if cur is not None:
+            hi = min(hi, bisect_left(keys, cur))
+        lo = bisect_left(keys, (int(since), -1)) if since is not None else 0
+        needle = fold(q) if q else ""
+
+        items: List[dict] = []
+        last = None
+        i = hi - 1
+        while i >= lo:
+            k = keys[i]
+            e = self._rows.get(k[1])
+            i -= 1
+            if e is None:
+                continue
+            if needle and needle not in fold(e.get("name") or ""):
+                continue
+            if limit is not None and len(items) >= limit:
+                return {"items": items, "next_cursor": f"{last[0]}:{last[1]}"}
+            items.append(e)
+            last = k
+        return {"items": items, "next_cursor": None}
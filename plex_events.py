@@ -0,0 +1,168 @@
+# plex_events.py
+"""
+Nasłuch powiadomień Plexa (/:/websockets/notifications) – opcjonalny.
+
+Cienka pętla na websocket-client (tej samej biblioteki używa plexapi.AlertListener),
+ale z jawnie podanym URL-em zamiast obiektu PlexServer – dzięki temu da się ją odpalić
+przeciw lokalnemu, udawanemu serwerowi (plex_events_fake.py, `python plex_events_fake.py`).
+Parsowanie jednej wiadomości (dispatch) nie wymaga gniazda.
+
+Każda wiadomość NotificationContainer jest rozbijana na zdarzenia
+on_event(kind, entry), gdzie kind to "timeline" / "playing" / "activity",
+a entry to pojedynczy wpis z listy (TimelineEntry, PlaySessionStateNotification,
+ActivityNotification). Po zerwaniu połączenia – ponowne łączenie z backoffem.
+"""
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import websocket  # websocket-client (zależność plexapi.AlertListener)
+except ImportError:
+    websocket = None
+
+# typ notyfikacji -> klucz listy wpisów w NotificationContainer
+_ENTRY_KEYS = {
+    "timeline": "TimelineEntry",
+    "playing": "PlaySessionStateNotification",
+    "activity": "ActivityNotification",
+}
+
+NOTIFICATIONS_PATH = "/:/websockets/notifications"
+
+
+def notifications_url(base_url: str, token: str) -> str:
+    """http(s)://host:32400 -> ws(s)://host:32400/:/websockets/notifications?X-Plex-Token=..."""
+    base = (base_url or "").rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    url = base + NOTIFICATIONS_PATH
+    return f"{url}?X-Plex-Token={token}" if token else url
+
+
+def available() -> bool:
+    return websocket is not None
+
+
+class PlexEventListener:
+    def __init__(
+        self,
+        url: str,
+        on_event: Callable[[str, dict], None],
+        stop_event: Optional[threading.Event] = None,
+        on_state: Optional[Callable[[bool], None]] = None,
+        recv_timeout: float = 1.0,
+        max_backoff: float = 60.0,
+        thread_name: str = "plex-events",
+        min_backoff: float = 1.0,
+    ):
+        self.url = url
+        self.on_event = on_event
+        self.on_state = on_state
+        self.stop_event = stop_event or threading.Event()
+        self.recv_timeout = recv_timeout
+        self.max_backoff = max_backoff
+        self.min_backoff = min_backoff
+        self.thread_name = thread_name
+        self._thread: Optional[threading.Thread] = None
+        self._ws = None
+        self.connected = False
+        self.stats = {"connects": 0, "messages": 0, "events": 0, "errors": 0, "last_message": None}
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Start / stop
+    # ─────────────────────────────────────────────────────────────────────
+    def start(self) -> bool:
+        if websocket is None:
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._thread = threading.Thread(target=self._run, daemon=True, name=self.thread_name)
+        self._thread.start()
+        return True
+
+    def stop(self, join_timeout: float = 3.0):
+        self.stop_event.set()
+        try:
+            if self._ws is not None:
+                self._ws.close()
+        except Exception:
+            pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=join_timeout)
+
+    def _set_connected(self, v: bool):
+        if self.connected == v:
+            return
+        self.connected = v
+        if self.on_state:
+            try:
+                self.on_state(v)
+            except Exception:
+                pass
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Pętla
+    # ─────────────────────────────────────────────────────────────────────
+    def _run(self):
+        backoff = self.min_backoff
+        while not self.stop_event.is_set():
+            try:
+                self._ws = websocket.create_connection(self.url, timeout=10)
+                self._ws.settimeout(self.recv_timeout)
+                self.stats["connects"] += 1
+                self._set_connected(True)
+                backoff = self.min_backoff
+                self._recv_loop()
+            except Exception:
+                self.stats["errors"] += 1
+            finally:
+                self._set_connected(False)
+                try:
+                    if self._ws is not None:
+                        self._ws.close()
+                except Exception:
+                    pass
+                self._ws = None
+            if self.stop_event.wait(backoff):
+                break
+            backoff = min(self.max_backoff, backoff * 2)
+
+    def _recv_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                msg = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if not msg:
+                # serwer zamknął połączenie
+                return
+            self.stats["messages"] += 1
+            self.stats["last_message"] = int(time.time() * 1000)
+            self.dispatch(msg)
+
+    def dispatch(self, msg) -> int:
+        """Rozbija jedną wiadomość na zdarzenia; zwraca ile przekazano do on_event."""
+        try:
+            data = json.loads(msg)
+        except Exception:
+            return 0
+        nc = (data or {}).get("NotificationContainer") or {}
+        kind = nc.get("type")
+        key = _ENTRY_KEYS.get(kind)
+        if not key:
+            return 0
+        n = 0
+        for entry in nc.get(key) or []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                self.on_event(kind, entry)
+                n += 1
+            except Exception:
+                self.stats["errors"] += 1
+        self.stats["events"] += n
+        return n
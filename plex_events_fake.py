@@ -0,0 +1,136 @@
+# plex_events_fake.py
+"""
+Udawany serwer powiadomień Plexa (ws://…/:/websockets/notifications) do sprawdzania
+plex_events.PlexEventListener bez prawdziwego Plexa – tylko biblioteka standardowa.
+
+Każde połączenie dostaje po handshake'u listę ramek tekstowych (NotificationContainer),
+po czym serwer zamyka je ramką close – listener musi się połączyć ponownie (backoff).
+
+    python plex_events_fake.py      # samosprawdzenie: dispatch + ponowne łączenie
+"""
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import sys
+import threading
+import time
+from typing import List, Optional
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def notification(kind: str, entries: List[dict]) -> str:
+    """Jedna wiadomość NotificationContainer jak z Plexa."""
+    key = {"timeline": "TimelineEntry", "playing": "PlaySessionStateNotification",
+           "activity": "ActivityNotification"}[kind]
+    return json.dumps({"NotificationContainer": {"type": kind, "size": len(entries), key: entries}})
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    # ramki serwera nie są maskowane
+    head = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        head += bytes([n])
+    elif n < 1 << 16:
+        head += bytes([126]) + struct.pack("!H", n)
+    else:
+        head += bytes([127]) + struct.pack("!Q", n)
+    return head + payload
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        srv: "FakePlexNotificationServer" = self.server.owner
+        req = b""
+        while b"\r\n\r\n" not in req:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            req += chunk
+        headers = {}
+        for line in req.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        accept = base64.b64encode(
+            hashlib.sha1((headers.get("sec-websocket-key", "") + _WS_GUID).encode()).digest()).decode()
+        self.request.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        with srv.lock:
+            srv.connections += 1
+        for msg in srv.messages:
+            self.request.sendall(_frame(0x1, msg.encode("utf-8")))
+        self.request.sendall(_frame(0x8, struct.pack("!H", 1000)))
+        time.sleep(0.05)
+
+
+class FakePlexNotificationServer:
+    def __init__(self, messages: List[str], host: str = "127.0.0.1", port: int = 0):
+        self.messages = list(messages)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self._srv = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self._srv.daemon_threads = True
+        self._srv.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._srv.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._srv.serve_forever, daemon=True, name="fake-plex-ws")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+def selfcheck(timeout: float = 5.0) -> bool:
+    """Listener na udawanym serwerze: zdarzenia z obu typów + co najmniej jedno ponowne połączenie."""
+    import plex_events
+
+    if not plex_events.available():
+        print("⚠️ brak websocket-client – pomijam")
+        return False
+    srv = FakePlexNotificationServer([
+        notification("playing", [{"sessionKey": "1", "ratingKey": "101", "state": "paused"}]),
+        notification("timeline", [{"itemID": "202", "type": 1, "state": 5},
+                                  {"itemID": "203", "type": 4, "state": 9}]),
+        "nie-json",
+    ]).start()
+    got, states = [], []
+    lst = plex_events.PlexEventListener(
+        plex_events.notifications_url(srv.base_url, "token"),
+        on_event=lambda kind, entry: got.append((kind, entry)),
+        on_state=states.append, recv_timeout=0.2, min_backoff=0.1, max_backoff=0.2,
+    )
+    lst.start()
+    end = time.time() + timeout
+    while time.time() < end and srv.connections < 2:
+        time.sleep(0.05)
+    lst.stop()
+    srv.stop()
+
+    kinds = [k for k, _e in got]
+    ok = (
+        srv.connections >= 2                              # zerwane połączenie => ponowne łączenie
+        and kinds[:3] == ["playing", "timeline", "timeline"]
+        and got[0][1].get("ratingKey") == "101"
+        and True in states and False in states
+        and lst.stats["connects"] >= 2
+    )
+    print(("✅" if ok else "❌"), {"connections": srv.connections, "events": kinds[:6], "stats": lst.stats})
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if selfcheck() else 1)
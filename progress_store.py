@@ -0,0 +1,360 @@
+# progress_store.py
+"""
+Trwały magazyn postępów (zastępuje progress_cache.json).
+
+SQLite w trybie WAL, jeden wiersz na pozycję (film / serial / odcinek),
+indeksy po id, parent_id, delete_at i znormalizowanym tytule. Dzięki temu
+np. reset timera to UPDATE jednego wiersza, a nie przepisanie całego JSON-a.
+
+Pełny wpis (taki sam dict jak dawniej w JSON) leży w kolumnie `data`;
+kolumny parent_id / type / title_norm / delete_at są jego kopią do zapytań.
+Wpisy „techniczne” (np. `_genres_by_title`) trzymamy w tabeli `meta`.
+"""
+import os, json, sqlite3, threading
+from typing import Dict, Iterable, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress (
+    id          TEXT PRIMARY KEY,
+    parent_id   TEXT,
+    type        TEXT,
+    title_norm  TEXT,
+    delete_at   INTEGER,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_progress_parent ON progress(parent_id);
+CREATE INDEX IF NOT EXISTS ix_progress_delete ON progress(delete_at);
+CREATE INDEX IF NOT EXISTS ix_progress_title  ON progress(title_norm);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    data  TEXT NOT NULL
+);
+"""
+
+
+def _norm_title(s: str) -> str:
+    return " ".join((s or "").strip().lower().split())
+
+
+def genres_meta_key(type_: str, title: str) -> str:
+    """Klucz w tabeli meta dla cache gatunków TMDb (dawniej _genres_by_title[type][title])."""
+    return f"genres:{(type_ or '').lower()}:{_norm_title(title)}"
+
+
+def _as_int(v) -> Optional[int]:
+    # bool to też int – nie chcemy True/False jako znacznika czasu
+    return v if isinstance(v, int) and not isinstance(v, bool) else None
+
+
+def _row_values(item_id: str, entry: dict) -> tuple:
+    parent = entry.get("parent_id")
+    return (
+        str(item_id),
+        str(parent) if parent not in (None, "") else None,
+        (entry.get("type") or "").lower() or None,
+        _norm_title(entry.get("title") or ""),
+        _as_int(entry.get("delete_at")),
+        json.dumps(entry, ensure_ascii=False),
+    )
+
+
+class ProgressStore:
+    def __init__(self, db_path: str, legacy_json: Optional[str] = None):
+        self.path = db_path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if legacy_json:
+            self._migrate_from_json(legacy_json)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Migracja z progress_cache.json (1x)
+    # ─────────────────────────────────────────────────────────────────────
+    def _migrate_from_json(self, json_path: str):
+        if not os.path.isfile(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict):
+            return
+
+        entries = {}
+        meta = {}
+        for k, v in data.items():
+            if not isinstance(v, dict):
+                continue
+            if str(k) == "_genres_by_title":
+                # {type: {norm_title: {...}}} -> osobny wiersz na tytuł
+                for type_, per_title in v.items():
+                    if isinstance(per_title, dict):
+                        for t, g in per_title.items():
+                            meta[genres_meta_key(type_, t)] = g
+            elif str(k).startswith("_"):
+                meta[str(k)] = v
+            else:
+                entries[str(k)] = v
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO progress(id, parent_id, type, title_norm, delete_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [_row_values(k, v) for k, v in entries.items()],
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO meta(key, data) VALUES (?, ?)",
+                    [(k, json.dumps(v, ensure_ascii=False)) for k, v in meta.items()],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        # stary plik zostaje jako kopia – ale pod inną nazwą, żeby nie migrować drugi raz
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except Exception:
+            pass
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Odczyt
+    # ─────────────────────────────────────────────────────────────────────
+    def get(self, item_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM progress WHERE id = ?", (str(item_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, dict]:
+        ids = [str(i) for i in ids]
+        out: Dict[str, dict] = {}
+        with self._lock:
+            # SQLite ma limit parametrów – tniemy na paczki
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                q = "SELECT id, data FROM progress WHERE id IN (%s)" % ",".join("?" * len(chunk))
+                for _id, data in self._db.execute(q, chunk):
+                    out[_id] = json.loads(data)
+        return out
+
+    def all(self) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT id, data FROM progress").fetchall()
+        return {_id: json.loads(data) for _id, data in rows}
+
+    def children(self, parent_id: str) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, data FROM progress WHERE parent_id = ?", (str(parent_id),)
+            ).fetchall()
+        return {_id: json.loads(data) for _id, data in rows}
+
+    def by_title(self, title: str) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, data FROM progress WHERE title_norm = ?", (_norm_title(title),)
+            ).fetchall()
+        return {_id: json.loads(data) for _id, data in rows}
+
+    def delete_at_overrides(self) -> Dict[str, int]:
+        """{id: delete_at} dla wpisów z aktywnym timerem (idzie po indeksie)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, delete_at FROM progress WHERE delete_at IS NOT NULL"
+            ).fetchall()
+        return {_id: int(da) for _id, da in rows}
+
+    def expired(self, now_ms: int) -> Dict[str, dict]:
+        """Wpisy z delete_at < now_ms (range scan po indeksie delete_at)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, data FROM progress WHERE delete_at IS NOT NULL AND delete_at < ? "
+                "ORDER BY delete_at", (int(now_ms),)
+            ).fetchall()
+        return {_id: json.loads(data) for _id, data in rows}
+
+    def is_expired(self, item_id: str, now_ms: int) -> bool:
+        """Czy wpis nadal istnieje i jego timer minął (ponowna weryfikacja tuż przed kasowaniem)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM progress WHERE id = ? AND delete_at IS NOT NULL AND delete_at < ?",
+                (str(item_id), int(now_ms)),
+            ).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM progress").fetchone()[0])
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Zapis
+    # ─────────────────────────────────────────────────────────────────────
+    def put(self, item_id: str, entry: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO progress(id, parent_id, type, title_norm, delete_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                _row_values(item_id, entry),
+            )
+
+    def put_many(self, entries: Dict[str, dict]):
+        """Hurtowy upsert w jednej transakcji."""
+        if not entries:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO progress(id, parent_id, type, title_norm, delete_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [_row_values(k, v) for k, v in entries.items()],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def set_delete_at(self, item_id: str, delete_at: Optional[int]) -> Optional[dict]:
+        """
+        Ustawia delete_at jednego wpisu (jeden UPDATE).
+        Zwraca wpis SPRZED zmiany albo None, gdy ID nie istnieje.
+        """
+        item_id = str(item_id)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT data FROM progress WHERE id = ?", (item_id,)).fetchone()
+                if not row:
+                    self._db.execute("COMMIT")
+                    return None
+                before = json.loads(row[0])
+                after = dict(before)
+                after["delete_at"] = delete_at
+                self._db.execute(
+                    "UPDATE progress SET delete_at = ?, data = ? WHERE id = ?",
+                    (_as_int(delete_at), json.dumps(after, ensure_ascii=False), item_id),
+                )
+                self._db.execute("COMMIT")
+                return before
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, item_id: str, with_children: bool = False) -> int:
+        """Usuwa wpis (i opcjonalnie jego odcinki). Zwraca liczbę usuniętych wierszy."""
+        return self.delete_many([item_id], with_children=with_children)
+
+    def delete_many(self, ids: Iterable[str], with_children: bool = False) -> int:
+        ids = [str(i) for i in ids]
+        if not ids:
+            return 0
+        n = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    marks = ",".join("?" * len(chunk))
+                    n += self._db.execute("DELETE FROM progress WHERE id IN (%s)" % marks, chunk).rowcount
+                    if with_children:
+                        n += self._db.execute(
+                            "DELETE FROM progress WHERE parent_id IN (%s)" % marks, chunk
+                        ).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return n
+
+    def apply_batch(self, now_ms: int, clear_delete_at: Iterable[str] = (), delete: Iterable[str] = (),
+                    delete_with_children: Iterable[str] = ()) -> dict:
+        """
+        Jedna transakcja dla całego sprzątania: zerowanie timerów, usunięcie wpisów
+        i wpisów razem z dziećmi (serial + odcinki). Zwraca liczniki.
+        Dotyka tylko wpisów, których timer nadal jest przeterminowany (delete_at < now_ms) –
+        timer ustawiony w międzyczasie przez użytkownika zostaje.
+        """
+        clear_ids = [str(i) for i in clear_delete_at]
+        plain = [str(i) for i in delete]
+        parents = [str(i) for i in delete_with_children]
+        out = {"cleared": 0, "deleted": 0, "cleared_ids": []}
+        if not (clear_ids or plain or parents):
+            return out
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for item_id in clear_ids:
+                    row = self._db.execute(
+                        "SELECT data FROM progress WHERE id = ? AND delete_at IS NOT NULL AND delete_at < ?",
+                        (item_id, int(now_ms)),
+                    ).fetchone()
+                    if not row:
+                        continue
+                    data = json.loads(row[0])
+                    data["delete_at"] = None
+                    self._db.execute(
+                        "UPDATE progress SET delete_at = NULL, data = ? WHERE id = ?",
+                        (json.dumps(data, ensure_ascii=False), item_id),
+                    )
+                    out["cleared"] += 1
+                    out["cleared_ids"].append(item_id)
+                for ids, children in ((plain, False), (parents, True)):
+                    for i in range(0, len(ids), 500):
+                        chunk = ids[i:i + 500]
+                        marks = ",".join("?" * len(chunk))
+                        cond = "id IN (%s) AND delete_at IS NOT NULL AND delete_at < ?" % marks
+                        if children:
+                            # dzieci tylko tych rodziców, których timer nadal jest przeterminowany
+                            chunk = [r[0] for r in self._db.execute(
+                                "SELECT id FROM progress WHERE " + cond, chunk + [int(now_ms)])]
+                            if not chunk:
+                                continue
+                            marks = ",".join("?" * len(chunk))
+                            out["deleted"] += self._db.execute(
+                                "DELETE FROM progress WHERE parent_id IN (%s)" % marks, chunk).rowcount
+                            out["deleted"] += self._db.execute(
+                                "DELETE FROM progress WHERE id IN (%s)" % marks, chunk).rowcount
+                        else:
+                            out["deleted"] += self._db.execute(
+                                "DELETE FROM progress WHERE " + cond, chunk + [int(now_ms)]).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return out
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Meta (np. cache gatunków)
+    # ─────────────────────────────────────────────────────────────────────
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def meta_with_prefix(self, prefix: str) -> Dict[str, object]:
+        """Wszystkie wpisy meta o kluczu zaczynającym się od prefix (np. "genres:")."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, data FROM meta WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+            ).fetchall()
+        return {k: json.loads(d) for k, d in rows}
+
+    def set_meta(self, key: str, value):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta(key, data) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def close(self):
+        with self._lock:
+            try:
+                self._db.close()
+            except Exception:
+                pass
@@ -0,0 +1,142 @@
+# search_index.py
+"""
+Indeks wyszukiwania dla /search-local (w pamięci, budowany raz na generację cache).
+
+- tekst jest „składany” (małe litery, bez ogonków: „Żółć” -> „zolc”, „ł” -> „l”),
+- krótkie frazy (1–2 znaki) idą po indeksie wszystkich 1- i 2-znakowych podciągów,
+- dłuższe po indeksie trigramów + weryfikacja podciągu,
+- każda fraza ma semantykę dawnego `q in title` („ad” znajduje „Gladiator”),
+- litery spoza tabeli składania (cyrylica, greka…) zostają bez zmian.
+- przeszukiwane pola: tytuł, gatunki i tytuły odcinków – z różną wagą w rankingu.
+
+Indeks trzyma tylko numery dokumentów (pozycje na listach filmów i seriali),
+więc wyszukiwanie nie kopiuje list – zwraca pozycje, a cache podaje gotowe dicty.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+# waga pola w rankingu: trafienie w tytule > gatunek > tytuł odcinka
+_W_TITLE, _W_GENRE, _W_EPISODE = 8, 3, 1
+_SHORT_MAX = 2  # podciągi 1–2 znaki tylko dla krótkich fraz; dłuższe obsługują trigramy
+
+_SPLIT = re.compile(r"[\W_]+")
+# litery, których NFKD nie rozkłada na bazę + znak diakrytyczny
+_EXTRA_FOLD = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ß": "ss", "æ": "ae", "œ": "oe"})
+
+
+def fold(s: str) -> str:
+    """Tekst do porównań: małe litery, bez diakrytyków, pojedyncze spacje."""
+    s = unicodedata.normalize("NFKD", (s or "").lower().translate(_EXTRA_FOLD))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(s.split())
+
+
+def _words(folded: str) -> List[str]:
+    return [w for w in _SPLIT.split(folded) if w]
+
+
+def _trigrams(folded: str) -> Set[str]:
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+
+class SearchIndex:
+    """Niezmienny po zbudowaniu – podmieniany w całości przy nowej generacji danych."""
+
+    def __init__(self, films: List[dict], series: List[dict], genres: Dict[Tuple[str, str], List[str]] = None):
+        genres = genres or {}
+        self.n_films = len(films)
+        # doc -> (tytuł, gatunki, odcinki) po złożeniu; odcinki sklejone "\n", żeby podciąg nie łączył dwóch tytułów
+        self._fields: List[Tuple[str, str, str]] = []
+        self._grams: Dict[str, Set[int]] = {}
+        self._short: Dict[str, Set[int]] = {}
+
+        for doc, (it, type_) in enumerate(self._docs(films, series)):
+            title = fold(it.get("title") or "")
+            g = it.get("genres") or genres.get((type_, " ".join((it.get("title") or "").strip().lower().split()))) or []
+            gen_txt = "\n".join(fold(x) for x in g if x)
+            ep_txt = "\n".join(fold(e.get("title") or "") for e in (it.get("episodes") or []) if e.get("title"))
+            self._fields.append((title, gen_txt, ep_txt))
+
+            for part in (title, gen_txt, ep_txt):
+                if not part:
+                    continue
+                for line in part.split("\n"):
+                    for gram in _trigrams(line):
+                        self._grams.setdefault(gram, set()).add(doc)
+                    for n in range(1, _SHORT_MAX + 1):
+                        for i in range(len(line) - n + 1):
+                            self._short.setdefault(line[i:i + n], set()).add(doc)
+
+    @staticmethod
+    def _docs(films: List[dict], series: List[dict]) -> Iterable[tuple]:
+        for it in films:
+            yield it, "movie"
+        for it in series:
+            yield it, "tv"
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _candidates(self, term: str) -> Set[int]:
+        if len(term) <= _SHORT_MAX:
+            return set(self._short.get(term, ()))
+        grams = sorted(_trigrams(term), key=lambda g: len(self._grams.get(g, ())))
+        if not grams:
+            return set()
+        out = set(self._grams.get(grams[0], ()))
+        for g in grams[1:]:
+            if not out:
+                break
+            out &= self._grams.get(g, set())
+        return out
+
+    def _score(self, doc: int, terms: List[str], phrase: str) -> int:
+        title, gen_txt, ep_txt = self._fields[doc]
+        score = 0
+        for t in terms:
+            if t in title:
+                score += _W_TITLE
+            elif t in gen_txt:
+                score += _W_GENRE
+            elif t in ep_txt:
+                score += _W_EPISODE
+            else:
+                return 0  # każde słowo zapytania musi gdzieś trafić
+        if title == phrase:
+            score += 100
+        elif title.startswith(phrase):
+            score += 20
+        elif phrase in title:
+            score += 5
+        return score
+
+    def search(self, query: str, limit: int = 0) -> Tuple[List[int], List[int]]:
+        """
+        Zwraca (pozycje_filmów, pozycje_seriali) posortowane wg trafności,
+        przy remisie w kolejności listy.
+        """
+        phrase = fold(query)
+        terms = _words(phrase)
+        if not terms:
+            return [], []
+
+        cand = None
+        for t in sorted(set(terms), key=len, reverse=True):
+            c = self._candidates(t)
+            cand = c if cand is None else (cand & c)
+            if not cand:
+                return [], []
+
+        ranked = []
+        for doc in cand:
+            s = self._score(doc, terms, phrase)
+            if s:
+                ranked.append((-s, doc))
+        ranked.sort()
+        if limit:
+            ranked = ranked[:limit]
+
+        films = [doc for _s, doc in ranked if doc < self.n_films]
+        series = [doc - self.n_films for _s, doc in ranked if doc >= self.n_films]
+        return films, series
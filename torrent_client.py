@@ -1,11 +1,16 @@
 import os
 import time
+import hashlib
 import atexit
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
 from typing import Dict, Optional, List, Set
 import sys, shutil
 import libtorrent as lt
+from bandwidth import BandwidthConfig, CATEGORIES, split_category_limit, combine
+from history_index import HistoryIndex
 
 # ─────────────────────────────────────────────────────────────────────────────
 # ŚCIEŻKI I STAŁE – trwałe w profilu użytkownika (działa w PyInstaller onefile)
@@ -24,6 +29,9 @@ def _user_state_root(app_name: str = APP_NAME) -> str:
 STATE_DIR = os.path.join(_user_state_root(), "lt")   # katalog na dane libtorrent
 RESUME_DIR = os.path.join(STATE_DIR, "resume")
 DHT_STATE_FILE = os.path.join(STATE_DIR, "dht_state.dat")
+BANDWIDTH_FILE = os.path.join(STATE_DIR, "bandwidth.json")
+QUEUE_FILE = os.path.join(STATE_DIR, "queue.json")
+STREAM_FILE = os.path.join(STATE_DIR, "stream.json")
 
 os.makedirs(RESUME_DIR, exist_ok=True)
 
@@ -59,24 +67,129 @@ def _migrate_if_needed():
 _migrate_if_needed()
 
 RESUME_FLUSH_INTERVAL = 30  # co ile sekund robimy checkpoint resume
+RESUME_CHECKPOINT_SLICES = 10  # checkpoint rozkładamy na tyle porcji w obrębie interwału
+RESUME_LOAD_WORKERS = 4        # wątki czytające i dekodujące .fastresume przy starcie
+BANDWIDTH_TICK = 60            # s – przeliczenie limitów (harmonogram godzinowy, podział kategorii)
+
+# historia (JSONL, tylko dopisywanie): kompaktowanie po przekroczeniu rozmiaru albo liczby linii
+HISTORY_RING = 5000                  # ostatnie wpisy trzymane w pamięci (get() bez czytania pliku)
+HISTORY_MAX_BYTES = 2 * 1024 * 1024
+HISTORY_MAX_LINES = 4000
+HISTORY_KEEP = 2000                  # tyle najnowszych wpisów zostaje w pliku po kompaktowaniu
+HISTORY_ROTATIONS = 3                # archiwa .1 … .N ze starszymi wpisami
+
+# tryb strumieniowy (oglądanie w trakcie pobierania)
+STREAM_TICK = 1.0                       # s – przesuwanie okna deadline'ów
+STREAM_HEAD_BYTES = 16 * 1024 * 1024    # początek pliku, który musi być, żeby Plex wystartował
+STREAM_TAIL_BYTES = 4 * 1024 * 1024     # koniec pliku (indeks mp4 / cues mkv)
+STREAM_WINDOW_BYTES = 64 * 1024 * 1024  # przesuwne okno priorytetu za pierwszym brakującym kawałkiem
+STREAM_DEADLINE_STEP_MS = 250           # kolejne kawałki okna dostają coraz późniejszy deadline
+VIDEO_EXTS = (".mkv", ".mp4", ".m4v", ".avi", ".mov", ".ts", ".wmv", ".webm", ".mpg", ".mpeg")
+STATUS_UPDATE_INTERVAL = 1.0  # co ile sekund prosimy sesję o state_update_alert
+ALERT_WAIT_MAX = 1.0          # s – najdłuższe blokujące czekanie na alert (tick dla post_torrent_updates)
 LISTEN_PORTS = (6881, 6891)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # USTAWIENIA SESJI
 # ─────────────────────────────────────────────────────────────────────────────
+def _alert_mask() -> int:
+    """status (state_update/finished/paused) + storage (resume) + error – bez alertów per-peer."""
+    mask = 0
+    cat = getattr(getattr(lt, "alert", None), "category_t", None)
+    for name in ("status_notification", "storage_notification", "error_notification"):
+        try:
+            mask |= int(getattr(cat, name))
+        except Exception:
+            pass
+    return mask
+
+
 _SETTINGS = {
     "enable_dht": True,
     "enable_lsd": True,
     "enable_upnp": True,
     "enable_natpmp": True,
     "rate_limit_ip_overhead": True,
-    "aio_threads": 8,
-    "checking_mem_usage": 128,
     "allow_multiple_connections_per_ip": True,
     "out_enc_policy": lt.enc_policy.forced,
     "in_enc_policy": lt.enc_policy.forced,
     "prefer_rc4": False,
 }
+if _alert_mask():
+    _SETTINGS["alert_mask"] = _alert_mask()
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Profile wydajności (połączenia, bufory, cache dysku, hashowanie, pula plików)
+# Klucze nieobecne w danej wersji libtorrent (np. cache_size w 2.x) są pomijane
+# i raportowane jako "unsupported".
+# ─────────────────────────────────────────────────────────────────────────────
+_KIB = 1024
+_MIB = 1024 * 1024
+
+PERFORMANCE_PROFILES = {
+    "low-memory-nas": {
+        "label": "NAS z małą ilością RAM",
+        "settings": {
+            "connections_limit": 80,
+            "send_buffer_watermark": 256 * _KIB,
+            "send_buffer_low_watermark": 16 * _KIB,
+            "send_buffer_watermark_factor": 50,
+            "recv_socket_buffer_size": 64 * _KIB,
+            "send_socket_buffer_size": 64 * _KIB,
+            "max_queued_disk_bytes": 512 * _KIB,
+            "cache_size": 256,              # bloki 16 KiB = 4 MiB
+            "cache_expiry": 60,
+            "aio_threads": 2,
+            "hashing_threads": 1,
+            "checking_mem_usage": 32,       # bloki 16 KiB
+            "file_pool_size": 20,
+        },
+    },
+    "balanced": {
+        "label": "Zrównoważony",
+        "settings": {
+            "connections_limit": 200,
+            "send_buffer_watermark": 500 * _KIB,
+            "send_buffer_low_watermark": 10 * _KIB,
+            "send_buffer_watermark_factor": 50,
+            "recv_socket_buffer_size": 0,   # 0 = domyślny systemu
+            "send_socket_buffer_size": 0,
+            "max_queued_disk_bytes": 1 * _MIB,
+            "cache_size": 1024,             # 16 MiB
+            "cache_expiry": 300,
+            "aio_threads": 8,
+            "hashing_threads": 2,
+            "checking_mem_usage": 128,
+            "file_pool_size": 100,
+        },
+    },
+    "high-throughput": {
+        "label": "Wysoka przepustowość",
+        "settings": {
+            "connections_limit": 500,
+            "send_buffer_watermark": 3 * _MIB,
+            "send_buffer_low_watermark": 512 * _KIB,
+            "send_buffer_watermark_factor": 150,
+            "recv_socket_buffer_size": 1 * _MIB,
+            "send_socket_buffer_size": 1 * _MIB,
+            "max_queued_disk_bytes": 8 * _MIB,
+            "cache_size": 4096,             # 64 MiB
+            "cache_expiry": 300,
+            "aio_threads": 16,
+            "hashing_threads": 4,
+            "checking_mem_usage": 256,
+            "file_pool_size": 500,
+        },
+    },
+}
+DEFAULT_PROFILE = "balanced"
+# ustawień, od których zależy działanie klienta, nie zmieniamy przez API; limity prędkości
+# należą do harmonogramu przepustowości, limity aktywnych – do menedżera kolejki
+_LOCKED_SETTINGS = {
+    "alert_mask", "listen_interfaces", "user_agent", "peer_fingerprint",
+    "download_rate_limit", "upload_rate_limit",
+    "active_downloads", "active_seeds", "active_limit", "active_checking",
+}
 
 
 @dataclass
@@ -88,6 +201,9 @@ class TorrentInfo:
     download_payload_rate: int
     eta: int
     download_location: str
+    queue_position: int = -1   # -1 = poza kolejką (seed / nie auto-managed)
+    pinned: bool = False
+    stream: Optional[dict] = None  # gotowość trybu strumieniowego (None = tryb wyłączony)
 
     def as_json(self):
         return asdict(self)
@@ -97,16 +213,59 @@ class TorrentInfo:
 # Historia – prosty plikowy store
 # ─────────────────────────────────────────────────────────────────────────────
 class HistoryStore:
-    def __init__(self, path: str):
+    """
+    Historia zdarzeń torrentów jako JSONL: add() dopisuje jedną linię (bez przepisywania pliku),
+    ostatnie HISTORY_RING wpisów żyje w pamięci, a indeks id „finished” odpowiada na
+    „czy już ukończony” bez skanu. Plik rośnie do HISTORY_MAX_BYTES / HISTORY_MAX_LINES,
+    potem kompaktowanie: zostaje HISTORY_KEEP najnowszych, reszta idzie do archiwów .1 … .N
+    (rotacja). Kolejne kompaktowanie dopiero po HISTORY_KEEP nowych liniach – koszt zapisu
+    zostaje zamortyzowany O(1) na zdarzenie.
+
+    Plik boczny *.jsonl.agg.json: agregaty zarchiwizowanych wpisów + id „finished” wyniesione
+    z aktywnego pliku + numer kompaktowania. Ten sam numer jest w linii-znaczniku na początku
+    aktywnego pliku; kompaktowanie pisze nowy plik do .tmp, potem agg.json, na końcu podmienia
+    plik – po awarii w środku start albo kończy podmianę, albo wyrzuca .tmp, więc żaden wpis
+    nie liczy się w agregatach dwa razy.
+
+    Ścieżka *.json (stary format – jedna lista) => dane w *.jsonl obok, migrowane raz przy starcie.
+    Zapytania i agregaty – HistoryIndex (history_index.py).
+    category_of(ścieżka) -> kategoria dla starych wpisów bez pola "category".
+    """
+
+    def __init__(self, path: str, category_of=None):
+        legacy = None
+        if path.endswith(".json"):
+            legacy, path = path, path[:-5] + ".jsonl"
         self.path = path
+        self._agg_path = path + ".agg.json"
         self._lock = threading.Lock()
-        if not os.path.exists(self.path):
-            self._write([])
-
-    def _read(self) -> List[dict]:
+        self._ring: deque = deque(maxlen=HISTORY_RING)
+        self._finished: Set[str] = set()
+        self._lines = 0
+        self._bytes = 0
+        self._kept_lines = 0     # linie po ostatnim kompaktowaniu
+        self._fh = None
+        self.stats = {"appended": 0, "compactions": 0, "skipped_lines": 0}
+        side = _load_json(self._agg_path, {})
+        if "aggregates" not in side and side:
+            side = {"aggregates": side}  # wcześniejszy format: sam słownik agregatów
+        self._compaction = int(side.get("compaction") or 0)
+        self._seq = int(side.get("seq") or 0)   # trwały numer wpisu (kursor "ts:seq")
+        self._finished.update(str(x) for x in (side.get("finished") or []))
+        self.index = HistoryIndex(category_of, base=side.get("aggregates") or {})
+
+        if legacy and os.path.exists(legacy) and not os.path.exists(self.path):
+            self._migrate_legacy(legacy)
+        self._recover_compaction()
+        self._load()
+        self._kept_lines = self._lines
+
+    # ── odczyt / migracja ───────────────────────────────────────────────────
+    @staticmethod
+    def _read_legacy(path: str) -> List[dict]:
         import json
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 raw = json.load(f)
         except Exception:
             return []
@@ -118,37 +277,241 @@ class HistoryStore:
 
         out: List[dict] = []
         if isinstance(raw, list):
-            import json as _json
             for item in raw:
                 if isinstance(item, dict):
                     out.append(item)
                 elif isinstance(item, str):
                     try:
-                        obj = _json.loads(item)
+                        obj = json.loads(item)
                         if isinstance(obj, dict):
                             out.append(obj)
                     except Exception:
                         pass
         return out
 
-    def _write(self, data: List[dict]):
+    def _migrate_legacy(self, legacy: str):
+        # stary plik zostaje nietknięty – istnienie *.jsonl oznacza, że migracja już była
+        entries = self._read_legacy(legacy)
+        try:
+            self._write_all(self.path, entries)
+        except Exception as e:
+            print(f"⚠️ Historia: migracja {legacy} nieudana: {e}")
+
+    @staticmethod
+    def _marker_of(path: str) -> int:
+        """Numer kompaktowania z pierwszej linii pliku (0 = brak znacznika)."""
         import json
-        with self._lock:
-            tmp = self.path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            os.replace(tmp, self.path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                first = json.loads(f.readline() or "{}")
+            return int(first.get("_compaction") or 0) if isinstance(first, dict) else 0
+        except Exception:
+            return 0
+
+    def _recover_compaction(self):
+        tmp = self.path + ".tmp"
+        if not os.path.exists(tmp):
+            return
+        try:
+            if self._compaction and self._marker_of(tmp) == self._compaction \
+                    and self._marker_of(self.path) != self._compaction:
+                # awaria po zapisie agg.json, przed podmianą pliku – kończymy podmianę
+                os.replace(tmp, self.path)
+            else:
+                # awaria przed zapisem agg.json – stan sprzed kompaktowania jest spójny
+                os.remove(tmp)
+        except Exception as e:
+            print(f"⚠️ Historia: odzyskiwanie po kompaktowaniu nieudane: {e}")
+
+    def _load(self):
+        import json
+        if not os.path.exists(self.path):
+            open(self.path, "a", encoding="utf-8").close()
+        entries, marker = [], None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                self._bytes += len(line.encode("utf-8"))
+                try:
+                    e = json.loads(line)
+                except Exception:
+                    # np. urwana ostatnia linia po awarii zasilania
+                    self.stats["skipped_lines"] += 1
+                    continue
+                if not isinstance(e, dict):
+                    continue
+                if "_compaction" in e:
+                    marker = e
+                    continue
+                entries.append(e)
+        self._seq = max([self._seq] + [int(e.get("seq") or 0) for e in entries])
+        if any(not e.get("seq") for e in entries):
+            # wpisy sprzed numeracji – jednorazowo dostają seq i plik jest przepisany
+            for e in entries:
+                if not e.get("seq"):
+                    self._seq += 1
+                    e["seq"] = self._seq
+            try:
+                self._write_all(self.path, ([marker] if marker else []) + entries)
+            except Exception as ex:
+                print(f"⚠️ Historia: numeracja wpisów nieudana: {ex}")
+        for e in entries:
+            self._remember(e)
+
+    def _remember(self, e: dict):
+        if len(self._ring) == self._ring.maxlen:
+            self.index.drop(self._ring[0])
+        self._ring.append(e)
+        self.index.add(e)
+        if e.get("event") == "finished" and e.get("id"):
+            self._finished.add(e["id"])
+
+    # ── zapis ───────────────────────────────────────────────────────────────
+    @staticmethod
+    def _line(entry: dict) -> str:
+        import json
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _write_all(self, path: str, entries: List[dict], replace: bool = True):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in entries:
+                f.write(self._line(e))
+            f.flush()
+            os.fsync(f.fileno())
+        if replace:
+            os.replace(tmp, path)
+
+    def _save_side(self):
+        _save_json(self._agg_path, {
+            "compaction": self._compaction,
+            "seq": self._seq,
+            "aggregates": self.index.base.to_dict(),
+            "finished": sorted(self._finished),
+        })
+
+    def _append_locked(self, entry: dict):
+        self._seq += 1
+        entry = {**entry, "seq": self._seq}
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        line = self._line(entry)
+        self._fh.write(line)
+        self._fh.flush()
+        self._lines += 1
+        self._bytes += len(line.encode("utf-8"))
+        self._remember(entry)
+        self.stats["appended"] += 1
+        # próg + przyrost od ostatniego kompaktowania – nigdy kompaktowanie przy każdym add()
+        if (self._bytes > HISTORY_MAX_BYTES or self._lines > HISTORY_MAX_LINES) \
+                and self._lines > self._kept_lines + HISTORY_KEEP:
+            self._compact_locked()
 
     def add(self, entry: dict):
-        data = self._read()
-        data.append(entry)
-        self._write(data)
+        with self._lock:
+            self._append_locked(entry)
+
+    def add_finished_once(self, entry: dict) -> bool:
+        """Dopisuje "finished" tylko, jeśli id jeszcze nie ma w indeksie (sprawdzenie + zapis atomowo)."""
+        ih = entry.get("id")
+        with self._lock:
+            if not ih or ih in self._finished:
+                return False
+            self._append_locked({**entry, "event": "finished"})
+            return True
 
+    def _compact_locked(self):
+        import json
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = []
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                        if isinstance(e, dict):
+                            entries.append(e)
+                    except Exception:
+                        pass
+            entries = [e for e in entries if "_compaction" not in e]
+            archive, kept = entries[:-HISTORY_KEEP], entries[-HISTORY_KEEP:]
+            if archive:
+                self._archive(archive)
+            # 1) nowy plik do .tmp, 2) agg.json (agregaty + id „finished” + numer), 3) podmiana
+            self._compaction += 1
+            self._write_all(self.path, [{"_compaction": self._compaction}] + kept, replace=False)
+            self.index.archive(archive)
+            self._save_side()
+            os.replace(self.path + ".tmp", self.path)
+            # pamięć = zawartość pliku, tak jak po restarcie
+            self._ring = deque(kept, maxlen=HISTORY_RING)
+            self.index.reset_items(list(self._ring))
+            self._lines = self._kept_lines = len(kept) + 1
+            self._bytes = sum(len(self._line(e).encode("utf-8")) for e in kept)
+            self.stats["compactions"] += 1
+        except Exception as e:
+            print(f"⚠️ Historia: kompaktowanie nieudane: {e}")
+
+    def _archive(self, entries: List[dict]):
+        first = f"{self.path}.1"
+        if os.path.exists(first) and os.path.getsize(first) > HISTORY_MAX_BYTES:
+            # rotacja: .N-1 -> .N (najstarsze wypada), … , .1 -> .2
+            for i in range(HISTORY_ROTATIONS - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+        with open(first, "a", encoding="utf-8") as f:
+            for e in entries:
+                f.write(self._line(e))
+
+    # ── API ─────────────────────────────────────────────────────────────────
     def get(self) -> List[dict]:
-        return self._read()
+        """Ostatnie wpisy (do HISTORY_RING) w kolejności dopisywania – z pamięci."""
+        with self._lock:
+            return list(self._ring)
+
+    def query(self, **kw) -> dict:
+        """HistoryIndex.query: event / since / until / q / limit / cursor (ValueError przy złym kursorze)."""
+        with self._lock:
+            return self.index.query(**kw)
+
+    def aggregates(self, days: Optional[int] = None) -> dict:
+        with self._lock:
+            return self.index.live.summary(days)
+
+    def has_finished(self, ih: str) -> bool:
+        with self._lock:
+            return ih in self._finished
+
+    def finished_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._finished)
+
+    def flush(self):
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.flush()
+                    os.fsync(self._fh.fileno())
+                except Exception:
+                    pass
 
     def clear(self):
-        self._write([])
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._ring.clear()
+            self._finished.clear()
+            self.index.clear()
+            self._compaction += 1
+            self._write_all(self.path, [{"_compaction": self._compaction}], replace=False)
+            self._save_side()
+            os.replace(self.path + ".tmp", self.path)
+            self._lines = self._kept_lines = 1
+            self._bytes = 0
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -174,6 +537,19 @@ class TorrentClient:
                     setattr(sett, k, v)
             self.ses.apply_settings(sett)
 
+        # profil wydajności – domyślny do czasu apply_profile() z konfiguracji aplikacji
+        self._profile = DEFAULT_PROFILE
+        self._profile_overrides: Dict[str, object] = {}
+        self._profile_unsupported: List[str] = []
+        # wartości sprzed pierwszego dotknięcia przez profil/nadpisanie – przywracane,
+        # gdy klucz wypada z profilu (zmiana profilu, null w nadpisaniach)
+        self._settings_baseline: Dict[str, object] = {}
+        self._profile_applied: Set[str] = set()
+        try:
+            self.apply_profile(DEFAULT_PROFILE)
+        except Exception as e:
+            print(f"⚠️ Profil wydajności: {e}")
+
         # DHT
         try:
             self.ses.add_dht_router("router.bittorrent.com", 6881)
@@ -185,9 +561,60 @@ class TorrentClient:
             pass
 
         self.history: Optional[HistoryStore] = None
-        self._finished_ids: Set[str] = set()   # ID zakończonych (aby nie dublować historii)
         self._name_cache: Dict[str, str] = {}  # stabilna nazwa zanim metadata wróci
 
+        # wspólny migawkowy stan torrentów – aktualizowany z state_update_alert w wątku alertów,
+        # czytelnicy (/status, watchdog, GUI) dostają kopię zamiast wołać h.status() per torrent
+        self._snap_lock = threading.Lock()
+        self._snapshot: Dict[str, TorrentInfo] = {}
+        self._snap_version = 0
+        self._snap_primed = False
+        self._snap_alerts = hasattr(self.ses, "post_torrent_updates") and hasattr(lt, "state_update_alert")
+        self._last_post = 0.0
+        # fn(wersja, {id: TorrentInfo zmienione}, [id usunięte]) – np. kanał push do UI
+        self._snap_listeners: List = []
+
+        # info-hash -> uchwyt (zamiast liniowego skanu ses.get_torrents() przy każdej akcji)
+        self._handles_lock = threading.Lock()
+        self._handles: Dict[str, lt.torrent_handle] = {}
+        # dodane przez async_add_torrent, a jeszcze bez add_torrent_alert (hash -> wszystkie hashe v1/v2)
+        self._adding: Dict[str, tuple] = {}
+
+        # zlecone i jeszcze niepotwierdzone zapisy resume (info-hash) – shutdown czeka tylko na nie
+        self._resume_cond = threading.Condition()
+        self._resume_pending: Set[str] = set()
+        self._save_all_lock = threading.Lock()  # checkpoint i shutdown nie przeplatają się
+        # sha1 ostatnio zapisanych bajtów .fastresume – identyczny bencode => bez przepisywania pliku
+        self._resume_digest: Dict[str, str] = {}
+        self._resume_stats = {
+            "requested": 0,          # zleconych save_resume_data
+            "written": 0,            # zapisanych plików
+            "skipped_unchanged": 0,  # alert przyszedł, ale bajty te same co na dysku
+            "skipped_clean": 0,      # checkpoint pominął torrent bez zmian (need_save_resume)
+            "failed": 0,             # save_resume_data_failed_alert (np. only_if_modified bez zmian)
+        }
+
+        # typ alertu -> handler (zamiast łańcucha isinstance)
+        self._alert_handlers = self._build_alert_handlers()
+
+        # limity przepustowości: globalne / kategorie / per torrent + harmonogram godzinowy
+        self.bandwidth = BandwidthConfig(BANDWIDTH_FILE)
+        self._category_paths: Dict[str, str] = {}
+        self._bw_applied: Dict[str, tuple] = {}  # ih -> (download B/s, upload B/s) ustawione na uchwycie
+        self._bw_session: Optional[tuple] = None
+        self._bw_profile: Optional[str] = None
+        self._bw_wake = threading.Event()
+
+        # kolejka: limity aktywnych + przypięte (zawsze na górze i wymuszony start)
+        self._queue_cfg = _load_json(QUEUE_FILE, {"limits": {}, "pinned": []})
+        self._pinned: List[str] = [str(x) for x in (self._queue_cfg.get("pinned") or [])]
+        self._apply_queue_limits(self._queue_cfg.get("limits") or {})
+
+        # tryb strumieniowy: ih -> stan (plik, zakres kawałków, gotowość); lista id trwała w stream.json
+        self._streams: Dict[str, dict] = {ih: {} for ih in (_load_json(STREAM_FILE, {"ids": []}).get("ids") or [])}
+        self._stream_lock = threading.Lock()
+        self._stream_wake = threading.Event()
+
         # wątki
         self._alerts_thread = threading.Thread(target=self._alerts_loop, daemon=True, name="lt-alerts")
         self._alerts_thread.start()
@@ -195,8 +622,18 @@ class TorrentClient:
         self._checkpoint_thread = threading.Thread(target=self._periodic_resume_checkpoint, daemon=True, name="lt-checkpoint")
         self._checkpoint_thread.start()
 
-        # wznów wszystkie znane torrenty
-        self._load_all_resume()
+        # wznów wszystkie znane torrenty – w tle, sesja od razu przyjmuje wywołania API
+        self._restore = {"total": 0, "queued": 0, "failed": 0, "running": True,
+                         "started": time.time(), "elapsed_ms": None}
+        self._restore_resume: Set[str] = set()  # hashe z resume, które po dodaniu trzeba wznowić
+        self._restore_thread = threading.Thread(target=self._load_all_resume, daemon=True, name="lt-restore")
+        self._restore_thread.start()
+
+        self._bandwidth_thread = threading.Thread(target=self._bandwidth_loop, daemon=True, name="lt-bandwidth")
+        self._bandwidth_thread.start()
+
+        self._stream_thread = threading.Thread(target=self._stream_loop, daemon=True, name="lt-stream")
+        self._stream_thread.start()
 
         # elegancki shutdown
         atexit.register(self.shutdown)
@@ -212,127 +649,330 @@ class TorrentClient:
     # API publiczne
     # ─────────────────────────────────────────────────────────────────────
     def set_history_store(self, store: HistoryStore):
-        """Podpinamy plik historii i ładujemy listę zakończonych ID."""
+        """Podpinamy historię; indeks zakończonych ID trzyma sam HistoryStore."""
         self.history = store
-        try:
-            for e in self.history.get():
-                if isinstance(e, dict) and e.get("event") == "finished" and e.get("id"):
-                    self._finished_ids.add(e["id"])
-        except Exception:
-            pass
 
     def get_history(self) -> List[dict]:
         return self.history.get() if self.history else []
 
     def add_magnet(self, magnet: str, download_path: str) -> Optional[str]:
+        """Dodaje magnet i od razu zwraca info-hash (z URI, bez czekania na sesję)."""
+        return self.add_magnet_ex(magnet, download_path)["id"]
+
+    def add_magnet_ex(self, magnet: str, download_path: str) -> dict:
+        """{"id", "duplicate"} – duplikat wykrywany po hashu v1/v2 sparsowanym z magnetu."""
+        os.makedirs(download_path, exist_ok=True)
+        if not hasattr(lt, "parse_magnet_uri"):
+            return {"id": self._add_magnet_legacy(magnet, download_path), "duplicate": False}
+        params = lt.parse_magnet_uri(magnet)
+        return self._add_params(params, download_path)
+
+    def add_torrent_file(self, data: bytes, download_path: str) -> dict:
+        """Dodaje plik .torrent (bajty); zwraca {"id", "duplicate"} jak add_magnet_ex."""
         os.makedirs(download_path, exist_ok=True)
         params = lt.add_torrent_params()
+        params.ti = lt.torrent_info(lt.bdecode(data))
+        return self._add_params(params, download_path)
+
+    def add_many(self, items: List[dict], download_path: str) -> List[dict]:
+        """
+        Hurtowe dodawanie: items = [{"magnet": str} | {"torrent": bytes, "name": str}].
+        Błąd jednej pozycji nie przerywa reszty – każda dostaje własny wynik.
+        """
+        out = []
+        for it in items:
+            label = it.get("magnet") or it.get("name") or ""
+            try:
+                if it.get("torrent") is not None:
+                    res = self.add_torrent_file(it["torrent"], download_path)
+                else:
+                    res = self.add_magnet_ex(it.get("magnet") or "", download_path)
+                out.append({"input": label, **res})
+            except Exception as e:
+                out.append({"input": label, "id": None, "duplicate": False, "error": str(e)})
+        return out
+
+    def _known_hash(self, hashes) -> Optional[str]:
+        """Pierwszy z hashy, pod którym torrent już jest w sesji (albo właśnie się dodaje)."""
+        with self._handles_lock:
+            for ih in hashes:
+                if ih in self._handles:
+                    return ih
+            for ih, all_hashes in self._adding.items():
+                if set(all_hashes) & set(hashes):
+                    return ih
+        return None
+
+    def _add_params(self, params, download_path: str) -> dict:
+        hashes = _params_info_hashes_hex(params)
+        if not hashes:
+            raise ValueError("Brak info-hash w magnecie / pliku .torrent")
+        ih = hashes[0]
+
+        dup = self._known_hash(hashes)
+        if dup:
+            return {"id": dup, "duplicate": True}
+
         params.save_path = download_path
-        params.url = magnet
         params.flags |= lt.torrent_flags.auto_managed  # start od razu
 
-        h = self.ses.add_torrent(params)
+        # nazwa z dn= / torrent_info zanim przyjdą metadane
+        try:
+            nm = getattr(params, "name", "") or (params.ti.name() if getattr(params, "ti", None) else "")
+            if nm:
+                self._name_cache[ih] = nm
+        except Exception:
+            pass
+
+        with self._handles_lock:
+            self._adding[ih] = tuple(hashes)
+        if hasattr(self.ses, "async_add_torrent"):
+            # uchwyt, wznowienie i pierwszy zapis resume – w _on_add_torrent
+            self.ses.async_add_torrent(params)
+        else:
+            h = self.ses.add_torrent(params)
+            self._after_fresh_add(h, ih)
+        return {"id": ih, "duplicate": False}
+
+    def _after_fresh_add(self, h, ih: str):
+        with self._handles_lock:
+            self._adding.pop(ih, None)
+        self._index_handle(h, ih)
         try:
             h.resume()
         except Exception:
             pass
+        # pierwszy zapis fastresume
+        self._request_resume_save(h, ih)
 
+    def _add_magnet_legacy(self, magnet: str, download_path: str) -> Optional[str]:
+        """Stare bindingi bez parse_magnet_uri: hash dopiero z uchwytu (czekamy do ~5 s)."""
+        params = lt.add_torrent_params()
+        params.save_path = download_path
+        params.url = magnet
+        params.flags |= lt.torrent_flags.auto_managed  # start od razu
+
+        h = self.ses.add_torrent(params)
         ih = _handle_info_hash_hex(h)
         for _ in range(50):  # do ~5s na nadanie hash
             if ih:
                 break
             time.sleep(0.1)
             ih = _handle_info_hash_hex(h)
+        if ih:
+            self._after_fresh_add(h, ih)
+        return ih
 
-        # cache wstępnej nazwy (jeśli libtorrent cokolwiek zwraca)
-        try:
-            nm = (h.name() if hasattr(h, "name") else "") or ""
-            if nm and ih:
-                self._name_cache[ih] = nm
-        except Exception:
-            pass
+    def get_torrents(self) -> Dict[str, TorrentInfo]:
+        """Kopia migawki stanu (bez h.status() per wywołanie – patrz _apply_status_updates)."""
+        return self.status_snapshot()[1]
 
-        # pierwszy zapis fastresume
-        try:
-            h.save_resume_data(lt.torrent_handle.save_info_dict)
-        except Exception:
-            pass
+    def get_torrents_queued(self) -> List[TorrentInfo]:
+        """Migawka w kolejności kolejki: przypięte, potem wg queue_position, na końcu spoza kolejki."""
+        pins = {ih: i for i, ih in enumerate(self._pinned)}
 
-        return ih
+        def key(t: TorrentInfo):
+            return (0 if t.id in pins else 1, pins.get(t.id, 0),
+                    t.queue_position < 0, t.queue_position, t.name.lower())
 
-    def get_torrents(self) -> Dict[str, TorrentInfo]:
-        result: Dict[str, TorrentInfo] = {}
+        return sorted(self.get_torrents().values(), key=key)
 
-        for h in self.ses.get_torrents():
-            ih = _handle_info_hash_hex(h)
-            if not ih:
-                continue
+    def status_snapshot(self) -> tuple:
+        """(wersja, {id: TorrentInfo}) – wersja rośnie przy każdej zmianie migawki."""
+        if not self._snap_alerts or not self._snap_primed:
+            # pierwszy odczyt albo binding bez post_torrent_updates – pełny skan
+            self._prime_snapshot()
+        with self._snap_lock:
+            return self._snap_version, dict(self._snapshot)
 
-            st = h.status()
+    def add_snapshot_listener(self, fn):
+        """fn(wersja, zmienione, usunięte) po każdej zmianie migawki – wołane poza blokadą, ma być szybkie."""
+        self._snap_listeners.append(fn)
+
+    def _notify_snapshot(self, version: int, changed: Dict[str, TorrentInfo], removed: List[str]):
+        for fn in list(self._snap_listeners):
+            try:
+                fn(version, changed, removed)
+            except Exception:
+                pass
 
-            # nazwa – zawsze zwróć niepustą
-            name = (getattr(st, "name", "") or "").strip()
-            if not name:
+    def request_status_update(self):
+        """Świeży state_update_alert od razu (np. po pauzie/wznowieniu) – wybudza wait_for_alert."""
+        if not self._snap_alerts:
+            return
+        try:
+            self.ses.post_torrent_updates()
+        except Exception:
+            pass
+
+    def _info_from_status(self, h, st, ih: Optional[str] = None) -> Optional[TorrentInfo]:
+        ih = ih or _handle_info_hash_hex(h)
+        if not ih:
+            return None
+
+        # nazwa – zawsze zwróć niepustą
+        name = (getattr(st, "name", "") or "").strip()
+        if not name:
+            try:
+                name = getattr(h, "name", lambda: "")() or ""
+            except Exception:
+                name = ""
+        if not name:
+            name = self._name_cache.get(ih, "")
+        if not name:
+            name = ih  # ostateczny fallback – nigdy nie zwrócimy ""
+
+        # zapamiętaj gdy już się pojawi
+        if name and ih not in self._name_cache and name != ih:
+            self._name_cache[ih] = name
+
+        progress = round(float(getattr(st, "progress", 0.0) or 0.0) * 100, 1)
+        rate = int(getattr(st, "download_payload_rate", 0) or 0)
+        eta = _calc_eta(st)
+        state = _map_state(st) or "Unknown"
+        save_path = getattr(st, "save_path", "") or ""
+
+        # Auto-pauza + historia (awaryjnie także tutaj)
+        if progress >= 100.0:
+            if not _status_is_paused(st):
                 try:
-                    name = getattr(h, "name", lambda: "")() or ""
+                    h.pause()
+                    state = "Paused"
+                    self._request_resume_save(h, ih)
                 except Exception:
-                    name = ""
-            if not name:
-                name = self._name_cache.get(ih, "")
-            if not name:
-                name = ih  # ostateczny fallback – nigdy nie zwrócimy ""
-
-            # zapamiętaj gdy już się pojawi
-            if name and ih not in self._name_cache and name != ih:
-                self._name_cache[ih] = name
-
-            progress = round(float(getattr(st, "progress", 0.0) or 0.0) * 100, 1)
-            rate = int(getattr(st, "download_payload_rate", 0) or 0)
-            eta = _calc_eta(st)
-            state = _map_state(st) or "Unknown"
-            save_path = getattr(st, "save_path", "") or ""
-
-            # Auto-pauza + historia (awaryjnie także tutaj)
-            if progress >= 100.0:
-                if not _status_is_paused(st):
-                    try:
-                        h.pause()
-                        state = "Paused"
-                        try:
-                            h.save_resume_data(lt.torrent_handle.save_info_dict)
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
-                self._maybe_log_finished(ih, name, save_path)
-
-            result[ih] = TorrentInfo(
-                id=ih,
-                name=name,
-                progress=progress,
-                state=state,
-                download_payload_rate=rate,
-                eta=eta,
-                download_location=save_path,
-            )
+                    pass
+            self._maybe_log_finished(ih, name, save_path, st)
 
-        return result
+        try:
+            qpos = int(getattr(st, "queue_position", -1))
+        except Exception:
+            qpos = -1
+
+        return TorrentInfo(
+            id=ih,
+            name=name,
+            progress=progress,
+            state=state,
+            download_payload_rate=rate,
+            eta=eta,
+            download_location=save_path,
+            queue_position=qpos,
+            pinned=ih in self._pinned,
+            stream=self._stream_readiness(ih),
+        )
+
+    def _prime_snapshot(self):
+        """Pełny skan sesji -> nowa migawka (start i fallback dla starych bindingów)."""
+        fresh: Dict[str, TorrentInfo] = {}
+        for h in self.ses.get_torrents():
+            try:
+                info = self._info_from_status(h, h.status())
+            except Exception:
+                info = None
+            if info:
+                fresh[info.id] = info
+        with self._snap_lock:
+            changed = {ih: i for ih, i in fresh.items() if self._snapshot.get(ih) != i}
+            removed = [ih for ih in self._snapshot if ih not in fresh]
+            if changed or removed:
+                self._snap_version += 1
+            self._snapshot = fresh
+            self._snap_primed = True
+            version = self._snap_version
+        if changed or removed:
+            self._notify_snapshot(version, changed, removed)
+
+    def _apply_status_updates(self, statuses) -> int:
+        """state_update_alert niesie tylko torrenty zmienione od ostatniego posta."""
+        changed = {}
+        for st in statuses or []:
+            try:
+                h = getattr(st, "handle", None)
+                info = self._info_from_status(h, st) if h is not None else None
+            except Exception:
+                info = None
+            if info:
+                changed[info.id] = info
+        if not changed:
+            return 0
+        with self._snap_lock:
+            for ih, info in list(changed.items()):
+                if self._snapshot.get(ih) != info:
+                    self._snapshot[ih] = info
+                else:
+                    del changed[ih]
+            if changed:
+                self._snap_version += 1
+            version = self._snap_version
+        if changed:
+            self._notify_snapshot(version, changed, [])
+        return len(changed)
+
+    def _snapshot_drop(self, ih: Optional[str]):
+        if not ih:
+            return
+        with self._snap_lock:
+            if self._snapshot.pop(ih, None) is None:
+                return
+            self._snap_version += 1
+            version = self._snap_version
+        self._notify_snapshot(version, {}, [ih])
+
+    def _maybe_post_updates(self) -> float:
+        """Post co STATUS_UPDATE_INTERVAL; zwraca ile sekund zostało do następnego."""
+        if not self._snap_alerts:
+            return ALERT_WAIT_MAX
+        now = time.time()
+        left = STATUS_UPDATE_INTERVAL - (now - self._last_post)
+        if left <= 0:
+            self._last_post = now
+            try:
+                self.ses.post_torrent_updates()
+            except Exception:
+                pass
+            left = STATUS_UPDATE_INTERVAL
+        return left
 
     def get_torrent(self, torrent_id: str) -> Optional[lt.torrent_handle]:
+        """O(1) z indeksu; przy chybieniu (np. alert jeszcze nie dotarł) – jednorazowy pełny skan."""
+        if not torrent_id:
+            return None
+        with self._handles_lock:
+            h = self._handles.get(torrent_id)
+        if h is not None and _handle_is_valid(h):
+            return h
+        self._rescan_handles()
+        with self._handles_lock:
+            return self._handles.get(torrent_id)
+
+    def _index_handle(self, h, ih: Optional[str] = None) -> Optional[str]:
+        ih = ih or _handle_info_hash_hex(h)
+        if ih:
+            with self._handles_lock:
+                self._handles[ih] = h
+        return ih
+
+    def _unindex_handle(self, ih: Optional[str]):
+        if ih:
+            with self._handles_lock:
+                self._handles.pop(ih, None)
+
+    def _rescan_handles(self):
+        fresh = {}
         for h in self.ses.get_torrents():
-            if _handle_info_hash_hex(h) == torrent_id:
-                return h
-        return None
+            ih = _handle_info_hash_hex(h)
+            if ih:
+                fresh[ih] = h
+        with self._handles_lock:
+            self._handles = fresh
 
     def pause(self, torrent_id: str) -> bool:
         h = self.get_torrent(torrent_id)
         if not h:
             return False
         h.pause()
-        try:
-            h.save_resume_data(lt.torrent_handle.save_info_dict)
-        except Exception:
-            pass
+        self._request_resume_save(h, torrent_id)
+        self.request_status_update()
         return True
 
     def resume(self, torrent_id: str) -> bool:
@@ -340,6 +980,7 @@ class TorrentClient:
         if not h:
             return False
         h.resume()
+        self.request_status_update()
         return True
 
     def remove(self, torrent_id: str, remove_data: bool = False) -> bool:
@@ -348,53 +989,576 @@ class TorrentClient:
             return False
         flags = lt.options_t.delete_files if remove_data else lt.options_t.none
         self._delete_resume_file(torrent_id)
+        self._resume_digest.pop(torrent_id, None)
+        self.bandwidth.forget_torrent(torrent_id)
+        self._bw_applied.pop(torrent_id, None)
+        if torrent_id in self._pinned:
+            self._pinned.remove(torrent_id)
+            self._save_queue_cfg()
+        if self._streams.pop(torrent_id, None) is not None:
+            self._save_streams()
         self.ses.remove_torrent(h, flags)
+        self._unindex_handle(torrent_id)
+        self._snapshot_drop(torrent_id)
         return True
 
-    def set_global_download_limit(self, kib_per_sec: int):
-        # KiB/s -> B/s, <=0 oznacza brak limitu
-        bps = 0 if (kib_per_sec is None or kib_per_sec <= 0) else int(kib_per_sec * 1024)
+    # ─────────────────────────────────────────────────────────────────────
+    # Kolejka
+    # ─────────────────────────────────────────────────────────────────────
+    QUEUE_LIMIT_KEYS = ("active_downloads", "active_seeds", "active_limit", "active_checking")
 
-        # 1) jeśli sesja ma prostą metodę - użyj jej (działa w wielu wersjach)
-        if hasattr(self.ses, "set_download_rate_limit"):
+    def queue_move(self, torrent_id: str, where: str) -> bool:
+        """where: top / up / down / bottom."""
+        h = self.get_torrent(torrent_id)
+        fn = getattr(h, {"top": "queue_position_top", "up": "queue_position_up",
+                         "down": "queue_position_down", "bottom": "queue_position_bottom"}.get(where, ""), None) \
+            if h is not None else None
+        if fn is None:
+            return False
+        fn()
+        if where in ("down", "bottom"):
+            self._enforce_pins()
+        self.request_status_update()
+        return True
+
+    def set_queue_limits(self, limits: dict) -> dict:
+        """{"active_downloads": n, ...}; -1 = bez limitu. ValueError przy złych kluczach/wartościach."""
+        clean = {}
+        for k, v in (limits or {}).items():
+            if k not in self.QUEUE_LIMIT_KEYS:
+                raise ValueError(f"Nieznany limit kolejki: {k}")
+            try:
+                v = int(v)
+            except Exception:
+                raise ValueError(f"{k}: oczekiwano liczby")
+            if v < -1:
+                raise ValueError(f"{k}: -1 (bez limitu) albo >= 0")
+            clean[k] = v
+        self._queue_cfg.setdefault("limits", {}).update(clean)
+        self._apply_queue_limits(clean)
+        self._save_queue_cfg()
+        return self.queue_status()
+
+    def pin(self, torrent_id: str, pinned: bool = True) -> bool:
+        """
+        Przypięty torrent: zawsze na szczycie kolejki i wyjęty spod auto-managera
+        (startuje mimo limitów aktywnych). Odpięcie oddaje go kolejce.
+        """
+        h = self.get_torrent(torrent_id)
+        if h is None:
+            return False
+        if pinned and torrent_id not in self._pinned:
+            self._pinned.insert(0, torrent_id)
+        elif not pinned and torrent_id in self._pinned:
+            self._pinned.remove(torrent_id)
+        _set_auto_managed(h, not pinned)
+        if pinned:
+            try:
+                h.resume()
+            except Exception:
+                pass
+        self._save_queue_cfg()
+        self._enforce_pins()
+        # flaga "pinned" w migawce – wymuszamy przeliczenie wpisu
+        try:
+            self._apply_status_updates([h.status()])
+        except Exception:
+            pass
+        self.request_status_update()
+        return True
+
+    def queue_status(self) -> dict:
+        effective = {}
+        for k in self.QUEUE_LIMIT_KEYS:
+            v = self._get_session_int(k)
+            if v is not None:
+                effective[k] = v
+        return {
+            "limits": effective,
+            "pinned": list(self._pinned),
+            "order": [t.id for t in self.get_torrents_queued()],
+        }
+
+    def _enforce_pins(self):
+        # od końca, żeby pierwszy przypięty skończył na samej górze
+        for ih in reversed(self._pinned):
+            h = self.get_torrent(ih)
+            if h is not None:
+                try:
+                    h.queue_position_top()
+                except Exception:
+                    pass
+
+    def _apply_queue_limits(self, limits: dict):
+        for k, v in (limits or {}).items():
+            if k in self.QUEUE_LIMIT_KEYS:
+                self._set_session_int(k, int(v))
+
+    def _save_queue_cfg(self):
+        self._queue_cfg["pinned"] = list(self._pinned)
+        _save_json(QUEUE_FILE, self._queue_cfg)
+
+    def _get_session_int(self, name: str) -> Optional[int]:
+        try:
+            sett = self.ses.get_settings()
+            v = sett.get(name) if isinstance(sett, dict) else getattr(sett, name, None)
+            return int(v) if v is not None else None
+        except Exception:
+            return None
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Tryb strumieniowy
+    # ─────────────────────────────────────────────────────────────────────
+    def set_stream_mode(self, torrent_id: str, enabled: bool = True) -> bool:
+        """
+        Włącza/wyłącza tryb strumieniowy: sekwencyjne pobieranie, deadline na początek
+        i koniec największego pliku wideo oraz przesuwne okno deadline'ów za pierwszym
+        brakującym kawałkiem. Bez metadanych – konfiguracja czeka na metadata_received_alert.
+        """
+        h = self.get_torrent(torrent_id)
+        if h is None:
+            return False
+        with self._stream_lock:
+            if enabled:
+                self._streams.setdefault(torrent_id, {})
+            else:
+                self._streams.pop(torrent_id, None)
+        if enabled:
+            try:
+                h.resume()
+            except Exception:
+                pass
+            self._stream_setup(torrent_id, h)
+        else:
+            _set_sequential(h, False)
+            try:
+                h.clear_piece_deadlines()
+            except Exception:
+                pass
+        self._save_streams()
+        self._refresh_snapshot_entry(h)
+        self._stream_wake.set()
+        return True
+
+    def stream_status(self, torrent_id: str) -> Optional[dict]:
+        return self._stream_readiness(torrent_id)
+
+    def _save_streams(self):
+        with self._stream_lock:
+            ids = list(self._streams)
+        _save_json(STREAM_FILE, {"ids": ids})
+
+    def _refresh_snapshot_entry(self, h):
+        try:
+            self._apply_status_updates([h.status()])
+        except Exception:
+            pass
+
+    def _stream_setup(self, ih: str, h) -> bool:
+        """Wybór pliku i zakresu kawałków (wymaga metadanych)."""
+        ti = _torrent_file(h)
+        if ti is None:
+            return False
+        try:
+            fs = ti.files()
+            n = fs.num_files()
+            files = [(fs.file_size(i), fs.file_path(i), i) for i in range(n)]
+            videos = [f for f in files if f[1].lower().endswith(VIDEO_EXTS)] or files
+            size, path, idx = max(videos)
+            if size <= 0:
+                return False
+            first = ti.map_file(idx, 0, 1)
+            last = ti.map_file(idx, size - 1, 1)
+            plen = ti.piece_length()
+        except Exception:
+            return False
+
+        st = {
+            "file": os.path.basename(path),
+            "file_index": idx,
+            "file_size": int(size),
+            "first_piece": int(first.piece),
+            "first_offset": int(first.start),  # początek pliku w pierwszym kawałku
+            "last_piece": int(last.piece),
+            "piece_length": int(plen),
+            "contiguous_to": int(first.piece),  # pierwszy kawałek jeszcze nieposiadany
+        }
+        _set_sequential(h, True)
+        # koniec pliku – od razu, z tym samym priorytetem co sam początek
+        tail = max(1, -(-STREAM_TAIL_BYTES // plen))
+        for p in range(max(st["first_piece"], st["last_piece"] - tail + 1), st["last_piece"] + 1):
+            try:
+                h.set_piece_deadline(p, 0)
+            except Exception:
+                pass
+        with self._stream_lock:
+            if ih in self._streams:
+                self._streams[ih] = st
+        self._stream_tick(ih, h)
+        return True
+
+    def _stream_tick(self, ih: str, h):
+        """Przesuwa okno: deadline'y na kolejne kawałki za pierwszym brakującym; liczy gotowość."""
+        with self._stream_lock:
+            st = dict(self._streams.get(ih) or {})
+        if not st:
+            if self._streams.get(ih) == {}:
+                self._stream_setup(ih, h)  # metadane mogły już dojść
+            return
+        first, last, plen = st["first_piece"], st["last_piece"], st["piece_length"]
+
+        # ciągłość od początku pliku – kawałki nie znikają, więc skanujemy od ostatniej granicy
+        p = st["contiguous_to"]
+        try:
+            while p <= last and h.have_piece(p):
+                p += 1
+        except Exception:
+            pass
+
+        window = max(1, -(-STREAM_WINDOW_BYTES // plen))
+        for i, q in enumerate(range(p, min(last + 1, p + window))):
             try:
-                self.ses.set_download_rate_limit(bps)
+                h.set_piece_deadline(q, i * STREAM_DEADLINE_STEP_MS)
+            except Exception:
+                break
+
+        tail = max(1, -(-STREAM_TAIL_BYTES // plen))
+        try:
+            tail_ready = all(h.have_piece(q) for q in range(max(first, last - tail + 1), last + 1))
+        except Exception:
+            tail_ready = False
+        ready = 0 if p == first else min(st["file_size"], (p - first) * plen - st["first_offset"])
+
+        st["contiguous_to"] = p
+        st["ready_bytes"] = int(max(0, ready))
+        st["tail_ready"] = bool(tail_ready)
+        with self._stream_lock:
+            if ih in self._streams:
+                self._streams[ih] = st
+        if p > last:
+            # cały plik jest – okno niepotrzebne
+            try:
+                h.clear_piece_deadlines()
             except Exception:
                 pass
+
+    def _stream_readiness(self, ih: str) -> Optional[dict]:
+        with self._stream_lock:
+            if ih not in self._streams:
+                return None
+            st = self._streams[ih]
+        if not st or "ready_bytes" not in st:
+            return {"enabled": True, "file": st.get("file") if st else None, "ready_bytes": 0,
+                    "file_size": st.get("file_size", 0) if st else 0, "ready_pct": 0.0,
+                    "tail_ready": False, "playable": False}
+        size = max(1, st["file_size"])
+        return {
+            "enabled": True,
+            "file": st["file"],
+            "ready_bytes": st["ready_bytes"],
+            "file_size": st["file_size"],
+            "ready_pct": round(st["ready_bytes"] * 100.0 / size, 1),
+            "tail_ready": st["tail_ready"],
+            # Plex potrzebuje początku (nagłówek + pierwsze minuty) i końca (indeks)
+            "playable": st["tail_ready"] and (st["ready_bytes"] >= min(STREAM_HEAD_BYTES, st["file_size"])),
+        }
+
+    def _stream_loop(self):
+        while True:
+            with self._stream_lock:
+                ids = list(self._streams)
+            if not ids:
+                self._stream_wake.wait()
+                self._stream_wake.clear()
+                continue
+            stale = []
+            for ih in ids:
+                h = self.get_torrent(ih)
+                if h is None:
+                    # przy starcie uchwyt może jeszcze czekać na przywrócenie z resume
+                    if not self._restore_thread.is_alive() and ih not in self._restore_resume:
+                        stale.append(ih)
+                    continue
+                try:
+                    done = bool(h.status().is_finished)
+                except Exception:
+                    done = False
+                if done:
+                    stale.append(ih)
+                    try:
+                        h.clear_piece_deadlines()
+                    except Exception:
+                        pass
+                    continue
+                before = self._stream_readiness(ih)
+                try:
+                    self._stream_tick(ih, h)
+                except Exception:
+                    pass
+                if self._stream_readiness(ih) != before:
+                    self._refresh_snapshot_entry(h)
+            if stale:
+                # usunięte / ukończone – nie budzimy się co STREAM_TICK dla nich
+                with self._stream_lock:
+                    for ih in stale:
+                        self._streams.pop(ih, None)
+                self._save_streams()
+                for ih in stale:
+                    h = self.get_torrent(ih)
+                    if h is not None:
+                        self._refresh_snapshot_entry(h)
+            self._stream_wake.wait(STREAM_TICK)
+            self._stream_wake.clear()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Profile wydajności / ustawienia sesji w locie
+    # ─────────────────────────────────────────────────────────────────────
+    def _session_settings(self) -> dict:
+        try:
+            sett = self.ses.get_settings()
+        except Exception:
+            return {}
+        if isinstance(sett, dict):
+            return sett
+        return {k: getattr(sett, k) for k in dir(sett) if not k.startswith("_")
+                and isinstance(getattr(sett, k, None), (bool, int, str))}
+
+    def validate_settings(self, settings: dict) -> dict:
+        """
+        Sprawdza nazwy i typy względem ustawień bieżącej sesji (czyli tej wersji libtorrent).
+        Zwraca oczyszczony słownik; błąd => ValueError z listą problemów, nic nie jest stosowane.
+        """
+        if not isinstance(settings, dict):
+            raise ValueError("settings: oczekiwano obiektu {nazwa: wartość}")
+        current = self._session_settings()
+        clean, errors = {}, []
+        for k, v in settings.items():
+            if k in _LOCKED_SETTINGS:
+                errors.append(f"{k}: ustawienie zablokowane")
+                continue
+            if k not in current:
+                errors.append(f"{k}: nieznane ustawienie w tej wersji libtorrent")
+                continue
+            cur = current[k]
+            if isinstance(cur, bool):
+                if not isinstance(v, bool):
+                    errors.append(f"{k}: oczekiwano true/false")
+                    continue
+            elif isinstance(cur, int):
+                if isinstance(v, bool) or not isinstance(v, int):
+                    errors.append(f"{k}: oczekiwano liczby całkowitej")
+                    continue
+                if v < -1:
+                    errors.append(f"{k}: wartość < -1")
+                    continue
+            elif isinstance(cur, str):
+                if not isinstance(v, str):
+                    errors.append(f"{k}: oczekiwano tekstu")
+                    continue
+            clean[k] = v
+        if errors:
+            raise ValueError("; ".join(errors))
+        return clean
+
+    def _apply_session_settings(self, settings: dict):
+        if not settings:
+            return
+        sett = self.ses.get_settings()
+        if isinstance(sett, dict):
+            # settings_pack z samymi zmienianymi kluczami – reszta sesji bez zmian
+            self.ses.apply_settings(dict(settings))
         else:
-            # 2) w przeciwnym razie aktualizuj settings (obsługa dict i settings_pack)
+            for k, v in settings.items():
+                if hasattr(sett, k):
+                    setattr(sett, k, v)
+            self.ses.apply_settings(sett)
+
+    def apply_profile(self, name: str, overrides: Optional[dict] = None) -> dict:
+        """
+        Profil + ręczne nadpisania. Nadpisania są walidowane (ValueError), klucze profilu
+        nieznane tej wersji libtorrent są tylko pomijane i raportowane.
+        """
+        if name not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Nieznany profil: {name} (dostępne: {', '.join(PERFORMANCE_PROFILES)})")
+        overrides = self.validate_settings(overrides or {})
+        current = self._session_settings()
+        base = PERFORMANCE_PROFILES[name]["settings"]
+        want = {k: v for k, v in base.items() if k in current}
+        want.update(overrides)
+        active = set(want)
+        for k in active:
+            if k not in self._settings_baseline:
+                self._settings_baseline[k] = current[k]
+        # klucze poprzedniego profilu / usuniętych nadpisań wracają do wartości bazowej
+        for k in self._profile_applied - active:
+            if k in self._settings_baseline:
+                want[k] = self._settings_baseline[k]
+        self._apply_session_settings(want)
+        self._profile_applied = active
+        self._profile = name
+        self._profile_overrides = overrides
+        self._profile_unsupported = sorted(k for k in base if k not in current)
+        return self.performance_status()
+
+    def update_settings(self, settings: dict) -> dict:
+        """Nadpisania na bieżącym profilu (scalane z poprzednimi); null usuwa nadpisanie."""
+        if not isinstance(settings, dict):
+            raise ValueError("settings: oczekiwano obiektu {nazwa: wartość}")
+        merged = dict(self._profile_overrides)
+        for k, v in settings.items():
+            if v is None:
+                merged.pop(k, None)
+            else:
+                merged[k] = v
+        return self.apply_profile(self._profile, merged)
+
+    def performance_status(self) -> dict:
+        """Profil, nadpisania i wartości faktycznie obowiązujące w sesji (odczytane z powrotem)."""
+        current = self._session_settings()
+        keys = set(PERFORMANCE_PROFILES[self._profile]["settings"]) | set(self._profile_overrides)
+        return {
+            "profile": self._profile,
+            "profiles": {n: {"label": p["label"], "settings": dict(p["settings"])}
+                         for n, p in PERFORMANCE_PROFILES.items()},
+            "overrides": dict(self._profile_overrides),
+            "effective": {k: current[k] for k in sorted(keys) if k in current},
+            "unsupported": list(self._profile_unsupported),
+        }
+
+    def set_global_download_limit(self, kib_per_sec: int):
+        """Bazowy globalny limit pobierania (KiB/s, <=0 = brak) – trwały, harmonogram może go nadpisać."""
+        kib = 0 if (kib_per_sec is None or kib_per_sec <= 0) else int(kib_per_sec)
+        self.bandwidth.update({"global": {"download": kib}})
+        self.apply_bandwidth()
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Przepustowość – kategorie, per torrent, harmonogram
+    # ─────────────────────────────────────────────────────────────────────
+    def set_category_paths(self, paths: Dict[str, str]):
+        """{"movies": katalog, "series": katalog} – kategoria torrenta wg jego save_path."""
+        self._category_paths = {
+            c: os.path.normcase(os.path.abspath(p)) for c, p in (paths or {}).items() if c in CATEGORIES and p
+        }
+        self._bw_wake.set()
+
+    def set_torrent_limit(self, torrent_id: str, download_kib: Optional[int], upload_kib: Optional[int]):
+        """Limit jednego torrenta (KiB/s, 0/None = brak); łączony z limitem kategorii (ostrzejszy wygrywa)."""
+        self.bandwidth.set_torrent(torrent_id, download_kib, upload_kib)
+        self.apply_bandwidth()
+
+    def update_bandwidth(self, patch: dict):
+        """Walidacja (ValueError) + zapis + natychmiastowe zastosowanie."""
+        self.bandwidth.update(patch)
+        self.apply_bandwidth()
+
+    def bandwidth_status(self) -> dict:
+        eff = self.bandwidth.effective()
+        return {
+            "config": self.bandwidth.snapshot(),
+            "effective": eff,
+            "applied": {ih: {"download": d // 1024, "upload": u // 1024} for ih, (d, u) in self._bw_applied.items()},
+        }
+
+    def category_of(self, save_path: str) -> Optional[str]:
+        if not save_path:
+            return None
+        sp = os.path.normcase(os.path.abspath(save_path))
+        for c, root in self._category_paths.items():
+            if sp == root or sp.startswith(root.rstrip(os.sep) + os.sep):
+                return c
+        return None
+
+    def _set_session_int(self, name: str, bps: int):
+        """Ustawienie int sesji (np. download_rate_limit) – różne API zależnie od wersji bindingów."""
+        # 1) jeśli sesja ma prostą metodę - użyj jej (działa w wielu wersjach)
+        simple = getattr(self.ses, "set_" + name, None)
+        if simple is not None:
             try:
-                sett = self.ses.get_settings()
-                if isinstance(sett, dict):
-                    sett["download_rate_limit"] = bps
+                simple(bps)
+                return
+            except Exception:
+                pass
+        # 2) w przeciwnym razie aktualizuj settings (obsługa dict i settings_pack)
+        try:
+            sett = self.ses.get_settings()
+            if isinstance(sett, dict):
+                sett[name] = bps
+                self.ses.apply_settings(sett)
+            else:
+                try:
+                    # część bindingów pozwala na atrybut
+                    setattr(sett, name, bps)
                     self.ses.apply_settings(sett)
-                else:
+                except Exception:
+                    # a część wymaga nowego settings_pack i set_int()
                     try:
-                        # część bindingów pozwala na atrybut
-                        setattr(sett, "download_rate_limit", bps)
-                        self.ses.apply_settings(sett)
+                        sp = lt.settings_pack()
+                        if hasattr(sp, "set_int") and hasattr(lt.settings_pack, name):
+                            sp.set_int(getattr(lt.settings_pack, name), bps)
+                        else:
+                            setattr(sp, name, bps)
+                        self.ses.apply_settings(sp)
                     except Exception:
-                        # a część wymaga nowego settings_pack i set_int()
-                        try:
-                            sp = lt.settings_pack()
-                            # jeśli dostępne set_int + stała:
-                            if hasattr(sp, "set_int") and hasattr(lt.settings_pack, "download_rate_limit"):
-                                sp.set_int(lt.settings_pack.download_rate_limit, bps)
-                            else:
-                                # fallback: przypisanie atrybutu
-                                sp.download_rate_limit = bps
-                            self.ses.apply_settings(sp)
-                        except Exception:
-                            pass
+                        pass
+        except Exception:
+            pass
+
+    def apply_bandwidth(self):
+        """
+        Liczy limity „na teraz” i ustawia je na sesji oraz uchwytach (tylko gdy się zmieniły).
+        Limit kategorii dzielimy po równo między jej aktywne torrenty – peer classes
+        w libtorrent przypisuje się po IP/typie gniazda, nie po torrencie.
+        """
+        eff = self.bandwidth.effective()
+        g = eff["global"]
+        session = (int(g["download"]) * 1024, int(g["upload"]) * 1024)
+        if session != self._bw_session:
+            self._set_session_int("download_rate_limit", session[0])
+            self._set_session_int("upload_rate_limit", session[1])
+            self._bw_session = session
+        if eff["profile"] != self._bw_profile:
+            print(f"📶 Profil przepustowości: {eff['profile'] or 'bazowy'}")
+            self._bw_profile = eff["profile"]
+
+        torrents = self.get_torrents()
+        cat_of = {ih: self.category_of(t.download_location) for ih, t in torrents.items()}
+        active_dl: Dict[str, int] = {}
+        active_ul: Dict[str, int] = {}
+        for ih, t in torrents.items():
+            c = cat_of[ih]
+            if c and t.state != "Paused":
+                active_ul[c] = active_ul.get(c, 0) + 1
+                if t.state not in ("Seeding",):
+                    active_dl[c] = active_dl.get(c, 0) + 1
+
+        for ih, t in torrents.items():
+            c = cat_of[ih]
+            cat = eff["categories"].get(c) or {} if c else {}
+            own = eff["torrents"].get(ih) or {}
+            dl = combine(int(own.get("download", 0)), split_category_limit(int(cat.get("download", 0)), active_dl.get(c, 0)))
+            ul = combine(int(own.get("upload", 0)), split_category_limit(int(cat.get("upload", 0)), active_ul.get(c, 0)))
+            want = (dl * 1024, ul * 1024)
+            # nieznany uchwyt ustawiamy zawsze raz – resume mógł przynieść stary limit per torrent
+            if self._bw_applied.get(ih) == want:
+                continue
+            h = self.get_torrent(ih)
+            if h is None:
+                continue
+            try:
+                h.set_download_limit(want[0])  # 0 == bez limitu
+                h.set_upload_limit(want[1])
+                self._bw_applied[ih] = want
             except Exception:
                 pass
 
-        # 3) opcjonalnie per-torrent (żeby natychmiast zadziałało na istniejących handle’ach)
-        for h in self.ses.get_torrents():
+    def _bandwidth_loop(self):
+        while True:
             try:
-                h.set_download_limit(bps)  # 0 == bez limitu
+                self.apply_bandwidth()
             except Exception:
                 pass
+            self._bw_wake.wait(BANDWIDTH_TICK)
+            self._bw_wake.clear()
 
     # ─────────────────────────────────────────────────────────────────────
     # Zamknięcie – flush wszystkiego
@@ -430,58 +1594,166 @@ class TorrentClient:
         except Exception:
             pass
 
-    def _load_all_resume(self):
-        files = [f for f in os.listdir(RESUME_DIR) if f.endswith(".fastresume")]
-        loaded = 0
-        for fname in files:
-            fpath = os.path.join(RESUME_DIR, fname)
+    def restore_status(self) -> dict:
+        """Postęp przywracania torrentów z resume (start aplikacji)."""
+        out = dict(self._restore)
+        out["pending_add"] = len(self._restore_resume)
+        if out["running"]:
+            out["elapsed_ms"] = int((time.time() - out["started"]) * 1000)
+        return out
+
+    def _read_resume_file(self, fname: str):
+        """(ih, params, bajty) albo None – wołane równolegle z puli wątków."""
+        fpath = os.path.join(RESUME_DIR, fname)
+        try:
+            with open(fpath, "rb") as f:
+                data = f.read()
+        except Exception as e:
+            print(f"⚠️ resume load error for {fname}: {e}")
+            return None
+
+        try:
+            params = lt.read_resume_data(data)
+        except Exception:
             try:
-                with open(fpath, "rb") as f:
-                    data = f.read()
+                decoded = lt.bdecode(data)
+                params = lt.read_resume_data(lt.bencode(decoded))
+            except Exception as e:
+                print(f"⚠️ resume decode error for {fname}: {e}")
+                return None
 
-                params = None
-                try:
-                    params = lt.read_resume_data(data)
-                except Exception:
+        if not getattr(params, "save_path", None):
+            return None
+        return fname[: -len(".fastresume")], params, data
+
+    def _load_all_resume(self):
+        """
+        Pula wątków czyta i dekoduje pliki, a gotowe parametry od razu (w kolejności
+        ukończenia) idą do async_add_torrent – uchwyty dopina add_torrent_alert.
+        """
+        t0 = time.time()
+        try:
+            files = [f for f in os.listdir(RESUME_DIR) if f.endswith(".fastresume")]
+        except Exception:
+            files = []
+        self._restore["total"] = len(files)
+        use_async = hasattr(self.ses, "async_add_torrent")
+
+        try:
+            with ThreadPoolExecutor(max_workers=RESUME_LOAD_WORKERS, thread_name_prefix="lt-restore") as pool:
+                futures = [pool.submit(self._read_resume_file, f) for f in files]
+                for fut in as_completed(futures):
+                    res = fut.result()
+                    if res is None:
+                        self._restore["failed"] += 1
+                        continue
+                    ih, params, data = res
                     try:
-                        decoded = lt.bdecode(data)
-                        params = lt.read_resume_data(lt.bencode(decoded))
+                        params.flags |= lt.torrent_flags.auto_managed
+                        self._resume_digest[ih] = hashlib.sha1(data).hexdigest()
+                        if use_async:
+                            self._restore_resume.add(ih)
+                            self.ses.async_add_torrent(params)
+                        else:
+                            h = self.ses.add_torrent(params)
+                            self._index_handle(h)
+                            try:
+                                h.resume()
+                            except Exception:
+                                pass
+                        self._restore["queued"] += 1
                     except Exception as e:
-                        print(f"⚠️ resume decode error for {fname}: {e}")
-                        continue
+                        self._restore_resume.discard(ih)
+                        self._restore["failed"] += 1
+                        print(f"⚠️ resume load error for {ih}: {e}")
+        finally:
+            self._restore["running"] = False
+            self._restore["elapsed_ms"] = int((time.time() - t0) * 1000)
+
+        if self._restore["queued"]:
+            print(f"🔁 Przywrócono {self._restore['queued']} torrentów z resume "
+                  f"w {self._restore['elapsed_ms']} ms")
+
+    def _request_resume_save(self, h, ih: Optional[str] = None, only_if_modified: bool = False) -> bool:
+        """Zleca save_resume_data i zapamiętuje hash jako oczekujący na alert."""
+        ih = ih or _handle_info_hash_hex(h)
+        flags = lt.torrent_handle.save_info_dict
+        if only_if_modified and hasattr(lt.torrent_handle, "only_if_modified"):
+            flags |= lt.torrent_handle.only_if_modified
+        if ih:
+            # przed wywołaniem – alert może wrócić szybciej niż ta funkcja
+            with self._resume_cond:
+                self._resume_pending.add(ih)
+        try:
+            h.save_resume_data(flags)
+        except Exception:
+            self._resume_done(ih)
+            return False
+        self._resume_stats["requested"] += 1
+        return True
 
-                if not getattr(params, "save_path", None):
-                    continue
+    def resume_stats(self) -> dict:
+        """Liczniki checkpointów resume (do /debug)."""
+        with self._resume_cond:
+            out = dict(self._resume_stats)
+            out["pending"] = len(self._resume_pending)
+        return out
 
-                params.flags |= lt.torrent_flags.auto_managed
-                h = self.ses.add_torrent(params)
-                try:
-                    h.resume()
-                except Exception:
-                    pass
-                loaded += 1
-            except Exception as e:
-                print(f"⚠️ resume load error for {fname}: {e}")
-        if loaded:
-            print(f"🔁 Przywrócono {loaded} torrentów z resume")
-
-    def _save_all_resume_blocking(self, timeout: float = 5.0):
-        # poproś o zapis
-        handles = list(self.ses.get_torrents())
-        for h in handles:
+    def _checkpoint_dirty(self, interval: float):
+        """
+        Jeden checkpoint: tylko torrenty z need_save_resume_data(), rozłożone
+        na RESUME_CHECKPOINT_SLICES porcji w obrębie interwału (bez skoku I/O co 30 s).
+        """
+        dirty = []
+        for h in list(self.ses.get_torrents()):
             try:
-                h.save_resume_data(lt.torrent_handle.save_info_dict)
+                if hasattr(h, "need_save_resume_data") and not h.need_save_resume_data():
+                    self._resume_stats["skipped_clean"] += 1
+                    continue
             except Exception:
                 pass
-
-        # czekamy aż przyjdą alerty zapisu
+            dirty.append(h)
+        if not dirty:
+            time.sleep(interval)
+            return
+
+        slices = max(1, min(RESUME_CHECKPOINT_SLICES, len(dirty)))
+        per = -(-len(dirty) // slices)
+        pause = interval / slices
+        for i in range(0, len(dirty), per):
+            # lock tylko na zlecenie porcji (nie na sleep) – shutdown czeka najwyżej jedną porcję
+            with self._save_all_lock:
+                for h in dirty[i:i + per]:
+                    self._request_resume_save(h, only_if_modified=True)
+            time.sleep(pause)
+
+    def _resume_done(self, ih: Optional[str]):
+        with self._resume_cond:
+            self._resume_pending.discard(ih)
+            if not self._resume_pending:
+                self._resume_cond.notify_all()
+
+    def _save_all_resume_blocking(self, timeout: float = 5.0) -> bool:
+        """
+        Zleca zapis resume dla wszystkich torrentów i czeka, aż KAŻDY zgłoszony zapis
+        wróci alertem (zapisany albo nieudany) – bez odpytywania w pętli ze sleepem.
+        Zwraca True, gdy wszystko dotarło przed timeoutem.
+        """
         end = time.time() + timeout
-        while time.time() < end:
-            wrote = self._consume_resume_alerts_once()
-            if wrote == 0:
-                time.sleep(0.1)
-            else:
-                time.sleep(0.05)
+        with self._save_all_lock:
+            # zlecamy od nowa dla wszystkich, więc stare (np. zgubione) wpisy nie blokują czekania
+            with self._resume_cond:
+                self._resume_pending.clear()
+            for h in list(self.ses.get_torrents()):
+                self._request_resume_save(h)
+
+            with self._resume_cond:
+                while self._resume_pending:
+                    left = end - time.time()
+                    if left <= 0:
+                        return False
+                    self._resume_cond.wait(left)
+        return True
 
     def _save_dht_state(self):
         try:
@@ -509,125 +1781,225 @@ class TorrentClient:
     def _periodic_resume_checkpoint(self):
         while True:
             try:
-                self._save_all_resume_blocking(timeout=2.5)
+                self._checkpoint_dirty(RESUME_FLUSH_INTERVAL)
             except Exception:
-                pass
-            time.sleep(RESUME_FLUSH_INTERVAL)
+                time.sleep(RESUME_FLUSH_INTERVAL)
 
-    def _maybe_log_finished(self, ih: str, name: str, path: str):
+    def _maybe_log_finished(self, ih: str, name: str, path: str, st=None):
         """Dodaj wpis 'finished' tylko raz dla danego torrenta."""
-        if ih and ih not in self._finished_ids and self.history is not None:
+        if ih and self.history is not None and not self.history.has_finished(ih):
             try:
-                self.history.add({
+                self.history.add_finished_once({
                     "ts": int(time.time()),
                     "id": ih,
                     "name": name or ih,
                     "path": path or "",
-                    "event": "finished"
+                    "event": "finished",
+                    **self._finish_details(ih, path, st),
                 })
-                self._finished_ids.add(ih)
             except Exception:
                 pass
 
-    def _consume_resume_alerts_once(self) -> int:
-        """
-        Zbiera z kolejki tylko alerty związane z resume + zakończeniem + metadanymi.
-        Zwraca liczbę zapisanych plików resume.
-        """
-        saved = 0
-        for alert in self.ses.pop_alerts():
-            # zapis resume
-            if isinstance(alert, lt.save_resume_data_alert):
-                h = alert.handle
-                ih = _handle_info_hash_hex(h)
-                if not ih:
-                    continue
-                try:
-                    buf = _resume_to_bytes(getattr(alert, "params", {}))
-                    if buf:
-                        self._write_resume_file(ih, buf)
-                        saved += 1
-                except Exception as e:
-                    print(f"⚠️ resume write error {ih}: {e}")
-
-            # metadata -> uzupełnij nazwę
-            elif hasattr(lt, "metadata_received_alert") and isinstance(alert, lt.metadata_received_alert):
-                try:
-                    ih = _handle_info_hash_hex(alert.handle)
-                    if ih:
-                        st = alert.handle.status()
-                        nm = (getattr(st, "name", "") or "") or (alert.handle.name() if hasattr(alert.handle, "name") else "")
-                        if nm:
-                            self._name_cache[ih] = nm
-                except Exception:
-                    pass
-
-            # nowy torrent -> spróbuj odczytać nazwę
-            elif hasattr(lt, "add_torrent_alert") and isinstance(alert, lt.add_torrent_alert):
-                try:
-                    ih = _handle_info_hash_hex(alert.handle)
-                    if ih:
-                        nm = (alert.handle.name() if hasattr(alert.handle, "name") else "") or ""
-                        if nm:
-                            self._name_cache[ih] = nm
-                except Exception:
-                    pass
+    def finish_details(self, torrent_id: str, path: str = "") -> dict:
+        """Rozmiar, czas dodania i kategoria do wpisu historii "finished" (także dla watchdoga w app)."""
+        return self._finish_details(torrent_id, path, None)
 
-            # ukończony torrent → auto-pauza, historia, resume
-            elif isinstance(alert, lt.torrent_finished_alert):
-                try:
-                    h = alert.handle
-                    ih = _handle_info_hash_hex(h) or ""
-                    st = h.status()
-                    name = (getattr(st, "name", "") or "") or (h.name() if hasattr(h, "name") else "") or ih
-                    path = getattr(st, "save_path", "") or ""
-                    if not _status_is_paused(st):
-                        try:
-                            h.pause()
-                        except Exception:
-                            pass
-                    self._maybe_log_finished(ih, name, path)
-                    try:
-                        h.save_resume_data(lt.torrent_handle.save_info_dict)
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
+    def _finish_details(self, ih: str, path: str, st) -> dict:
+        out = {"category": self.category_of(path)}
+        try:
+            if st is None:
+                h = self.get_torrent(ih)
+                st = h.status() if h is not None else None
+            if st is not None:
+                out["size"] = int(getattr(st, "total_wanted", 0) or getattr(st, "total_done", 0) or 0)
+                out["added_ts"] = int(getattr(st, "added_time", 0) or 0)
+        except Exception:
+            pass
+        return out
 
-            # po pauzie – doraźny zapis resume
-            elif isinstance(alert, lt.torrent_paused_alert):
-                try:
-                    alert.handle.save_resume_data(lt.torrent_handle.save_info_dict)
-                except Exception:
-                    pass
+    def _build_alert_handlers(self) -> Dict[type, object]:
+        table = {
+            "state_update_alert": self._on_state_update,
+            "torrent_removed_alert": self._on_torrent_removed,
+            "save_resume_data_alert": self._on_save_resume,
+            "save_resume_data_failed_alert": self._on_save_resume_failed,
+            "metadata_received_alert": self._on_metadata_received,
+            "add_torrent_alert": self._on_add_torrent,
+            "torrent_finished_alert": self._on_torrent_finished,
+            "torrent_paused_alert": self._on_torrent_paused,
+            "torrent_error_alert": self._on_torrent_error,
+            "tracker_error_alert": self._on_tracker_error,
+        }
+        if not self._snap_alerts:
+            table.pop("state_update_alert")
+        # starsze bindingi nie mają części klas – te po prostu pomijamy
+        return {getattr(lt, name): fn for name, fn in table.items() if hasattr(lt, name)}
+
+    def _dispatch_alert(self, alert):
+        fn = self._alert_handlers.get(type(alert))
+        if fn is None:
+            return
+        try:
+            fn(alert)
+        except Exception:
+            pass
 
-            # log błędów do historii
-            elif isinstance(alert, lt.torrent_error_alert):
-                try:
-                    h = alert.handle
-                    ih = _handle_info_hash_hex(h) or ""
-                    name = (h.status().name or "") or ih
-                    if self.history:
-                        self.history.add({
-                            "ts": int(time.time()),
-                            "id": ih,
-                            "name": name,
-                            "path": h.status().save_path,
-                            "event": "error",
-                            "message": alert.message()
-                        })
-                except Exception:
-                    pass
+    def _consume_alerts_once(self) -> int:
+        """Opróżnia kolejkę alertów; zwraca ile obsłużono."""
+        alerts = self.ses.pop_alerts()
+        for alert in alerts:
+            self._dispatch_alert(alert)
+        return len(alerts)
+
+    # ── handlery alertów ─────────────────────────────────────────────────
+    def _on_state_update(self, alert):
+        # migawka stanu (odpowiedź na post_torrent_updates)
+        self._apply_status_updates(alert.status)
+
+    def _on_torrent_removed(self, alert):
+        ih = _alert_info_hash_hex(alert)
+        self._unindex_handle(ih)
+        self._snapshot_drop(ih)
+        self._resume_done(ih)
+
+    def _on_save_resume(self, alert):
+        ih = _handle_info_hash_hex(alert.handle)
+        if not ih:
+            return
+        try:
+            buf = _resume_to_bytes(getattr(alert, "params", {}))
+            if buf:
+                digest = hashlib.sha1(buf).hexdigest()
+                if self._resume_digest.get(ih) == digest:
+                    self._resume_stats["skipped_unchanged"] += 1
+                else:
+                    self._write_resume_file(ih, buf)
+                    self._resume_digest[ih] = digest
+                    self._resume_stats["written"] += 1
+        except Exception as e:
+            print(f"⚠️ resume write error {ih}: {e}")
+        finally:
+            self._resume_done(ih)
+
+    def _on_save_resume_failed(self, alert):
+        self._resume_stats["failed"] += 1
+        self._resume_done(_alert_info_hash_hex(alert))
+
+    def _on_metadata_received(self, alert):
+        # metadata -> uzupełnij nazwę
+        ih = self._index_handle(alert.handle)
+        if ih in self._streams:
+            self._stream_wake.set()
+        if ih:
+            st = alert.handle.status()
+            nm = (getattr(st, "name", "") or "") or (alert.handle.name() if hasattr(alert.handle, "name") else "")
+            if nm:
+                self._name_cache[ih] = nm
 
-        return saved
+    def _on_add_torrent(self, alert):
+        # nowy torrent -> spróbuj odczytać nazwę
+        err = getattr(alert, "error", None)
+        if err is not None and getattr(err, "value", lambda: 0)():
+            print(f"⚠️ add_torrent error: {alert.message()}")
+            # nieudane dodanie nie może blokować ponownej próby jako „duplikat”
+            with self._handles_lock:
+                for hx in _params_info_hashes_hex(getattr(alert, "params", None)):
+                    self._adding.pop(hx, None)
+                    self._restore_resume.discard(hx)  # inaczej pending_add w statystykach nie zejdzie do 0
+            return
+        ih = self._index_handle(alert.handle)
+        if ih in self._pinned:
+            _set_auto_managed(alert.handle, False)
+            self._enforce_pins()
+        if ih in self._restore_resume:
+            self._restore_resume.discard(ih)
+            try:
+                alert.handle.resume()
+            except Exception:
+                pass
+        elif ih in self._adding:
+            self._after_fresh_add(alert.handle, ih)
+        if ih:
+            nm = (alert.handle.name() if hasattr(alert.handle, "name") else "") or ""
+            if nm:
+                self._name_cache[ih] = nm
+            # nowy wpis w migawce od razu, nie dopiero przy następnym poście
+            self._apply_status_updates([alert.handle.status()])
+
+    def _on_torrent_finished(self, alert):
+        # ukończony torrent → auto-pauza, historia, resume
+        h = alert.handle
+        ih = _handle_info_hash_hex(h) or ""
+        st = h.status()
+        name = (getattr(st, "name", "") or "") or (h.name() if hasattr(h, "name") else "") or ih
+        path = getattr(st, "save_path", "") or ""
+        if not _status_is_paused(st):
+            try:
+                h.pause()
+            except Exception:
+                pass
+        self._maybe_log_finished(ih, name, path, st)
+        self._request_resume_save(h, ih)
+
+    def _on_torrent_paused(self, alert):
+        # po pauzie – doraźny zapis resume
+        self._request_resume_save(alert.handle)
+
+    def _on_torrent_error(self, alert):
+        # log błędów do historii
+        h = alert.handle
+        ih = _handle_info_hash_hex(h) or ""
+        st = h.status()
+        name = (st.name or "") or ih
+        if self.history:
+            self.history.add({
+                "ts": int(time.time()),
+                "id": ih,
+                "name": name,
+                "path": st.save_path,
+                "category": self.category_of(st.save_path),
+                "event": "error",
+                "message": alert.message()
+            })
+
+    def _on_tracker_error(self, alert):
+        # tylko pierwszy błąd z serii – tracker, który nie odpowiada, nie zapycha historii
+        if not self.history or int(getattr(alert, "times_in_row", 1) or 1) != 1:
+            return
+        h = alert.handle
+        ih = _alert_info_hash_hex(alert) or ""
+        try:
+            st = h.status()
+            name, path = (st.name or "") or ih, st.save_path
+        except Exception:
+            name, path = self._name_cache.get(ih, ih), ""
+        tracker = getattr(alert, "url", None) or getattr(alert, "tracker_url", "")
+        tracker = tracker() if callable(tracker) else tracker
+        self.history.add({
+            "ts": int(time.time()),
+            "id": ih,
+            "name": name,
+            "path": path,
+            "category": self.category_of(path),
+            "event": "tracker_error",
+            "tracker": str(tracker or ""),
+            "message": alert.message(),
+        })
 
     def _alerts_loop(self):
+        """Blokujące wait_for_alert zamiast spania – budzi się na alert albo na tick post_torrent_updates."""
+        can_wait = hasattr(self.ses, "wait_for_alert")
         while True:
             try:
-                self._consume_resume_alerts_once()
+                left = self._maybe_post_updates()
+                wait_s = max(0.01, min(ALERT_WAIT_MAX, left))
+                if can_wait:
+                    self.ses.wait_for_alert(int(wait_s * 1000))
+                else:
+                    time.sleep(min(0.2, wait_s))
+                self._consume_alerts_once()
             except Exception:
-                pass
-            time.sleep(0.2)
+                time.sleep(0.2)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -641,26 +2013,134 @@ def _settings_from_dict(current, overrides: dict) -> dict:
     return valid
 
 
-def _handle_info_hash_hex(h: lt.torrent_handle) -> Optional[str]:
+def _digest_hex(d) -> Optional[str]:
+    """sha1_hash / sha256_hash -> hex; None dla pustego (wyzerowanego) skrótu."""
+    if d is None:
+        return None
+    try:
+        if hasattr(d, "is_all_zeros") and d.is_all_zeros():
+            return None
+        if hasattr(d, "to_bytes"):
+            raw = d.to_bytes()
+        elif hasattr(d, "to_string"):
+            raw = d.to_string()
+        else:
+            return None
+        return raw.hex() if raw and any(raw) else None
+    except Exception:
+        return None
+
+
+def _info_hashes_hex(obj) -> List[str]:
+    """[v1, v2] (bez pustych) z info_hashes / info_hash – metody albo atrybuty."""
+    out: List[str] = []
     try:
-        if hasattr(h, "info_hashes"):
-            ihs = h.info_hashes()
+        ihs = getattr(obj, "info_hashes", None)
+        ihs = ihs() if callable(ihs) else ihs
+        if ihs is not None:
             for attr in ("v1", "v2"):
-                ih = getattr(ihs, attr, None)
-                if ih:
-                    if hasattr(ih, "to_bytes"):
-                        return ih.to_bytes().hex()
-                    if hasattr(ih, "to_string"):
-                        return ih.to_string().hex()
-        if hasattr(h, "info_hash"):
-            ih = h.info_hash()
-            if hasattr(ih, "to_bytes"):
-                return ih.to_bytes().hex()
-            if hasattr(ih, "to_string"):
-                return ih.to_string().hex()
+                hx = _digest_hex(getattr(ihs, attr, None))
+                if hx:
+                    out.append(hx)
+        if not out:
+            ih = getattr(obj, "info_hash", None)
+            hx = _digest_hex(ih() if callable(ih) else ih)
+            if hx:
+                out.append(hx)
     except Exception:
         pass
-    return None
+    return out
+
+
+def _handle_info_hash_hex(h: lt.torrent_handle) -> Optional[str]:
+    hashes = _info_hashes_hex(h) if h is not None else []
+    return hashes[0] if hashes else None
+
+
+def _params_info_hashes_hex(params) -> List[str]:
+    """Hashe z add_torrent_params (parse_magnet_uri) albo z dołączonego torrent_info."""
+    hashes = _info_hashes_hex(params)
+    ti = getattr(params, "ti", None)
+    if not hashes and ti is not None:
+        hashes = _info_hashes_hex(ti)
+    return hashes
+
+
+def _alert_info_hash_hex(alert) -> Optional[str]:
+    """Hash z alertu – przy torrent_removed_alert uchwyt bywa już nieważny."""
+    ih = _handle_info_hash_hex(getattr(alert, "handle", None))
+    if ih:
+        return ih
+    hashes = _info_hashes_hex(alert)
+    return hashes[0] if hashes else None
+
+
+def _set_sequential(h, on: bool):
+    try:
+        if hasattr(h, "set_flags") and hasattr(lt.torrent_flags, "sequential_download"):
+            if on:
+                h.set_flags(lt.torrent_flags.sequential_download)
+            else:
+                h.unset_flags(lt.torrent_flags.sequential_download)
+        else:
+            h.set_sequential_download(on)
+    except Exception:
+        pass
+
+
+def _torrent_file(h):
+    """torrent_info uchwytu albo None (brak metadanych)."""
+    try:
+        if hasattr(h, "torrent_file"):
+            ti = h.torrent_file()
+            if ti is not None:
+                return ti
+        if hasattr(h, "has_metadata") and not h.has_metadata():
+            return None
+        return h.get_torrent_info()
+    except Exception:
+        return None
+
+
+def _set_auto_managed(h, on: bool):
+    try:
+        if hasattr(h, "set_flags") and hasattr(lt.torrent_flags, "auto_managed"):
+            if on:
+                h.set_flags(lt.torrent_flags.auto_managed)
+            else:
+                h.unset_flags(lt.torrent_flags.auto_managed)
+        else:
+            h.auto_managed(on)
+    except Exception:
+        pass
+
+
+def _load_json(path: str, default: dict) -> dict:
+    import json
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            d = json.load(f)
+        return d if isinstance(d, dict) else dict(default)
+    except Exception:
+        return dict(default)
+
+
+def _save_json(path: str, data: dict):
+    import json
+    try:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def _handle_is_valid(h) -> bool:
+    try:
+        return bool(h.is_valid())
+    except Exception:
+        return False
 
 
 def _status_is_paused(st: lt.torrent_status) -> bool: